@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+'''
+@Project ：yolo_source_code
+@File    ：bench_conversion.py
+@Author  ：fengzhengxiong
+@Date    ：2026/10/18 16:20
+'''
+
+
+# ==========================================================
+#  数据转换基准测试，在 yolo_source_code 目录下运行:
+#    python benchmarks/bench_conversion.py --files 2000 --vertices 64 --backend process
+#
+#  在临时目录生成合成 LabelMe 数据集，分别计时三个阶段:
+#    convert: LabelmeConverter.convert（全量）
+#    split:   split_dataset（val_images 默认用符号链接落地，尽量不把复制算进来）
+#    copy:    把验证集图片用 --copy-mode 落地到新目录
+#  每个阶段记录耗时、文件/秒、顶点/秒和峰值内存，结果以一行 JSON 追加到 --output，
+#  并与同参数的上一条记录对比，便于跨提交比较。
+# ==========================================================
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import threading
+import subprocess
+import argparse
+from pathlib import Path
+
+SOURCE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SOURCE_DIR)
+
+from synthetic_labelme import add_generator_arguments, generator_kwargs, generate_dataset
+from logic.data_converter import LabelmeConverter, split_dataset, materialize_files, MATERIALIZE_MODES
+
+
+class PeakRssSampler:
+    """
+    在后台线程中定时采样本进程及其子进程（进程池）的常驻内存之和，记录峰值。
+    没有安装 psutil 时退回 resource.getrusage，只能得到本进程至今的最高水位。
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+        try:
+            import psutil
+            self._process = psutil.Process()
+        except ImportError:
+            self._process = None
+
+    def _rss(self) -> int:
+        total = self._process.memory_info().rss
+        for child in self._process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except Exception:
+                pass
+        return total
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        if self._process is not None:
+            self.peak = self._rss()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self.peak = max(self.peak, self._rss())
+        else:
+            import resource
+            # Linux 上单位是 KB，macOS 上是字节
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            self.peak = maxrss if sys.platform == 'darwin' else maxrss * 1024
+        return False
+
+
+def _run_stage(name: str, func, files: int, vertices: int = 0) -> dict:
+    with PeakRssSampler() as sampler:
+        start = time.perf_counter()
+        func()
+        seconds = time.perf_counter() - start
+    result = {
+        'seconds': round(seconds, 4),
+        'files_per_sec': round(files / seconds, 1) if seconds > 0 else 0.0,
+        'peak_rss_mb': round(sampler.peak / 1024 / 1024, 1),
+    }
+    if vertices:
+        result['vertices_per_sec'] = round(vertices / seconds, 1) if seconds > 0 else 0.0
+    print(f"  {name:<8}{result['seconds']:>10.3f} s{result['files_per_sec']:>12.1f} 文件/秒"
+          + (f"{result['vertices_per_sec']:>14.0f} 顶点/秒" if vertices else " " * 22)
+          + f"{result['peak_rss_mb']:>10.1f} MB")
+    return result
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SOURCE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def _previous_record(output: Path, params: dict):
+    """结果文件中参数相同的上一条记录。"""
+    if not output.exists():
+        return None
+    previous = None
+    with open(output, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('params') == params:
+                previous = record
+    return previous
+
+
+def run_benchmark(args) -> dict:
+    kwargs = generator_kwargs(args)
+    work_dir = Path(tempfile.mkdtemp(prefix='labelme_bench_', dir=args.work_dir))
+    try:
+        print(f"正在生成合成数据集: {work_dir}")
+        start = time.perf_counter()
+        stats = generate_dataset(work_dir, **kwargs)
+        print(f"生成完成 ({time.perf_counter() - start:.1f} s): {stats}")
+
+        converter = LabelmeConverter(work_dir, backend=args.backend)
+        convert_result = {}
+        stages = {}
+        stages['convert'] = _run_stage(
+            'convert', lambda: convert_result.update(converter.convert(incremental=False)),
+            stats['files'], stats['vertices'])
+        stages['split'] = _run_stage(
+            'split', lambda: split_dataset(work_dir, convert_result['classes'], materialize_mode=args.split_mode),
+            stats['files'])
+        with open(work_dir / 'val.txt', 'r', encoding='utf-8') as f:
+            val_files = [work_dir / line.strip() for line in f if line.strip()]
+        stages['copy'] = _run_stage(
+            'copy', lambda: materialize_files(val_files, work_dir / 'bench_copy', args.copy_mode), len(val_files))
+    finally:
+        if args.keep:
+            print(f"数据集保留在: {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'params': {**{k: list(v) if isinstance(v, tuple) else v for k, v in kwargs.items()},
+                   'backend': args.backend, 'split_mode': args.split_mode, 'copy_mode': args.copy_mode},
+        'backend': convert_result.get('backend'),
+        'dataset': stats,
+        'stages': stages,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="LabelMe -> YOLO 转换基准测试")
+    add_generator_arguments(parser)
+    parser.add_argument('--backend', choices=LabelmeConverter.BACKENDS, default='auto')
+    parser.add_argument('--split-mode', choices=MATERIALIZE_MODES, default='symlink',
+                        help="split 阶段 val_images 的落地方式 (默认 symlink，尽量不计入复制)")
+    parser.add_argument('--copy-mode', choices=MATERIALIZE_MODES, default='copy', help="copy 阶段的落地方式")
+    parser.add_argument('--output', default='benchmarks/results.jsonl', help="结果文件（每行一条 JSON）")
+    parser.add_argument('--work-dir', help="临时数据集所在目录（默认系统临时目录）")
+    parser.add_argument('--keep', action='store_true', help="保留生成的数据集")
+    args = parser.parse_args(argv)
+
+    record = run_benchmark(args)
+    output = Path(args.output)
+    previous = _previous_record(output, record['params'])
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    print(f"结果已追加到: {output}")
+
+    if previous:
+        print(f"与上一次同参数的运行对比 (commit {previous['commit']}):")
+        for name, stage in record['stages'].items():
+            before = previous['stages'].get(name)
+            if before and before['seconds'] > 0:
+                change = (stage['seconds'] - before['seconds']) / before['seconds'] * 100
+                print(f"  {name:<8}{before['seconds']:>10.3f} s -> {stage['seconds']:.3f} s ({change:+.1f}%)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+'''
+@Project ：yolo_source_code
+@File    ：import_time.py
+@Author  ：fengzhengxiong
+@Date    ：2026/10/18 15:50
+'''
+
+
+# ==========================================================
+#  命令行入口的冷启动检查（在 yolo_source_code 目录下运行）:
+#    python benchmarks/import_time.py [--budget-ms 150] [--repeat 5]
+#
+#  1. 用 python -X importtime 测量 "import cli" 的耗时（取中位数），超出预算则失败；
+#  2. 检查各子命令的启动路径没有导入不该导入的重量级模块（PySide6 一律禁止）。
+#  任一检查失败时返回码为 1，可以直接放进 CI。
+# ==========================================================
+
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+SOURCE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('PySide6', 'psutil', 'yaml', 'numpy', 'PIL')
+
+# 子命令启动路径: (说明, 执行的代码, 允许导入的重量级模块)
+STARTUP_PATHS = [
+    ("import cli", "import cli", ()),
+    ("cli --help", "import cli\ntry:\n    cli.main(['--help'])\nexcept SystemExit:\n    pass", ()),
+    ("cli list", "import cli\ncli.main(['list'])", ()),
+    ("cli task --dry-run",
+     "import cli\ncli.main(['task', 'train', '--yaml_path', 'a.yaml', '--train_dataset_folder', 'data',"
+     " '--python-exe', 'python', '--yolo-script', 'yolo', '--dry-run'])", ()),
+    ("import logic.data_converter", "import logic.data_converter", ('numpy',)),
+]
+
+
+def measure_import_ms(module: str) -> float:
+    """在新的解释器中导入模块，返回 -X importtime 报告的累计耗时（毫秒）。"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=SOURCE_DIR, capture_output=True, text=True, check=True)
+    for line in result.stderr.splitlines():
+        # 格式: "import time:   self [us] | cumulative | imported package"
+        parts = [part.strip() for part in line.split('|')]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1000
+    raise RuntimeError(f"importtime 输出中没有找到模块 '{module}'")
+
+
+def loaded_heavy_modules(code: str) -> list:
+    """执行一段代码，返回其间被导入的重量级模块。"""
+    probe = f"{code}\nimport sys\nprint('@@', ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, '-c', probe], cwd=SOURCE_DIR, capture_output=True, text=True, check=True)
+    marker = [line for line in result.stdout.splitlines() if line.startswith('@@')][-1]
+    return [name for name in marker[2:].strip().split(',') if name]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="命令行入口的冷启动检查")
+    parser.add_argument('--budget-ms', type=float, default=150.0, help="import cli 的耗时预算（毫秒）")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    failed = False
+    samples = [measure_import_ms('cli') for _ in range(args.repeat)]
+    median = statistics.median(samples)
+    status = "OK" if median <= args.budget_ms else "FAIL"
+    failed |= status == "FAIL"
+    print(f"[{status}] import cli: 中位数 {median:.1f} ms (预算 {args.budget_ms:.0f} ms, 样本 {len(samples)} 次)")
+
+    for name, code, allowed in STARTUP_PATHS:
+        unexpected = [m for m in loaded_heavy_modules(code) if m not in allowed]
+        status = "FAIL" if unexpected else "OK"
+        failed |= bool(unexpected)
+        print(f"[{status}] {name}: " + (f"导入了 {unexpected}" if unexpected else "未导入重量级模块"))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
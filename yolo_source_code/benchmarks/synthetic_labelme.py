@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+'''
+@Project ：yolo_source_code
+@File    ：synthetic_labelme.py
+@Author  ：fengzhengxiong
+@Date    ：2026/10/18 16:10
+'''
+
+
+# ==========================================================
+#  合成 LabelMe 数据集生成器（基准测试用），在 yolo_source_code 目录下运行:
+#    python benchmarks/synthetic_labelme.py <输出目录> --files 1000 --shapes 20 --vertices 64
+#
+#  生成 <输出目录>/jsons/*.json 和 <输出目录>/images/*.bmp，结构与真实数据集一致。
+#  图片是有效的 24 位 BMP（内容为随机像素），同一个 seed 生成的数据集完全相同。
+# ==========================================================
+
+import os
+import sys
+import json
+import math
+import base64
+import random
+import struct
+import argparse
+from pathlib import Path
+
+
+def make_bmp(width: int, height: int, rng: random.Random) -> bytes:
+    """生成一张 24 位无压缩 BMP（工业相机常见的输出格式），像素为随机值。"""
+    row_size = (width * 3 + 3) & ~3
+    pixel_bytes = row_size * height
+    header = struct.pack('<2sIHHI', b'BM', 54 + pixel_bytes, 0, 0, 54)
+    info = struct.pack('<IiiHHIIiiII', 40, width, height, 1, 24, 0, pixel_bytes, 2835, 2835, 0, 0)
+    return header + info + rng.randbytes(pixel_bytes)
+
+
+def _polygon(rng: random.Random, width: int, height: int, vertices: int) -> list:
+    """围绕随机中心、按角度排序生成的星形多边形，保证不自交。"""
+    cx, cy = rng.uniform(0.2, 0.8) * width, rng.uniform(0.2, 0.8) * height
+    max_radius = min(cx, cy, width - cx, height - cy)
+    points = []
+    for i in range(vertices):
+        angle = 2 * math.pi * i / vertices
+        radius = rng.uniform(0.3, 1.0) * max_radius
+        points.append([round(cx + radius * math.cos(angle), 4), round(cy + radius * math.sin(angle), 4)])
+    return points
+
+
+def _rectangle(rng: random.Random, width: int, height: int) -> list:
+    x1, x2 = sorted(rng.uniform(0, width) for _ in range(2))
+    y1, y2 = sorted(rng.uniform(0, height) for _ in range(2))
+    return [[round(x1, 4), round(y1, 4)], [round(x2, 4), round(y2, 4)]]
+
+
+def generate_dataset(root, files: int = 1000, shapes: int = 10, vertices: int = 32, polygon_ratio: float = 0.5,
+                     classes: int = 5, image_size: tuple = (640, 480), embed_image_data: bool = False,
+                     seed: int = 0) -> dict:
+    """
+    生成合成数据集，返回统计信息:
+    {'files', 'shapes', 'polygons', 'rectangles', 'vertices', 'json_bytes', 'image_bytes'}
+    vertices 统计的是所有形状的点数（矩形计 2 个点），与转换器的输入规模一致。
+    """
+    root = Path(root)
+    json_dir, image_dir = root / 'jsons', root / 'images'
+    json_dir.mkdir(parents=True, exist_ok=True)
+    image_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    width, height = image_size
+    labels = [f'class_{i}' for i in range(classes)]
+    stats = dict.fromkeys(('files', 'shapes', 'polygons', 'rectangles', 'vertices', 'json_bytes', 'image_bytes'), 0)
+
+    for index in range(files):
+        stem = f'synthetic_{index:06d}'
+        image_bytes = make_bmp(width, height, rng)
+        (image_dir / f'{stem}.bmp').write_bytes(image_bytes)
+
+        shape_list = []
+        for _ in range(shapes):
+            if rng.random() < polygon_ratio:
+                points, shape_type = _polygon(rng, width, height, vertices), 'polygon'
+                stats['polygons'] += 1
+            else:
+                points, shape_type = _rectangle(rng, width, height), 'rectangle'
+                stats['rectangles'] += 1
+            stats['vertices'] += len(points)
+            shape_list.append({'label': rng.choice(labels), 'points': points, 'group_id': None,
+                               'shape_type': shape_type, 'flags': {}})
+
+        data = {
+            'version': '5.2.1',
+            'flags': {},
+            'shapes': shape_list,
+            'imagePath': f'../images/{stem}.bmp',
+            'imageData': base64.b64encode(image_bytes).decode('ascii') if embed_image_data else None,
+            'imageHeight': height,
+            'imageWidth': width,
+        }
+        text = json.dumps(data)
+        (json_dir / f'{stem}.json').write_text(text, encoding='utf-8')
+
+        stats['files'] += 1
+        stats['shapes'] += shapes
+        stats['json_bytes'] += len(text)
+        stats['image_bytes'] += len(image_bytes)
+    return stats
+
+
+def add_generator_arguments(parser: argparse.ArgumentParser):
+    """生成参数，bench_conversion.py 复用同一组参数。"""
+    parser.add_argument('--files', type=int, default=1000, help="JSON/图片数量")
+    parser.add_argument('--shapes', type=int, default=10, help="每个文件的形状数")
+    parser.add_argument('--vertices', type=int, default=32, help="每个多边形的顶点数")
+    parser.add_argument('--polygon-ratio', type=float, default=0.5, help="多边形占形状的比例 (0~1)，其余为矩形")
+    parser.add_argument('--classes', type=int, default=5, help="类别数")
+    parser.add_argument('--image-size', default='640x480', help="图片尺寸 WxH")
+    parser.add_argument('--image-data', action='store_true', help="在 JSON 中内嵌 base64 的 imageData")
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def generator_kwargs(args) -> dict:
+    width, height = (int(v) for v in args.image_size.lower().split('x'))
+    return {'files': args.files, 'shapes': args.shapes, 'vertices': args.vertices,
+            'polygon_ratio': args.polygon_ratio, 'classes': args.classes, 'image_size': (width, height),
+            'embed_image_data': args.image_data, 'seed': args.seed}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="生成合成 LabelMe 数据集")
+    parser.add_argument('output', help="输出目录")
+    add_generator_arguments(parser)
+    args = parser.parse_args(argv)
+    if os.path.exists(os.path.join(args.output, 'jsons')):
+        print(f"错误: '{args.output}' 中已存在 jsons 文件夹。", file=sys.stderr)
+        return 1
+    stats = generate_dataset(args.output, **generator_kwargs(args))
+    print(f"已生成: {stats}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,370 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+'''
+@Project ：yolo_source_code
+@File    ：cli.py
+@Author  ：fengzhengxiong
+@Date    ：2026/10/18 15:40
+'''
+
+
+# ==========================================================
+#  无界面的命令行入口，用于没有 Qt 的服务器 / CI：
+#    python -m cli convert <LabelMe根目录> [--backend process] [--transcode png]
+#    python -m cli task train --yaml_path yolo11n.yaml --train_dataset_folder D:/data
+#    python -m cli task benchmark --onnx_path best.onnx --validation_folder D:/data/val_images
+#    python -m cli stats <LabelMe根目录>
+#    python -m cli check <LabelMe根目录> [--strict]
+#    python -m cli dedup <LabelMe根目录> [--threshold 6]
+#    python -m cli list
+#
+#  启动速度很重要（CI 里每条命令都会冷启动一次），所以模块顶层只导入标准库的轻量模块，
+#  PySide6 完全不导入，numpy / yaml / psutil 只在真正用到它们的子命令里按需导入。
+#  benchmarks/import_time.py 会检查这一点。
+# ==========================================================
+
+import os
+import sys
+import argparse
+
+# 与 MainWindow._get_current_paths() 的 key 一致
+_PATH_KEYS = ('train_dataset_folder', 'yaml_path', 'validation_folder', 'best_pt_path', 'onnx_path')
+
+
+def _load_config(config_path: str, required: bool):
+    """读取 config.ini；required 为 False 时文件不存在或不完整则返回 None。"""
+    from core.config_manager import ConfigManager
+    try:
+        return ConfigManager(config_path)
+    except (FileNotFoundError, ValueError) as e:
+        if required:
+            raise
+        print(f"提示: 未使用配置文件 ({e})，采用默认参数。")
+        return None
+
+
+def _cmd_list(args) -> int:
+    from core.task_config import TASK_CONFIG
+    for task_id, task_info in TASK_CONFIG.items():
+        print(f"{task_id:<10}{task_info['name']:<10}需要: {', '.join(task_info['required_paths'])}")
+    return 0
+
+
+def _cmd_convert(args) -> int:
+    from logic.data_converter import LabelmeConverter, split_dataset
+    from logic.instrumentation import Instrumentation
+
+    config = _load_config(args.config, required=False)
+    options = dict(config.conversion_options) if config else {}
+    if args.backend:
+        options['backend'] = args.backend
+    if args.streaming:
+        options['streaming'] = True
+    materialize_mode = args.materialize or (config.val_images_mode if config else 'copy')
+    transcode_format = args.transcode or (config.transcode_format if config else 'none')
+    transcode_quality = args.quality or (config.transcode_quality if config else 95)
+    integrity_check = args.check or (config.integrity_check if config else 'warn')
+    dedup_mode = args.dedup or (config.dedup_mode if config else 'off')
+    dedup_threshold = args.dedup_threshold if args.dedup_threshold is not None else (
+        config.dedup_threshold if config else 4)
+    tile_options = config.tile_options if config else None
+    if args.tile_size is not None:
+        tile_options = {**(tile_options or {'keep_empty': 0.1, 'min_visibility': 0.3}),
+                        'tile_size': args.tile_size, 'stride': args.tile_stride} if args.tile_size else None
+    label_cache = args.label_cache if args.label_cache is not None else (config.label_cache if config else False)
+    if tile_options and transcode_format != 'none':
+        # 训练使用切片数据集自己的列表，转码只会改写根目录的 train.txt / val.txt
+        print("警告: 已启用切片（tile_size），训练使用切片数据集，跳过训练图片转码。")
+        transcode_format = 'none'
+    split_mode = args.split_mode or (config.split_mode if config else 'random')
+    stratify = args.stratify if args.stratify is not None else (config.split_stratify if config else False)
+
+    instr = Instrumentation(enabled=bool(args.report))
+    if integrity_check != 'off':
+        from logic.integrity_checker import check_dataset, format_report
+        from logic.dataset_index import DatasetIndex
+        with instr.timer('step.check'), DatasetIndex(args.labelme_root) as index:
+            report = check_dataset(args.labelme_root, index=index, instrumentation=instr)
+        print('\n'.join(format_report(report)))
+        if report['errors'] and integrity_check == 'strict':
+            print(f"[错误] 完整性预检发现 {report['errors']} 个错误，已中止转换。", file=sys.stderr)
+            return 1
+    converter = LabelmeConverter(args.labelme_root, **options, instrumentation=instr)
+    with instr.timer('step.convert'):
+        result = converter.convert(incremental=not args.full)
+    print(f"[成功] {result['message']} (后端: {result['backend']})")
+    print(f"发现的类别: {result['classes']}")
+
+    if not args.no_split:
+        duplicates = None
+        if dedup_mode != 'off':
+            from logic.image_dedup import find_near_duplicates
+            with instr.timer('step.dedup'):
+                dedup = find_near_duplicates(args.labelme_root, threshold=dedup_threshold,
+                                             linkage='leader' if dedup_mode == 'drop' else 'single')
+            duplicates = dedup['clusters']
+            print(f"[成功] 发现 {len(duplicates)} 组近似重复，共 {dedup['duplicates']} 张多余图片"
+                  f"（计算哈希 {dedup['hashed']} 张，缓存命中 {dedup['cached']} 张）。")
+
+        index = None
+        if converter.use_index:
+            from logic.dataset_index import DatasetIndex
+            index = DatasetIndex(args.labelme_root)
+        try:
+            with instr.timer('step.split'):
+                data_yaml_path = split_dataset(args.labelme_root, result['classes'], materialize_mode=materialize_mode,
+                                               instrumentation=instr, index=index, duplicates=duplicates,
+                                               duplicate_mode='drop' if dedup_mode == 'drop' else 'group',
+                                               split_mode=split_mode, stratify=stratify)
+        finally:
+            if index is not None:
+                index.close()
+        print(f"[成功] 已生成YOLO配置文件: {data_yaml_path}")
+
+        if tile_options:
+            from logic.image_tiler import tile_dataset
+            with instr.timer('step.tile'):
+                tiles = tile_dataset(args.labelme_root, result['classes'], decimals=options.get('decimals', 6),
+                                     **tile_options)
+            print(f"[成功] 切片 {tiles['tiled']} 张图片（缓存命中 {tiles['skipped']} 张，失败 {tiles['failed']} 张），"
+                  f"训练集 {tiles['train_tiles']} 片 / 验证集 {tiles['val_tiles']} 片，"
+                  f"数据集: {tiles['data_yaml']}")
+            data_yaml_path = tiles['data_yaml']
+
+        if transcode_format != 'none':
+            from logic.image_transcoder import transcode_images
+            with instr.timer('step.transcode'):
+                result = transcode_images(args.labelme_root, transcode_format, transcode_quality)
+            print(f"[成功] 转码 {result['transcoded']} 张，缓存命中 {result['skipped']} 张，失败 {result['failed']} 张，"
+                  f"删除过期 {result['removed']} 张，吞吐 {result['images_per_second']:.1f} 张/秒。")
+
+        if label_cache:
+            from logic.label_cache import write_label_caches
+            with instr.timer('step.label_cache'):
+                caches = write_label_caches(data_yaml_path)
+            for key, cache in caches.items():
+                print(f"[成功] 标签缓存 {key}: {cache['images']} 张图片 -> {cache['path']}"
+                      f"（缺少标签 {cache['missing']}，损坏 {cache['corrupt']}）")
+
+    if args.report:
+        instr.write_report(args.report, task='convert', dataset=args.labelme_root, options=options)
+        print(f"[统计] 各环节耗时（报告: {args.report}）:")
+        print(instr.summary_table())
+    return 0
+
+
+def _cmd_stats(args) -> int:
+    """从 dataset_index.db 输出数据集统计，不读取任何 JSON（索引由 convert 维护）。"""
+    import json
+    from logic.dataset_index import DatasetIndex, INDEX_FILENAME
+
+    if not os.path.exists(os.path.join(args.labelme_root, INDEX_FILENAME)):
+        print(f"错误: '{args.labelme_root}' 中没有 {INDEX_FILENAME}，请先执行 convert。", file=sys.stderr)
+        return 1
+    with DatasetIndex(args.labelme_root) as index:
+        index.refresh_files()
+        stats = index.stats()
+    if args.json:
+        print(json.dumps(stats, ensure_ascii=False, indent=1))
+        return 0
+    print(f"文件: {stats['files']}")
+    print(f"标注 {stats['annotated']} 个，形状 {stats['shapes']} 个，顶点 {stats['vertices']} 个")
+    print(f"{'类别':<20}{'实例':>10}{'图片':>10}{'顶点':>12}  形状类型")
+    for label, entry in stats['classes'].items():
+        shape_types = ', '.join(f"{k}={v}" for k, v in entry['shape_types'].items())
+        print(f"{label:<20}{entry['instances']:>10}{entry['images']:>10}{entry['vertices']:>12}  {shape_types}")
+    print("图片尺寸: " + ', '.join(f"{size} x{n}" for size, n in stats['image_sizes'].items()))
+    return 0
+
+
+def _cmd_check(args) -> int:
+    """完整性预检；有错误时返回 1（--strict 时警告也算失败），便于在 CI 中使用。"""
+    from logic.integrity_checker import check_dataset, format_report
+    from logic.dataset_index import DatasetIndex
+
+    if args.no_index:
+        report = check_dataset(args.labelme_root, max_workers=args.workers, tolerance=args.tolerance)
+    else:
+        with DatasetIndex(args.labelme_root) as index:
+            report = check_dataset(args.labelme_root, max_workers=args.workers, tolerance=args.tolerance, index=index)
+    if args.json:
+        import json
+        print(json.dumps(report, ensure_ascii=False, indent=1))
+    else:
+        print('\n'.join(format_report(report, limit=args.limit)))
+    return 1 if report['errors'] or (args.strict and report['warnings']) else 0
+
+
+def _cmd_dedup(args) -> int:
+    from logic.image_dedup import find_near_duplicates, DUPLICATES_FILENAME
+
+    result = find_near_duplicates(args.labelme_root, threshold=args.threshold, linkage=args.linkage,
+                                  max_workers=args.workers)
+    print(f"共 {result['images']} 张图片（计算哈希 {result['hashed']} 张，缓存命中 {result['cached']} 张，"
+          f"失败 {result['failed']} 张），耗时 {result['seconds']:.2f} 秒。")
+    print(f"发现 {len(result['clusters'])} 组近似重复，共 {result['duplicates']} 张多余图片，"
+          f"详见 {os.path.join(args.labelme_root, DUPLICATES_FILENAME)}")
+    for cluster in result['clusters'][:args.limit]:
+        print(f"  {len(cluster)} 张: {', '.join(cluster[:4])}" + (" ..." if len(cluster) > 4 else ""))
+    return 0
+
+
+def _kill_process_tree(pid: int):
+    import psutil
+    try:
+        parent = psutil.Process(pid)
+        for child in parent.children(recursive=True):
+            child.kill()
+        parent.kill()
+    except psutil.NoSuchProcess:
+        pass
+
+
+def _run_command(command: str, log_file: str = None) -> int:
+    """
+    执行任务命令并返回退出码。不写日志文件时子进程直接继承终端，开销最小；
+    写日志文件时按原始字节转发输出（保留 '\\r' 进度刷新），同时写入文件。
+    """
+    import subprocess
+    log_fp = None
+    if log_file:
+        os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+        log_fp = open(log_file, 'wb')
+        log_fp.write(f"[COMMAND] {command}\n".encode('utf-8'))
+    process = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE if log_fp else None,
+                               stderr=subprocess.STDOUT if log_fp else None)
+    try:
+        if log_fp:
+            out = sys.stdout.buffer
+            for chunk in iter(lambda: process.stdout.read1(65536), b''):
+                out.write(chunk)
+                out.flush()
+                log_fp.write(chunk)
+        return process.wait()
+    except KeyboardInterrupt:
+        print("\n[ACTION] 接收到中断，正在终止任务...")
+        _kill_process_tree(process.pid)
+        process.wait()
+        return 130
+    finally:
+        if log_fp:
+            log_fp.close()
+
+
+def _cmd_task(args) -> int:
+    from core.task_config import get_task_config, build_task_command
+
+    task_info = get_task_config(args.task_id)
+    paths = {key: value for key, value in vars(args).items() if key in _PATH_KEYS and value}
+    missing = [key for key in task_info['required_paths'] if not paths.get(key)]
+    if missing:
+        print(f"错误: 执行“{task_info['name']}”任务需要参数: " + " ".join(f"--{key}" for key in missing))
+        return 2
+
+    config = None
+    if args.python_exe and args.yolo_script:
+        python_exe, yolo_script = args.python_exe, args.yolo_script
+    else:
+        config = _load_config(args.config, required=True)
+        python_exe, yolo_script = args.python_exe or config.python_exe, args.yolo_script or config.yolo_script
+    overrides = config.task_profile(args.task_id) if config else {}
+    if args.auto_profile and args.task_id == 'train':
+        from logic.training_profile import plan_training
+        plan = plan_training(paths['train_dataset_folder'], paths.get('yaml_path'), overrides=overrides)
+        for reason in plan['reasons']:
+            print(f"[PROFILE] {reason}")
+        overrides = {**overrides, **plan['args']}
+    command = build_task_command(args.task_id, paths, python_exe, yolo_script, overrides)
+    print(f"[COMMAND] {command}", flush=True)
+    if args.dry_run:
+        return 0
+
+    return_code = _run_command(command, args.log_file)
+    if return_code == 0:
+        print(f"--- 任务“{task_info['name']}”成功完成 ---")
+    else:
+        print(f"--- 任务“{task_info['name']}”异常结束，返回码: {return_code} ---")
+    return return_code
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m cli', description="YOLO Suite 命令行入口（无需 Qt）")
+    parser.add_argument('--config', default='config.ini', help="配置文件路径 (默认: config.ini)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('list', help="列出可执行的任务").set_defaults(func=_cmd_list)
+
+    convert = subparsers.add_parser('convert', help="LabelMe -> YOLO 转换并划分数据集")
+    convert.add_argument('labelme_root', help="LabelMe 数据集根目录（包含 jsons/ 和 images/）")
+    convert.add_argument('--backend', choices=('auto', 'thread', 'process'), help="转换后端，默认取配置文件")
+    convert.add_argument('--streaming', action='store_true', help="有界内存的流式转换")
+    convert.add_argument('--full', action='store_true', help="忽略清单，全量重新转换")
+    convert.add_argument('--no-split', action='store_true', help="只转换标签，不划分数据集")
+    convert.add_argument('--materialize', choices=('copy', 'hardlink', 'symlink', 'reflink', 'auto'),
+                         help="val_images 的落地方式，默认取配置文件")
+    convert.add_argument('--transcode', choices=('none', 'png', 'jpeg', 'webp'), help="训练图片转码格式")
+    convert.add_argument('--quality', type=int, help="转码质量 1~100")
+    convert.add_argument('--check', choices=('warn', 'strict', 'off'), help="转换前的完整性预检，默认取配置文件")
+    convert.add_argument('--dedup', choices=('off', 'drop', 'group'), help="近似重复图片的处理方式，默认取配置文件")
+    convert.add_argument('--dedup-threshold', type=int, help="判定为近似重复的最大汉明距离")
+    convert.add_argument('--tile-size', type=int, help="切片尺寸（像素），0 表示不切片，默认取配置文件")
+    convert.add_argument('--tile-stride', type=int, help="切片步长（像素），默认重叠 20%%")
+    convert.add_argument('--label-cache', action=argparse.BooleanOptionalAction,
+                         help="最后生成训练器的 labels.cache，默认取配置文件")
+    convert.add_argument('--split-mode', choices=('random', 'hash'),
+                         help="划分方式: random 每次随机 / hash 按文件名稳定划分，默认取配置文件")
+    convert.add_argument('--stratify', action=argparse.BooleanOptionalAction,
+                         help="hash 划分时按类别分层，默认取配置文件")
+    convert.add_argument('--report', help="写出各环节耗时的 JSON 报告")
+    convert.set_defaults(func=_cmd_convert)
+
+    stats = subparsers.add_parser('stats', help="查询数据集索引中的统计信息（类别、实例数、图片尺寸）")
+    stats.add_argument('labelme_root', help="LabelMe 数据集根目录")
+    stats.add_argument('--json', action='store_true', help="以 JSON 输出")
+    stats.set_defaults(func=_cmd_stats)
+
+    check = subparsers.add_parser('check', help="转换前的完整性预检（只读图片文件头，与 JSON 比对）")
+    check.add_argument('labelme_root', help="LabelMe 数据集根目录")
+    check.add_argument('--workers', type=int, help="读取图片头的线程数")
+    check.add_argument('--tolerance', type=float, default=1.0, help="越界判断的像素容差 (默认 1.0)")
+    check.add_argument('--limit', type=int, default=5, help="每类问题列出的示例数")
+    check.add_argument('--no-index', action='store_true', help="不读写 dataset_index.db，全部重新解析 JSON")
+    check.add_argument('--strict', action='store_true', help="有警告时也返回非零退出码")
+    check.add_argument('--json', action='store_true', help="以 JSON 输出")
+    check.set_defaults(func=_cmd_check)
+
+    dedup = subparsers.add_parser('dedup', help="用感知哈希查找近似重复的图片")
+    dedup.add_argument('labelme_root', help="LabelMe 数据集根目录")
+    dedup.add_argument('--threshold', type=int, default=4, help="最大汉明距离 (默认 4，共 64 位)")
+    dedup.add_argument('--linkage', choices=('single', 'leader'), default='single',
+                       help="single: 相似关系传递成簇; leader: 每簇内的图片都与第一张相近")
+    dedup.add_argument('--workers', type=int, help="进程数")
+    dedup.add_argument('--limit', type=int, default=10, help="列出的重复组数")
+    dedup.set_defaults(func=_cmd_dedup)
+
+    task = subparsers.add_parser('task', help="执行 task_config.py 中定义的任务 (train / validate / export / benchmark)")
+    task.add_argument('task_id')
+    for key in _PATH_KEYS:
+        task.add_argument(f'--{key}')
+    task.add_argument('--python-exe', help="覆盖配置文件中的 python_executable")
+    task.add_argument('--yolo-script', help="覆盖配置文件中的 yolo_script")
+    task.add_argument('--log-file', help="同时把输出写入该文件")
+    task.add_argument('--dry-run', action='store_true', help="只打印命令，不执行")
+    task.add_argument('--auto-profile', action='store_true',
+                      help="训练前按数据集、内存和 CPU 核数规划 cache / workers / batch")
+    task.set_defaults(func=_cmd_task)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"[错误] {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
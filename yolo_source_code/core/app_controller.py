@@ -9,13 +9,23 @@
 '''
 
 
+import os
+import time
+
 from PySide6.QtCore import QObject, Slot, QCoreApplication
 from PySide6.QtWidgets import QMessageBox
 
 from .process_worker import ProcessWorker
+from .metrics_monitor import MetricsMonitor
 from .conversion_worker import ConversionWorker
 from .config_manager import ConfigManager
-from .task_config import get_task_config
+from .task_config import get_task_config, build_task_command
+from .task_queue import TaskQueue, PipelineStage
+from .yolo_server_client import WarmYoloServer
+from logic.fingerprint import fingerprint_paths
+from logic.training_metrics import find_run_file
+from logic.image_tiler import tiled_dataset_dir
+from logic.training_profile import plan_training
 
 
 class AppController(QObject):
@@ -24,11 +34,22 @@ class AppController(QObject):
         self.window = main_window
         self.config = config
         self.worker = None
+        # 当前（或最近一次）训练的指标监视器，训练结束后仍保留，便于查询指标
+        self.metrics_monitor = None
+        # 常驻的 yolo 任务进程，跨任务复用；未启用时为 None，每个任务都启动新的子进程
+        self.yolo_server = WarmYoloServer(config.python_exe, config.yolo_script) if config.warm_yolo_worker else None
+        # 流水线（转换 -> 训练 -> 验证 -> 导出）任务队列，各阶段成功时的输入指纹记录在 pipeline_state.json
+        self.task_queue = TaskQueue('pipeline_state.json', self._start_worker, parent=self)
+        self.task_queue.stage_changed.connect(self.on_pipeline_stage_changed)
+        self.task_queue.stage_message.connect(self.window.add_log)
+        self.task_queue.queue_finished.connect(self.on_pipeline_finished)
 
         # 将UI按钮的点击信号连接到一个通用的处理函数
         self.window.train_button.clicked.connect(lambda: self.on_start_generic_task('train'))
         self.window.validate_button.clicked.connect(lambda: self.on_start_generic_task('validate'))
         self.window.export_button.clicked.connect(lambda: self.on_start_generic_task('export'))
+        self.window.benchmark_button.clicked.connect(lambda: self.on_start_generic_task('benchmark'))
+        self.window.pipeline_button.clicked.connect(self.on_start_pipeline)
 
         # 保持不变的信号连接
         self.window.stop_requested.connect(self.on_stop_task)
@@ -46,6 +67,9 @@ class AppController(QObject):
 
         # 为不同类型的worker连接不同的完成回调
         if isinstance(self.worker, ProcessWorker):
+            self.worker.log_batch.connect(self.window.add_log_batch)
+            self.worker.progress_message.connect(self.window.set_progress_line)
+            self.worker.resource_sample.connect(self.window.show_resources)
             self.worker.finished.connect(self.on_process_task_finished)
         elif isinstance(self.worker, ConversionWorker):
             self.worker.finished.connect(self.on_conversion_finished_callback)
@@ -67,34 +91,209 @@ class AppController(QObject):
                                              is_error=True)
                     return
 
-            command_template = task_info['command_template']
-            format_dict = {
-                'python_exe': f'"{self.config.python_exe}"',
-                'yolo_script': f'"{self.config.yolo_script}"',
-                **all_paths
-            }
-            command = command_template.format(**format_dict)
-
             self.window.log_console.clear()
             self.window.add_log(f"--- 开始执行任务: {task_name} ---")
-            self._start_worker(ProcessWorker(command))
+            self._start_worker(self._create_process_worker(task_id, all_paths))
 
         except Exception as e:
             self.window.show_message("配置错误", f"无法启动任务 '{task_id}': {e}", is_error=True)
 
+    def _build_task_command(self, task_id: str, paths: dict, overrides: dict = None) -> str:
+        """overrides 默认为配置文件 [Profile.<任务>] 中的参数（流水线的输入指纹也按这个命令计算）。"""
+        if overrides is None:
+            overrides = self.config.task_profile(task_id)
+        return build_task_command(task_id, paths, self.config.python_exe, self.config.yolo_script, overrides)
+
+    def _plan_task_args(self, task_id: str, paths: dict) -> dict:
+        """训练前按数据集和本机资源规划 cache / workers / batch，并把理由写入日志；规划失败时只用配置文件中的参数。"""
+        profile = self.config.task_profile(task_id)
+        if task_id != 'train' or not self.config.auto_train_profile:
+            return profile
+        try:
+            plan = plan_training(paths['train_dataset_folder'], paths.get('yaml_path'), overrides=profile)
+        except Exception as e:
+            self.window.add_log(f"[PROFILE] 资源规划失败 ({e})，使用默认参数。")
+            return profile
+        for reason in plan['reasons']:
+            self.window.add_log(f"[PROFILE] {reason}")
+        # 规划只给出 cache / workers / batch，[Profile.train] 中的其它参数照常传给训练命令
+        return {**profile, **plan['args']}
+
+    def _create_process_worker(self, task_id: str, paths: dict) -> ProcessWorker:
+        """创建（但不启动）命令行任务的 worker，需要时一并启动指标监视器。"""
+        task_info = get_task_config(task_id)
+        # 控制台只保留最近的日志，完整日志写入文件
+        run_id = f"{task_id}_{time.strftime('%Y%m%d_%H%M%S')}"
+        log_file = os.path.join(self.config.log_dir, f"{run_id}.log")
+        command = self._build_task_command(task_id, paths, self._plan_task_args(task_id, paths))
+        worker = ProcessWorker(command, log_file=log_file,
+                               report_path=self._report_path(run_id), server=self.yolo_server,
+                               sample_interval=self.config.resource_sample_interval,
+                               resource_path=os.path.join(self.config.log_dir, f"{run_id}_resources.json"))
+        if task_info.get('metrics_run_name'):
+            self._start_metrics_monitor(worker, task_info['metrics_run_name'])
+        return worker
+
+    def _create_conversion_worker(self, labelme_root: str) -> ConversionWorker:
+        transcode_format = None if self.config.transcode_format == 'none' else self.config.transcode_format
+        return ConversionWorker(labelme_root, self.config.conversion_options,
+                                materialize_mode=self.config.val_images_mode,
+                                transcode_format=transcode_format,
+                                transcode_quality=self.config.transcode_quality,
+                                integrity_check=self.config.integrity_check,
+                                dedup_mode=self.config.dedup_mode,
+                                dedup_threshold=self.config.dedup_threshold,
+                                tile_options=self.config.tile_options,
+                                label_cache=self.config.label_cache,
+                                split_mode=self.config.split_mode,
+                                split_stratify=self.config.split_stratify,
+                                report_path=self._report_path(f"convert_{time.strftime('%Y%m%d_%H%M%S')}"))
+
+    def _converted_dataset_dir(self, labelme_root: str) -> str:
+        """转换后用于训练的数据集文件夹：启用切片时是切片数据集，否则是 LabelMe 根目录本身。"""
+        tile_options = self.config.tile_options
+        if tile_options:
+            return str(tiled_dataset_dir(labelme_root, tile_options['tile_size'], tile_options['stride']))
+        return labelme_root
+
+    def _report_path(self, run_id: str):
+        """统计报告路径，配置中关闭 instrumentation 时返回 None（不统计）。"""
+        return os.path.join(self.config.log_dir, f"{run_id}_report.json") if self.config.instrumentation else None
+
+    def _start_metrics_monitor(self, worker: ProcessWorker, run_name: str):
+        """与 ProcessWorker 一起启动指标监视器，跟踪 runs/ 下本次运行的 results.csv。"""
+        runs_dir = os.path.join(worker.work_dir or os.getcwd(), 'runs')
+        self.metrics_monitor = MetricsMonitor(runs_dir, run_name, parent=self)
+        self.metrics_monitor.metrics_updated.connect(self.window.show_metrics)
+        worker.log_batch.connect(self.metrics_monitor.feed_lines)
+        self.metrics_monitor.start()
+
+    def get_training_metrics(self) -> dict:
+        """返回当前/最近一次训练的全部指标（列式），没有时返回空字典。"""
+        return self.metrics_monitor.series.to_dict() if self.metrics_monitor else {}
+
     @Slot(bool, str)
     def on_process_task_finished(self, is_success, message):
         """处理 ProcessWorker 完成的通用回调。"""
+        self.window.set_progress_line("")
+        if self.metrics_monitor:
+            self.metrics_monitor.stop()
+        if self.task_queue.is_running():
+            self._release_worker()
+            self.task_queue.stage_finished(is_success, message)
+            return
         self.window.set_ui_state_busy(False)
         if "用户手动终止" not in message:
             self.window.show_message("任务结束", message, is_error=not is_success)
+        self._release_worker()
+
+    def _release_worker(self):
         if self.worker:
             self.worker.wait()
             self.worker.deleteLater()
             self.worker = None
 
+    @Slot()
+    def on_start_pipeline(self):
+        """
+        一键流水线：转换 -> 训练 -> 验证 -> 导出，上游成功后自动启动下游。
+        输入（数据集、权重、配置文件、命令行）与上次成功运行时相同的阶段会被跳过。
+        """
+        if (self.worker and self.worker.isRunning()) or self.task_queue.is_running():
+            self.window.show_message("警告", "已有任务在运行中！")
+            return
+        # 各阶段共享的路径，上游阶段成功后会更新它（如训练完成后的 best.pt）
+        paths = self.window._get_current_paths()
+        labelme_root = paths.get('labelme_root')
+        has_convert = self.config.enable_data_conversion and bool(labelme_root)
+        if has_convert:
+            paths['train_dataset_folder'] = self._converted_dataset_dir(labelme_root)
+            if not paths['validation_folder']:
+                paths['validation_folder'] = os.path.join(labelme_root, 'val_images')
+        missing = [key for key in ('train_dataset_folder', 'yaml_path') if not paths[key]]
+        if missing:
+            field_names = "”、“".join(self.window.get_field_name_by_key(key) for key in missing)
+            self.window.show_message("错误", f"执行流水线前，请先提供“{field_names}”的路径。", is_error=True)
+            return
+
+        def dataset_inputs():
+            dataset = paths['train_dataset_folder']
+            return [os.path.join(dataset, name) for name in ('data.yaml', 'train.txt', 'val.txt', 'labels', 'images')]
+
+        def on_trained():
+            # 实际训练时只接受本阶段开始后写出的 best.pt，否则会把更早一次运行的旧权重交给验证和导出；
+            # 训练被跳过（输入未变化）时沿用最近一次的权重
+            skipped = train_stage.status == 'skipped'
+            since = 0 if skipped else train_stage.started_time
+            best_pt = find_run_file(os.path.join(os.getcwd(), 'runs'), 'train_results', 'weights/best.pt', since)
+            if best_pt is None and not (skipped and paths['best_pt_path']):
+                raise FileNotFoundError("训练完成，但未在 runs/ 中找到本次运行写出的 weights/best.pt")
+            if best_pt is not None:
+                paths['best_pt_path'] = str(best_pt)
+                self.window.set_path('best_pt_path', paths['best_pt_path'])
+
+        def on_exported():
+            # ONNX 导出在 best.pt 同一目录下生成 best.onnx，回填后可直接测速
+            onnx_path = os.path.splitext(paths['best_pt_path'])[0] + '.onnx'
+            if os.path.isfile(onnx_path):
+                paths['onnx_path'] = onnx_path
+                self.window.set_path('onnx_path', onnx_path)
+
+        stages = []
+        if has_convert:
+            stages.append(PipelineStage(
+                'convert', "数据转换", lambda: self._create_conversion_worker(labelme_root),
+                fingerprint=lambda: fingerprint_paths(
+                    [os.path.join(labelme_root, 'jsons'), os.path.join(labelme_root, 'images')],
+                    extra=[repr(sorted(self.config.conversion_options.items())), self.config.val_images_mode,
+                           self.config.transcode_format, str(self.config.transcode_quality),
+                           self.config.dedup_mode, str(self.config.dedup_threshold),
+                           repr(self.config.tile_options), str(self.config.label_cache),
+                           self.config.split_mode, str(self.config.split_stratify)]),
+                on_success=lambda: self.window.set_path('train_dataset_folder', paths['train_dataset_folder'])))
+        train_stage = PipelineStage(
+            'train', "训练", lambda: self._create_process_worker('train', paths),
+            depends_on=('convert',) if has_convert else (),
+            fingerprint=lambda: fingerprint_paths(dataset_inputs() + [paths['yaml_path']],
+                                                  extra=[self._build_task_command('train', paths)]),
+            on_success=on_trained)
+        stages.append(train_stage)
+        if paths['validation_folder']:
+            stages.append(PipelineStage(
+                'validate', "验证", lambda: self._create_process_worker('validate', paths), depends_on=('train',),
+                fingerprint=lambda: fingerprint_paths(
+                    [paths['best_pt_path'], paths['validation_folder'], paths['yaml_path']],
+                    extra=[self._build_task_command('validate', paths)])))
+        stages.append(PipelineStage(
+            'export', "导出ONNX", lambda: self._create_process_worker('export', paths), depends_on=('train',),
+            fingerprint=lambda: fingerprint_paths([paths['best_pt_path'], paths['yaml_path']],
+                                                  extra=[self._build_task_command('export', paths)]),
+            on_success=on_exported))
+
+        self.window.log_console.clear()
+        self.window.add_log("--- 开始执行流水线: " + " -> ".join(stage.name for stage in stages) + " ---")
+        self.window.show_pipeline_stages([(stage.stage_id, stage.describe()) for stage in stages])
+        self.task_queue.enqueue(stages)
+        self.window.set_ui_state_busy(True)
+        self.task_queue.start()
+
+    @Slot(str, str, float)
+    def on_pipeline_stage_changed(self, stage_id, status, seconds):
+        stage = next((stage for stage in self.task_queue.stages if stage.stage_id == stage_id), None)
+        if stage is not None:
+            self.window.update_pipeline_stage(stage_id, stage.describe())
+
+    @Slot(bool, str)
+    def on_pipeline_finished(self, is_success, summary):
+        self.window.set_ui_state_busy(False)
+        self.window.add_log("--- 流水线结束 ---")
+        self.window.add_log(summary)
+        self.window.show_message("流水线结束", summary, is_error=not is_success)
+
     @Slot()
     def on_stop_task(self):
+        # 停止时同时取消流水线中尚未开始的阶段
+        self.task_queue.cancel()
         if self.worker and self.worker.isRunning():
             if isinstance(self.worker, ProcessWorker):
                 self.worker.stop()
@@ -113,12 +312,18 @@ class AppController(QObject):
                 QCoreApplication.processEvents()
                 if self.worker:
                     self.worker.wait(5000)
+                self._shutdown_yolo_server()
                 self.window.allow_close()
             else:
                 self.window.prevent_close()
         else:
+            self._shutdown_yolo_server()
             self.window.allow_close()
 
+    def _shutdown_yolo_server(self):
+        if self.yolo_server is not None:
+            self.yolo_server.shutdown()
+
     # --- 数据转换部分保持不变 ---
     @Slot(dict)
     def on_start_conversion(self, paths):
@@ -126,18 +331,18 @@ class AppController(QObject):
         if not labelme_root:
             self.window.show_message("错误", "LabelMe数据集根目录不能为空！", is_error=True)
             return
-        conversion_worker = ConversionWorker(labelme_root)
-        self._start_worker(conversion_worker)
+        self._start_worker(self._create_conversion_worker(labelme_root))
 
     @Slot(bool, str)
     def on_conversion_finished_callback(self, is_success, result_or_error):
+        if self.task_queue.is_running():
+            self._release_worker()
+            self.task_queue.stage_finished(is_success, result_or_error)
+            return
         self.window.set_ui_state_busy(False)
         if is_success:
             message = f"数据转换成功！\n生成的 data.yaml 位于: {result_or_error}\n请手动选择相关路径进行训练。"
             self.window.show_message("成功", message)
         else:
             self.window.show_message("转换失败", result_or_error, is_error=True)
-        if self.worker:
-            self.worker.wait()
-            self.worker.deleteLater()
-            self.worker = None
\ No newline at end of file
+        self._release_worker()
\ No newline at end of file
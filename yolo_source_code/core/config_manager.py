@@ -19,6 +19,8 @@ class ConfigManager:
 
         self._load_env_config()
         self._load_feature_config()
+        self._load_logging_config()
+        self._load_task_profiles()
 
     def _load_env_config(self):
         try:
@@ -27,10 +29,140 @@ class ConfigManager:
         except (configparser.NoSectionError, configparser.NoOptionError) as e:
             raise ValueError(f"配置文件[Environment]部分格式错误: {e}")
 
+    def _load_logging_config(self):
+        try:
+            self.console_max_lines = self.config.getint('Logging', 'console_max_lines', fallback=5000)
+            self.log_dir = self.config.get('Logging', 'log_dir', fallback='logs').strip()
+            # 是否为每次任务写出各环节耗时的统计报告（写在 log_dir 中）
+            self.instrumentation = self.config.getboolean('Logging', 'instrumentation', fallback=True)
+            # 任务进程树资源占用的采样间隔（秒），0 表示不采样
+            self.resource_sample_interval = self.config.getfloat('Logging', 'resource_sample_interval', fallback=1.0)
+        except ValueError as e:
+            raise ValueError(f"配置文件[Logging]部分格式错误: {e}")
+        if self.console_max_lines <= 0:
+            raise ValueError("配置文件[Logging]部分格式错误: console_max_lines 必须大于 0")
+        if self.resource_sample_interval < 0:
+            raise ValueError("配置文件[Logging]部分格式错误: resource_sample_interval 不能为负数")
+
     def _load_feature_config(self):
         try:
             self.enable_data_conversion = self.config.getboolean('Features', 'enable_data_conversion')
         except (configparser.NoSectionError, configparser.NoOptionError):
             self.enable_data_conversion = False
         except ValueError as e:
-            raise ValueError(f"配置文件[Features]部分格式错误: {e}")
\ No newline at end of file
+            raise ValueError(f"配置文件[Features]部分格式错误: {e}")
+
+        # 数据转换后端: auto / thread / process
+        self.conversion_backend = self.config.get('Features', 'conversion_backend', fallback='auto').strip()
+        if self.conversion_backend not in ('auto', 'thread', 'process'):
+            raise ValueError(f"配置文件[Features]部分格式错误: 未知的 conversion_backend '{self.conversion_backend}'")
+
+        # 多边形简化与标签精度（0 表示不简化/不限制顶点数）
+        try:
+            self.simplify_tolerance = self.config.getfloat('Features', 'simplify_tolerance', fallback=0.0)
+            self.max_polygon_vertices = self.config.getint('Features', 'max_polygon_vertices', fallback=0)
+            self.label_decimals = self.config.getint('Features', 'label_decimals', fallback=6)
+            self.streaming_conversion = self.config.getboolean('Features', 'streaming_conversion', fallback=False)
+        except ValueError as e:
+            raise ValueError(f"配置文件[Features]部分格式错误: {e}")
+
+        # 转换前的完整性预检: warn 只提示 / strict 发现错误时中止转换 / off 不检查
+        self.integrity_check = self.config.get('Features', 'integrity_check', fallback='warn').strip().lower()
+        if self.integrity_check not in ('warn', 'strict', 'off'):
+            raise ValueError(f"配置文件[Features]部分格式错误: 未知的 integrity_check '{self.integrity_check}'")
+
+        # 近似重复图片: off 不检查 / drop 每组只保留一张 / group 同组图片划入同一侧
+        self.dedup_mode = self.config.get('Features', 'dedup_mode', fallback='off').strip().lower()
+        if self.dedup_mode not in ('off', 'drop', 'group'):
+            raise ValueError(f"配置文件[Features]部分格式错误: 未知的 dedup_mode '{self.dedup_mode}'")
+        try:
+            self.dedup_threshold = self.config.getint('Features', 'dedup_threshold', fallback=4)
+        except ValueError as e:
+            raise ValueError(f"配置文件[Features]部分格式错误: {e}")
+
+        # 切片训练: tile_size 为 0 时不切片；tile_stride 为 0 时默认重叠 20%
+        try:
+            self.tile_size = self.config.getint('Features', 'tile_size', fallback=0)
+            self.tile_stride = self.config.getint('Features', 'tile_stride', fallback=0)
+            self.tile_keep_empty = self.config.getfloat('Features', 'tile_keep_empty', fallback=0.1)
+            self.tile_min_visibility = self.config.getfloat('Features', 'tile_min_visibility', fallback=0.3)
+        except ValueError as e:
+            raise ValueError(f"配置文件[Features]部分格式错误: {e}")
+        if self.tile_size < 0 or self.tile_stride < 0 or (self.tile_size and self.tile_stride > self.tile_size):
+            raise ValueError("配置文件[Features]部分格式错误: 需要 tile_size >= 0 且 0 <= tile_stride <= tile_size")
+
+        # 转换结束时预先生成训练器的 labels.cache，训练开始时不必再逐个扫描图片和标签
+        try:
+            self.label_cache = self.config.getboolean('Features', 'label_cache', fallback=False)
+        except ValueError as e:
+            raise ValueError(f"配置文件[Features]部分格式错误: {e}")
+
+        # 训练/验证/导出交给常驻的 yolo 进程执行，省去每次启动时导入 torch / ultralytics 的开销
+        try:
+            self.warm_yolo_worker = self.config.getboolean('Features', 'warm_yolo_worker', fallback=False)
+        except ValueError as e:
+            raise ValueError(f"配置文件[Features]部分格式错误: {e}")
+
+        # 训练前根据数据集、内存和 CPU 核数规划 cache / workers / batch
+        try:
+            self.auto_train_profile = self.config.getboolean('Features', 'auto_train_profile', fallback=False)
+        except ValueError as e:
+            raise ValueError(f"配置文件[Features]部分格式错误: {e}")
+
+        # 训练/验证集划分: random 每次随机打乱 / hash 按文件名的稳定哈希，数据集增长时已有图片不换边
+        self.split_mode = self.config.get('Features', 'split_mode', fallback='random').strip().lower()
+        if self.split_mode not in ('random', 'hash'):
+            raise ValueError(f"配置文件[Features]部分格式错误: 未知的 split_mode '{self.split_mode}'")
+        try:
+            self.split_stratify = self.config.getboolean('Features', 'split_stratify', fallback=False)
+        except ValueError as e:
+            raise ValueError(f"配置文件[Features]部分格式错误: {e}")
+
+        # 验证集图片落地方式: copy / hardlink / symlink / reflink / auto
+        self.val_images_mode = self.config.get('Features', 'val_images_mode', fallback='copy').strip()
+        if self.val_images_mode not in ('copy', 'hardlink', 'symlink', 'reflink', 'auto'):
+            raise ValueError(f"配置文件[Features]部分格式错误: 未知的 val_images_mode '{self.val_images_mode}'")
+
+        # 训练图片转码: none 表示不转码，否则为 png / jpeg / webp
+        self.transcode_format = self.config.get('Features', 'transcode_format', fallback='none').strip().lower()
+        if self.transcode_format not in ('none', 'png', 'jpeg', 'webp'):
+            raise ValueError(f"配置文件[Features]部分格式错误: 未知的 transcode_format '{self.transcode_format}'")
+        try:
+            self.transcode_quality = self.config.getint('Features', 'transcode_quality', fallback=95)
+        except ValueError as e:
+            raise ValueError(f"配置文件[Features]部分格式错误: {e}")
+
+    def _load_task_profiles(self):
+        """[Profile.<任务>] 中的参数覆盖资源规划的结果，值为 auto 的项仍由规划决定。"""
+        self.task_profiles = {}
+        for section in self.config.sections():
+            if section.startswith('Profile.'):
+                self.task_profiles[section[len('Profile.'):]] = {
+                    key: value.strip() for key, value in self.config.items(section)
+                    if value.strip() and value.strip().lower() != 'auto'}
+
+    def task_profile(self, task_id: str) -> dict:
+        return dict(self.task_profiles.get(task_id, {}))
+
+    @property
+    def tile_options(self):
+        """传给 image_tiler.tile_dataset 的关键字参数，未启用切片时为 None。"""
+        if not self.tile_size:
+            return None
+        return {
+            'tile_size': self.tile_size,
+            'stride': self.tile_stride or None,
+            'keep_empty': self.tile_keep_empty,
+            'min_visibility': self.tile_min_visibility,
+        }
+
+    @property
+    def conversion_options(self) -> dict:
+        """传给 LabelmeConverter 的关键字参数。"""
+        return {
+            'backend': self.conversion_backend,
+            'simplify_tolerance': self.simplify_tolerance,
+            'max_vertices': self.max_polygon_vertices or None,
+            'decimals': self.label_decimals,
+            'streaming': self.streaming_conversion,
+        }
\ No newline at end of file
@@ -11,41 +11,196 @@
 
 from PySide6.QtCore import QThread, Signal
 from logic.data_converter import LabelmeConverter, split_dataset
+from logic.dataset_index import DatasetIndex
+from logic.integrity_checker import check_dataset, format_report
+from logic.image_transcoder import transcode_images
+from logic.image_dedup import find_near_duplicates
+from logic.image_tiler import tile_dataset
+from logic.label_cache import write_label_caches
+from logic.instrumentation import Instrumentation
 
 
 class ConversionWorker(QThread):
     """
     在后台线程中执行LabelMe到YOLO格式的转换。
+    传入 report_path 时统计各步骤及其内部环节的耗时，结束时写出 JSON 报告并在日志中输出汇总表。
+    integrity_check 为 'warn' / 'strict' 时先做完整性预检，strict 模式下发现错误即中止。
+    dedup_mode 为 'drop' / 'group' 时在划分前查找近似重复的图片（见 image_dedup.py）。
+    传入 tile_options 时在划分后生成切片数据集（见 image_tiler.py），finished 发出的是切片数据集的 data.yaml。
+    split_mode / split_stratify 见 data_converter.split_dataset。
+    label_cache 为 True 时最后为 data.yaml 中的列表写出训练器的 labels.cache（见 label_cache.py）。
     """
     log_message = Signal(str)
     finished = Signal(bool, str)
 
-    def __init__(self, labelme_root_path: str):
+    def __init__(self, labelme_root_path: str, converter_options: dict = None, materialize_mode: str = 'copy',
+                 transcode_format: str = None, transcode_quality: int = 95, report_path: str = None,
+                 integrity_check: str = 'warn', dedup_mode: str = 'off', dedup_threshold: int = 4,
+                 tile_options: dict = None, label_cache: bool = False, split_mode: str = 'random',
+                 split_stratify: bool = False):
         super().__init__()
         self.root_path = labelme_root_path
+        self.converter_options = converter_options or {}
+        self.materialize_mode = materialize_mode
+        self.transcode_format = transcode_format
+        self.transcode_quality = transcode_quality
+        self.report_path = report_path
+        self.integrity_check = integrity_check
+        self.dedup_mode = dedup_mode
+        self.dedup_threshold = dedup_threshold
+        self.tile_options = tile_options
+        self.label_cache = label_cache
+        self.split_mode = split_mode
+        self.split_stratify = split_stratify
+        self.instrumentation = Instrumentation(enabled=bool(report_path))
+
+    def _emit_report(self, status: str):
+        if not self.report_path:
+            return
+        try:
+            self.instrumentation.write_report(self.report_path, task='convert', dataset=self.root_path, status=status,
+                                              options=self.converter_options)
+            self.log_message.emit(f"[统计] 各环节耗时（报告: {self.report_path}）:")
+            self.log_message.emit(self.instrumentation.summary_table())
+        except OSError as e:
+            self.log_message.emit(f"[警告] 写出统计报告失败: {e}")
+
+    def _log_dataset_stats(self, stats: dict):
+        self.log_message.emit(f"[统计] 标注 {stats['annotated']} 个，形状 {stats['shapes']} 个，"
+                              f"顶点 {stats['vertices']} 个；图片 {stats['files']['image']} 张，"
+                              f"标签 {stats['files']['label']} 个")
+        for label, entry in stats['classes'].items():
+            self.log_message.emit(f"    {label}: {entry['instances']} 个实例 / {entry['images']} 张图片")
+
+    def _run_integrity_check(self, use_index: bool):
+        self.log_message.emit("[预检] 正在检查图片尺寸、标注范围和文件配对...")
+        with self.instrumentation.timer('step.check'):
+            if use_index:
+                with DatasetIndex(self.root_path) as index:
+                    report = check_dataset(self.root_path, index=index, instrumentation=self.instrumentation)
+            else:
+                report = check_dataset(self.root_path, instrumentation=self.instrumentation)
+        for line in format_report(report):
+            self.log_message.emit(line)
+        if report['errors'] and self.integrity_check == 'strict':
+            raise ValueError(f"完整性预检发现 {report['errors']} 个错误，已中止转换（integrity_check = strict）。")
+
+    def _find_duplicates(self):
+        with self.instrumentation.timer('step.dedup'):
+            # 丢弃时每张被丢弃的图片都要与保留的代表足够接近，所以用 leader 聚类
+            result = find_near_duplicates(self.root_path, threshold=self.dedup_threshold,
+                                          linkage='leader' if self.dedup_mode == 'drop' else 'single')
+        self.instrumentation.count('dedup.hashed', result['hashed'])
+        self.instrumentation.count('dedup.cached', result['cached'])
+        self.instrumentation.count('dedup.duplicates', result['duplicates'])
+        if self.dedup_mode == 'drop':
+            outcome = f"{result['duplicates']} 张多余图片将被丢弃"
+        else:
+            outcome = f"涉及 {sum(len(c) for c in result['clusters'])} 张图片，同组图片划入同一侧"
+        self.log_message.emit(
+            f"[成功] 计算哈希 {result['hashed']} 张，缓存命中 {result['cached']} 张，失败 {result['failed']} 张；"
+            f"发现 {len(result['clusters'])} 组近似重复，{outcome}。")
+        return result['clusters']
+
+    def _tile(self, classes):
+        with self.instrumentation.timer('step.tile'):
+            result = tile_dataset(self.root_path, classes, decimals=self.converter_options.get('decimals', 6),
+                                  **self.tile_options)
+        for key in ('tiled', 'skipped', 'failed', 'positive', 'empty_kept', 'empty_dropped', 'clipped_away'):
+            self.instrumentation.count(f'tile.{key}', result[key])
+        self.log_message.emit(
+            f"[成功] 切片 {result['tiled']} 张图片（缓存命中 {result['skipped']} 张，失败 {result['failed']} 张），"
+            f"训练集 {result['train_tiles']} 片 / 验证集 {result['val_tiles']} 片；"
+            f"本次生成含目标 {result['positive']} 片、空白保留 {result['empty_kept']} 片、"
+            f"空白丢弃 {result['empty_dropped']} 片，裁剪后丢弃 {result['clipped_away']} 个过小的形状。")
+        self.log_message.emit(f"切片数据集: {result['data_yaml']}（训练时 imgsz 可设为 {self.tile_options['tile_size']}）")
+        return result['data_yaml']
+
+    def _write_label_caches(self, data_yaml_path: str):
+        with self.instrumentation.timer('step.label_cache'):
+            results = write_label_caches(data_yaml_path)
+        for key, result in results.items():
+            self.instrumentation.count(f'label_cache.{key}', result['images'])
+            self.log_message.emit(
+                f"[成功] {key}: {result['images']} 张图片 -> {result['path']}（标签 {result['found']}，"
+                f"缺少 {result['missing']}，空 {result['empty']}，损坏 {result['corrupt']}）")
 
     def run(self):
+        # 切片时训练使用切片数据集自己的列表，转码只会改写根目录的 train.txt / val.txt，白白浪费时间
+        transcode_format = None if self.tile_options else self.transcode_format
+        total_steps = 3 + bool(transcode_format) + (self.dedup_mode != 'off') + bool(self.tile_options) + \
+            bool(self.label_cache)
+        step = iter(range(1, total_steps + 1))
+        instr = self.instrumentation
         try:
             self.log_message.emit("=" * 50)
             self.log_message.emit(f"开始处理数据集: {self.root_path}")
+            if self.transcode_format and not transcode_format:
+                self.log_message.emit("[WARNING] 已启用切片（tile_size），训练使用切片数据集，跳过训练图片转码。")
+            if self.integrity_check != 'off':
+                self._run_integrity_check(self.converter_options.get('use_index', True))
 
             # 步骤 1: 转换 LabelMe JSONs 到 YOLO txt
-            self.log_message.emit("[步骤 1/3] 正在转换 LabelMe JSON 文件为 YOLO labels...")
-            converter = LabelmeConverter(self.root_path)
-            convert_result = converter.convert()
-            self.log_message.emit(f"[成功] {convert_result['message']}")
+            self.log_message.emit(f"[步骤 {next(step)}/{total_steps}] 正在转换 LabelMe JSON 文件为 YOLO labels...")
+            converter = LabelmeConverter(self.root_path, **self.converter_options, instrumentation=instr)
+            with instr.timer('step.convert'):
+                convert_result = converter.convert()
+            self.log_message.emit(f"[成功] {convert_result['message']} (后端: {convert_result['backend']})")
             self.log_message.emit(f"发现的类别: {convert_result['classes']}")
 
-            # 步骤 2: 划分数据集并生成 data.yaml
-            self.log_message.emit("[步骤 2/3] 正在划分训练/验证集并生成 data.yaml...")
-            data_yaml_path = split_dataset(self.root_path, convert_result['classes'])
+            # 步骤（可选）: 查找近似重复的图片，供划分时丢弃或保持在同一侧
+            duplicates = None
+            if self.dedup_mode != 'off':
+                self.log_message.emit(f"[步骤 {next(step)}/{total_steps}] 正在计算感知哈希，查找近似重复的图片...")
+                duplicates = self._find_duplicates()
+
+            # 步骤: 划分数据集并生成 data.yaml（有索引时直接查询索引，不再扫描文件夹）
+            self.log_message.emit(f"[步骤 {next(step)}/{total_steps}] 正在划分训练/验证集并生成 data.yaml...")
+            split_options = {'materialize_mode': self.materialize_mode, 'instrumentation': instr,
+                             'duplicates': duplicates, 'duplicate_mode': 'drop' if self.dedup_mode == 'drop' else 'group',
+                             'split_mode': self.split_mode, 'stratify': self.split_stratify}
+            with instr.timer('step.split'):
+                if converter.use_index:
+                    with DatasetIndex(self.root_path) as index:
+                        data_yaml_path = split_dataset(self.root_path, convert_result['classes'], index=index,
+                                                       **split_options)
+                        self._log_dataset_stats(index.stats())
+                else:
+                    data_yaml_path = split_dataset(self.root_path, convert_result['classes'], **split_options)
             self.log_message.emit(f"[成功] 已生成YOLO配置文件: {data_yaml_path}")
 
-            # 步骤 3. 添加新的日志反馈
-            self.log_message.emit("[步骤 3/3] 正在复制验证集图片到 'val_images' 文件夹...")
+            # 步骤: 添加新的日志反馈
+            self.log_message.emit(f"[步骤 {next(step)}/{total_steps}] 正在落地验证集图片到 'val_images' 文件夹 (模式: {self.materialize_mode})...")
             # 这一步已经在split_dataset中完成，这里只是记录日志
-            self.log_message.emit("[成功] 验证集图片已复制。")
+            self.log_message.emit("[成功] 验证集图片已就绪。")
+
+            # 步骤（可选）: 切片，生成可以用小 imgsz 训练的数据集
+            if self.tile_options:
+                self.log_message.emit(f"[步骤 {next(step)}/{total_steps}] 正在将图片切分为 "
+                                      f"{self.tile_options['tile_size']} 像素的重叠切片...")
+                data_yaml_path = self._tile(convert_result['classes'])
+
+            # 步骤（可选）: 转码训练图片，train.txt / val.txt 改为指向转码结果
+            if transcode_format:
+                self.log_message.emit(f"[步骤 {next(step)}/{total_steps}] 正在将训练图片转码为 {transcode_format}...")
+                with instr.timer('step.transcode'):
+                    result = transcode_images(self.root_path, transcode_format, self.transcode_quality)
+                for key in ('transcoded', 'skipped', 'failed', 'removed'):
+                    instr.count(f'transcode.{key}', result[key])
+                instr.add_bytes('transcode.in', result['bytes_in'])
+                instr.add_bytes('transcode.out', result['bytes_out'])
+                self.log_message.emit(
+                    f"[成功] 转码 {result['transcoded']} 张，缓存命中 {result['skipped']} 张，失败 {result['failed']} 张，"
+                    f"删除过期 {result['removed']} 张；节省 {result['bytes_saved'] / 1024 / 1024:.1f} MB "
+                    f"({result['bytes_in'] / 1024 / 1024:.1f} MB -> {result['bytes_out'] / 1024 / 1024:.1f} MB)，"
+                    f"吞吐 {result['images_per_second']:.1f} 张/秒。")
+
+            # 步骤（可选）: 所有改写列表的步骤完成后生成训练器的标签缓存
+            if self.label_cache:
+                self.log_message.emit(f"[步骤 {next(step)}/{total_steps}] 正在生成训练器的标签缓存 (labels.cache)...")
+                self._write_label_caches(data_yaml_path)
 
+            self._emit_report('success')
             self.log_message.emit("=" * 50)
 
             self.finished.emit(True, data_yaml_path)
@@ -53,4 +208,5 @@ class ConversionWorker(QThread):
         except Exception as e:
             error_msg = f"[错误] 数据转换失败: {e}"
             self.log_message.emit(error_msg)
+            self._emit_report('failed')
             self.finished.emit(False, str(e))
\ No newline at end of file
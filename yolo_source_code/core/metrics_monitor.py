@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+'''
+@Project ：yolo_source_code
+@File    ：metrics_monitor.py
+@Author  ：fengzhengxiong
+@Date    ：2026/10/18 14:30
+'''
+
+
+import time
+from pathlib import Path
+
+from PySide6.QtCore import QObject, QTimer, Signal, Slot
+
+from logic.training_metrics import MetricSeries, ResultsCsvTailer, StdoutMetricsParser, find_results_csv
+
+
+class MetricsMonitor(QObject):
+    """
+    与 ProcessWorker 一起启动，实时收集训练指标。
+    定时增量读取本次训练的 results.csv；在它出现之前，用标准输出中的 epoch 行兜底。
+    指标保存在 self.series（列式存储）中，每次有新数据时发出 metrics_updated 信号。
+    """
+    metrics_updated = Signal(dict)
+
+    def __init__(self, runs_dir: str, run_name: str, poll_interval_ms: int = 2000, parent=None):
+        super().__init__(parent)
+        self.runs_dir = Path(runs_dir)
+        self.run_name = run_name
+        self.series = MetricSeries()
+        self.csv_path = None
+        self._tailer = None
+        self._stdout_parser = StdoutMetricsParser(self.series)
+        self._started_at = time.time()
+        self._timer = QTimer(self)
+        self._timer.setInterval(poll_interval_ms)
+        self._timer.timeout.connect(self.poll)
+
+    def start(self):
+        self._started_at = time.time()
+        self._timer.start()
+
+    def stop(self):
+        """停止轮询，最后再读一次，确保最后一个 epoch 不丢失。"""
+        self._timer.stop()
+        self.poll()
+
+    @Slot()
+    def poll(self):
+        if self._tailer is None:
+            self.csv_path = find_results_csv(self.runs_dir, self.run_name, self._started_at)
+            if self.csv_path is None:
+                return
+            # 找到 results.csv 后以它为准，丢弃 stdout 兜底数据
+            self.series.clear()
+            self._tailer = ResultsCsvTailer(self.csv_path, self.series)
+        if self._tailer.poll():
+            self._emit_latest()
+
+    @Slot(list)
+    def feed_lines(self, lines):
+        """接收 ProcessWorker.log_batch 的输出行，results.csv 出现前用于兜底。"""
+        if self._tailer is not None:
+            return
+        if any([self._stdout_parser.feed(line) for line in lines]):
+            self._emit_latest()
+
+    def _emit_latest(self):
+        latest = self.series.latest()
+        if self._stdout_parser.total_epochs:
+            latest['total_epochs'] = self._stdout_parser.total_epochs
+        self.metrics_updated.emit(latest)
@@ -11,75 +11,299 @@
 
 import subprocess
 import os
-import psutil
+import time
+import queue
+import codecs
+import threading
 from PySide6.QtCore import QThread, Signal
 
+from logic.instrumentation import Instrumentation
+from logic.resource_sampler import ResourceSampler, format_summary
+
 
 class ProcessWorker(QThread):
     """
     经过强化的工作线程，专注于健壮的子进程管理。
+    子进程的输出按时间/行数批量发送给界面，tqdm 之类用回车符刷新的进度行
+    会被合并为一条"实时行"，避免逐行发信号把界面事件循环淹没。
+    传入 report_path 时记录子进程启动、首次输出、日志写入等耗时，结束时写出 JSON 报告。
+    传入 server（WarmYoloServer）时 yolo 命令和批量推理脚本交给常驻进程执行，常驻进程不可用时退回子进程方式。
+    sample_interval > 0 时在后台采样进程树的 CPU / 内存 / 磁盘 I/O（见 resource_sampler.py），
+    每个样本通过 resource_sample 发出，结束时写入 resource_path。
     """
     log_message = Signal(str)
+    log_batch = Signal(list)
+    progress_message = Signal(str)
+    resource_sample = Signal(dict)
     finished = Signal(bool, str)
 
-    def __init__(self, command: str, work_dir: str = None):
+    # 批量发送的时间预算（秒）和行数上限
+    FLUSH_INTERVAL = 0.1
+    FLUSH_MAX_LINES = 500
+
+    def __init__(self, command: str, work_dir: str = None, log_file: str = None, report_path: str = None,
+                 server=None, sample_interval: float = 0.0, resource_path: str = None):
         super().__init__()
         self.command = command
         self.work_dir = work_dir
+        self.log_file = log_file
+        self.report_path = report_path
+        self.server = server
+        self._server_return_code = None
+        self.sample_interval = sample_interval
+        self.resource_path = resource_path
+        self.instrumentation = Instrumentation(enabled=bool(report_path))
         self.process = None
         self._is_stopped = False
+        self._spawned_at = 0.0
+
+    def _emit_report(self, status: str):
+        if not self.report_path:
+            return
+        try:
+            self.instrumentation.write_report(self.report_path, command=self.command, status=status)
+            self.log_batch.emit([f"[统计] 各环节耗时（报告: {self.report_path}）:"]
+                                + self.instrumentation.summary_table().split('\n'))
+        except OSError as e:
+            self.log_message.emit(f"[WARNING] 写出统计报告失败: {e}")
 
     def run(self):
         self._is_stopped = False
+        instr = self.instrumentation
+        run_start = time.perf_counter()
+        status = 'failed'
         self.log_message.emit(f"[COMMAND] {self.command}")
         if self.work_dir:
             self.log_message.emit(f"[WORKDIR] {self.work_dir}")
 
+        log_fp = None
+        is_success, message = False, ""
+        sampler = None
+        if self.sample_interval > 0:
+            sampler = ResourceSampler(self._sampled_pid, self.sample_interval, on_sample=self.resource_sample.emit)
+            sampler.start()
         try:
-            # shell=True 在Windows下对于复杂命令有时是必要的，但为了更好的进程控制，
-            # 我们将命令拆分。对于你的情况 "python yolo.exe ...", shell=True 也可以
+            if self.log_file:
+                os.makedirs(os.path.dirname(os.path.abspath(self.log_file)), exist_ok=True)
+                log_fp = open(self.log_file, 'w', encoding='utf-8')
+                self.log_message.emit(f"[LOGFILE] {self.log_file}")
+                log_fp.write(f"[COMMAND] {self.command}\n")
+
+            return_code = self._run_on_server(log_fp) if self._submit_to_server() else None
+            if return_code is None and not self._is_stopped:
+                return_code = self._run_subprocess(log_fp)
+
+            if self._is_stopped:
+                # 如果是用户主动停止，返回特定消息
+                message, status = "任务被用户手动终止。", 'stopped'
+            elif return_code == 0:
+                is_success, message, status = True, "任务成功完成！", 'success'
+            else:
+                message = f"任务异常结束，返回码: {return_code}"
+
+        except Exception as e:
+            message = f"执行命令时发生严重错误: {e}"
+            self.log_message.emit(f"[ERROR] {message}")
+        finally:
+            if sampler is not None:
+                self._finish_sampling(sampler)
+            # 确保无论如何都尝试清理残留进程
+            with instr.timer('process.cleanup'):
+                self._cleanup_process()
+            if log_fp:
+                log_fp.close()
+        # 统计报告在 finished 之前发出，保证它出现在本次任务的日志里
+        instr.add_time('process.wall', time.perf_counter() - run_start)
+        self._emit_report(status)
+        self.finished.emit(is_success, message)
+
+    def _sampled_pid(self):
+        """采样线程调用：当前任务进程（或执行任务的常驻进程）的 PID。"""
+        process = self.process
+        return process.pid if process is not None else None
+
+    def _finish_sampling(self, sampler: ResourceSampler):
+        sampler.stop()
+        if not sampler.series.total:
+            return
+        self.log_message.emit(f"[资源] {format_summary(sampler)}")
+        if self.resource_path:
+            try:
+                sampler.write(self.resource_path)
+                self.log_message.emit(f"[资源] 采样数据: {self.resource_path}")
+            except OSError as e:
+                self.log_message.emit(f"[WARNING] 写出资源采样数据失败: {e}")
+
+    def _run_subprocess(self, log_fp) -> int:
+        # shell=True 在Windows下对于复杂命令有时是必要的，但为了更好的进程控制，
+        # 我们将命令拆分。对于你的情况 "python yolo.exe ...", shell=True 也可以
+        # 以二进制方式读取输出，这样才能区分 '\r'（进度刷新）和 '\n'（新的一行）
+        with self.instrumentation.timer('process.spawn'):
             self.process = subprocess.Popen(
                 self.command,
                 shell=True,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
-                text=True,
-                encoding='utf-8',
-                errors='replace',
                 cwd=self.work_dir,
                 creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
             )
+        self._spawned_at = time.perf_counter()
 
-            # 实时读取输出
-            for line in iter(self.process.stdout.readline, ''):
-                if self._is_stopped:
-                    # 如果标记为停止，跳出循环，进入进程清理阶段
-                    break
+        # 实时读取输出
+        self._pump_output(log_fp, self._read_stdout)
 
-                line = line.strip()
-                if not line:
-                    continue
+        # 等待进程自然结束，获取返回码
+        return self.process.wait()
 
-                self.log_message.emit(line)
+    def _run_on_server(self, log_fp):
+        """
+        在常驻进程中执行已提交的任务，返回返回码。被停止，或常驻进程启动失败（需要改用子进程重新执行）时返回 None。
+        """
+        self._spawned_at = time.perf_counter()
+        self._pump_output(log_fp, self._read_server_job)
+        return_code = self._server_return_code
+        if return_code is not None:
+            # 常驻进程在任务结束后继续保留，不参与清理
+            self.process = None
+            return return_code
+        # 常驻进程已退出（被停止或崩溃），回收它
+        self.process.wait()
+        if self._is_stopped:
+            return None
+        if not self.server.jobs_done:
+            # 一个任务都没有完成就退出，多半是训练环境无法导入 ultralytics，之后改用子进程
+            self.server.disabled = True
+            self.log_message.emit("[WARM] 常驻进程启动失败，改用子进程执行。")
+            return None
+        self.log_message.emit("[WARM] 常驻进程在任务结束前退出。")
+        return -1
 
-            # 等待进程自然结束，获取返回码
-            return_code = self.process.wait()
+    def _submit_to_server(self) -> bool:
+        """把命令交给常驻进程执行，成功提交时返回 True；不适用或不可用时返回 False（改用子进程）。"""
+        if self.server is None or self.server.disabled:
+            return False
+        job = self.server.job_for(self.command)
+        if job is None:
+            return False
+        try:
+            with self.instrumentation.timer('process.spawn'):
+                cold = not self.server.is_running()
+                self.server.start()
+                self.server.submit(job, os.path.abspath(self.work_dir or os.getcwd()))
+        except OSError as e:
+            self.log_message.emit(f"[WARM] 无法使用常驻进程 ({e})，改用子进程执行。")
+            return False
+        self.process = self.server.process
+        self.log_message.emit(f"[WARM] 由常驻进程 PID: {self.process.pid} 执行"
+                              f"{'（首次启动，需要先导入框架）' if cold else '（框架已加载）'}")
+        return True
 
-            if self._is_stopped:
-                # 如果是用户主动停止，返回特定消息
-                self.finished.emit(False, "任务被用户手动终止。")
-            elif return_code == 0:
-                self.finished.emit(True, "任务成功完成！")
-            else:
-                self.finished.emit(False, f"任务异常结束，返回码: {return_code}")
+    def _read_server_job(self, chunks: queue.Queue):
+        """读取线程（常驻进程）：读到当前任务的结束标记为止，返回码存入 _server_return_code。"""
+        self._server_return_code = None
+        try:
+            self._server_return_code = self.server.read_job_output(chunks.put)
+        except (OSError, ValueError):
+            pass
+        finally:
+            chunks.put(None)
 
-        except Exception as e:
-            error_msg = f"执行命令时发生严重错误: {e}"
-            self.log_message.emit(f"[ERROR] {error_msg}")
-            self.finished.emit(False, error_msg)
+    def _read_stdout(self, chunks: queue.Queue):
+        """读取线程：把子进程的原始输出块放入队列，结束时放入 None。"""
+        try:
+            stdout = self.process.stdout
+            while True:
+                chunk = stdout.read1(65536)
+                if not chunk:
+                    break
+                chunks.put(chunk)
+        except (OSError, ValueError):
+            pass
         finally:
-            # 确保无论如何都尝试清理残留进程
-            self._cleanup_process()
+            chunks.put(None)
+
+    def _pump_output(self, log_fp, reader):
+        """
+        消费子进程输出：以 '\n' 结尾的是完整行，累积后按时间/行数批量发送；
+        以 '\r' 结尾的是进度刷新，只保留最新的一条作为实时行。
+        完整行同时写入日志文件。
+        """
+        chunks = queue.Queue()
+        threading.Thread(target=reader, args=(chunks,), daemon=True).start()
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+        pending_lines = []
+        partial = ''
+        live_line, sent_live_line = '', ''
+        last_flush = time.monotonic()
+        eof = False
+        # 统计值先累积在局部变量里，结束时一次性记录，不给逐块处理增加开销
+        instr = self.instrumentation
+        output_bytes = line_count = batch_count = progress_count = 0
+        first_output = True
+        while not eof:
+            # 如果标记为停止，不再读取，把已收到的完整行发出并写入日志后跳出循环，进入进程清理阶段
+            stopped = self._is_stopped
+            text = ''
+            if not stopped:
+                try:
+                    chunk = chunks.get(timeout=self.FLUSH_INTERVAL)
+                except queue.Empty:
+                    chunk = b''
+                if chunk is None:
+                    eof = True
+                    text = decoder.decode(b'', final=True) + '\n'
+                else:
+                    text = decoder.decode(chunk)
+                    output_bytes += len(chunk)
+                    if first_output and chunk:
+                        # 子进程从启动到第一次输出的时间（解释器与框架的导入开销）
+                        first_output = False
+                        instr.add_time('process.first_output', time.perf_counter() - self._spawned_at)
+
+            if text:
+                # Windows 的 '\r\n' 视为普通换行
+                segments = (partial + text).replace('\r\n', '\n').split('\n')
+                partial = segments.pop()
+                for segment in segments:
+                    # 一行内的多次 '\r' 刷新只保留最后一次
+                    line = segment.rsplit('\r', 1)[-1].strip()
+                    if line:
+                        pending_lines.append(line)
+                # 尚未换行的部分就是当前的实时行，之前的 '\r' 刷新已经过时。
+                # 以 '\r' 结尾时保留它，它可能是被分到两块里的 '\r\n'
+                head, _, tail = partial.rpartition('\r')
+                if not tail and head:
+                    tail = head.rsplit('\r', 1)[-1]
+                    partial = tail + '\r'
+                else:
+                    partial = tail
+                live_line = tail.strip()
+
+            now = time.monotonic()
+            if (stopped or eof or len(pending_lines) >= self.FLUSH_MAX_LINES
+                    or now - last_flush >= self.FLUSH_INTERVAL):
+                if pending_lines:
+                    self.log_batch.emit(pending_lines)
+                    if log_fp:
+                        with instr.timer('process.log_write'):
+                            log_fp.write('\n'.join(pending_lines) + '\n')
+                            log_fp.flush()
+                    line_count += len(pending_lines)
+                    batch_count += 1
+                    pending_lines = []
+                if live_line != sent_live_line:
+                    self.progress_message.emit(live_line)
+                    sent_live_line = live_line
+                    progress_count += 1
+                last_flush = now
+            if stopped:
+                break
+
+        instr.add_bytes('process.output', output_bytes)
+        instr.count('process.lines', line_count)
+        instr.count('process.log_batches', batch_count)
+        instr.count('process.progress_updates', progress_count)
 
     def stop(self):
         """
@@ -100,6 +324,8 @@ class ProcessWorker(QThread):
             return
 
         self.log_message.emit(f"[CLEANUP] 开始清理进程 PID: {self.process.pid}")
+        # psutil 只在终止进程时需要，按需导入
+        import psutil
         try:
             # 找到父进程
             parent = psutil.Process(self.process.pid)
@@ -17,9 +17,19 @@
 #                      这些key必须与 MainWindow._get_current_paths() 返回的字典中的key一致。
 #  - 'command_template': 一个f-string格式的命令行模板。
 #                        占位符 {key} 会被 MainWindow._get_current_paths() 提供的路径替换。
-#                        {python_exe} 和 {yolo_script} 会被自动替换。
+#                        {python_exe}、{yolo_script}、{predict_script} 和 {benchmark_script} 会被自动替换。
+#  - 'metrics_run_name': (可选) 命令中的 name=，设置后会实时跟踪该次运行的 results.csv。
+#  - 'tunable_args': (可选) 追加在命令末尾的 key=value 参数及其默认值。
+#                    启用资源规划时由 logic/training_profile.py 重新选择，
+#                    配置文件 [Profile.<任务>] 中的同名项优先于二者。
 # ==========================================================
 
+from pathlib import Path
+
+# 批量推理与 ONNX 测速脚本，与 yolo 命令一样由训练环境的 python 执行
+PREDICT_SCRIPT = Path(__file__).resolve().parent.parent / 'logic' / 'batch_predict.py'
+BENCHMARK_SCRIPT = Path(__file__).resolve().parent.parent / 'logic' / 'onnx_benchmark.py'
+
 TASK_CONFIG = {
     'train': {
         'name': "训练",
@@ -27,17 +37,20 @@ TASK_CONFIG = {
         'command_template': (
             '{python_exe} {yolo_script} cfg="{yaml_path}" '
             'train '
-            'data="{train_dataset_folder}/data.yaml" name=train_results  batch=-1'
-        )
+            'data="{train_dataset_folder}/data.yaml" name=train_results'
+        ),
+        'metrics_run_name': 'train_results',
+        'tunable_args': {'batch': -1},
     },
     'validate': {
         'name': "验证",
         'required_paths': ['yaml_path', 'best_pt_path', 'validation_folder'],
         'command_template': (
-            '{python_exe} {yolo_script} cfg="{yaml_path}" '
-            'predict '
-            'model="{best_pt_path}" source="{validation_folder}" name=val_results retina_masks=True batch=1'
-        )
+            '{python_exe} {predict_script} cfg="{yaml_path}" '
+            'model="{best_pt_path}" source="{validation_folder}" name=val_results'
+        ),
+        # 逐张渲染（原来的 yolo predict 行为）: batch=1 retina_masks=True save=True
+        'tunable_args': {'batch': 16, 'retina_masks': False, 'masks': 'polygon', 'save': False, 'shard_size': 500},
     },
     'export': {
         'name': "导出ONNX",
@@ -48,10 +61,38 @@ TASK_CONFIG = {
             'model="{best_pt_path}" batch=1'
         )
     },
+    'benchmark': {
+        'name': "ONNX测速",
+        'required_paths': ['onnx_path', 'validation_folder'],
+        'command_template': (
+            '{python_exe} {benchmark_script} '
+            'model="{onnx_path}" source="{validation_folder}"'
+        ),
+        'tunable_args': {'batch': '1,2,4,8', 'threads': 'auto', 'inter_threads': 1, 'imgsz': 'auto',
+                         'runs': 30, 'warmup': 5},
+    },
 }
 
 def get_task_config(task_id: str) -> dict:
     """获取指定任务的配置，如果不存在则抛出异常。"""
     if task_id not in TASK_CONFIG:
         raise ValueError(f"任务 '{task_id}' 未在 task_config.py 中定义。")
-    return TASK_CONFIG[task_id]
\ No newline at end of file
+    return TASK_CONFIG[task_id]
+
+
+def build_task_command(task_id: str, paths: dict, python_exe: str, yolo_script: str, overrides: dict = None) -> str:
+    """
+    用路径字典填充任务的命令行模板（GUI 和命令行入口共用），
+    再追加 tunable_args（overrides 中的值优先）。
+    """
+    format_dict = {
+        'python_exe': f'"{python_exe}"',
+        'yolo_script': f'"{yolo_script}"',
+        'predict_script': f'"{PREDICT_SCRIPT}"',
+        'benchmark_script': f'"{BENCHMARK_SCRIPT}"',
+        **paths
+    }
+    task_info = get_task_config(task_id)
+    command = task_info['command_template'].format(**format_dict)
+    tunable = {**task_info.get('tunable_args', {}), **(overrides or {})}
+    return ' '.join([command] + [f'{key}={value}' for key, value in tunable.items()])
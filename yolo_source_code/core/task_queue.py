@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+'''
+@Project ：yolo_source_code
+@File    ：task_queue.py
+@Author  ：fengzhengxiong
+@Date    ：2026/10/18 15:10
+'''
+
+
+import json
+import time
+from typing import Callable, List, Optional
+
+from PySide6.QtCore import QObject, Signal
+
+
+class PipelineStage:
+    """
+    流水线中的一个阶段。
+    - depends_on: 上游阶段的 stage_id，上游成功（或被跳过）后才会启动
+    - fingerprint: 返回输入指纹的函数；与上次成功运行时相同则跳过该阶段。为 None 表示总是执行
+    - create_worker: 返回一个尚未启动的 worker（ProcessWorker / ConversionWorker）
+    - on_success: 成功或跳过后的回调，用于把产出（如 best.pt 路径）传给下游
+    """
+    STATUS_TEXT = {
+        'pending': "等待中", 'running': "运行中", 'success': "成功", 'skipped': "已跳过（输入未变化）",
+        'failed': "失败", 'cancelled': "已取消",
+    }
+
+    def __init__(self, stage_id: str, name: str, create_worker: Callable, depends_on: tuple = (),
+                 fingerprint: Optional[Callable[[], str]] = None, on_success: Optional[Callable[[], None]] = None):
+        self.stage_id = stage_id
+        self.name = name
+        self.create_worker = create_worker
+        self.depends_on = tuple(depends_on)
+        self.fingerprint = fingerprint
+        self.on_success = on_success
+        self.upstream: List['PipelineStage'] = []
+        self.status = 'pending'
+        self.inputs_hash = None
+        self.started_at = 0.0
+        # 开始运行时的系统时间，用于判断产出文件是否为本次运行写出
+        self.started_time = 0.0
+        self.seconds = 0.0
+
+    def describe(self) -> str:
+        text = f"{self.name}: {self.STATUS_TEXT[self.status]}"
+        if self.status in ('success', 'failed') or (self.status == 'cancelled' and self.seconds):
+            text += f" ({self.seconds:.1f} s)"
+        return text
+
+
+class TaskQueue(QObject):
+    """
+    按依赖顺序依次执行流水线阶段的任务队列（同一时间只运行一个阶段）。
+    每个阶段成功后记录其输入指纹到 state_path，下次输入未变化时直接跳过。
+    worker 的启动由 start_worker 回调完成，阶段结束后需调用 stage_finished()。
+    """
+    stage_changed = Signal(str, str, float)
+    stage_message = Signal(str)
+    queue_finished = Signal(bool, str)
+
+    def __init__(self, state_path: str, start_worker: Callable, parent=None):
+        super().__init__(parent)
+        self.state_path = state_path
+        self.start_worker = start_worker
+        self.stages: List[PipelineStage] = []
+        self.current: Optional[PipelineStage] = None
+        self._running = False
+
+    def _load_state(self) -> dict:
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_success(self, stage: PipelineStage):
+        state = self._load_state()
+        state[stage.stage_id] = {'inputs_hash': stage.inputs_hash, 'seconds': stage.seconds,
+                                 'finished_at': time.strftime('%Y-%m-%d %H:%M:%S')}
+        with open(self.state_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=1)
+
+    def is_running(self) -> bool:
+        return self._running
+
+    def enqueue(self, stages: List[PipelineStage]):
+        """加入一条流水线，depends_on 只在同一批阶段内解析。队列正在运行时也可以继续加入。"""
+        by_id = {stage.stage_id: stage for stage in stages}
+        for stage in stages:
+            missing = [dep for dep in stage.depends_on if dep not in by_id]
+            if missing:
+                raise ValueError(f"阶段 '{stage.stage_id}' 依赖的阶段不存在: {missing}")
+            stage.upstream = [by_id[dep] for dep in stage.depends_on]
+        self.stages.extend(stages)
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            self._advance()
+
+    def cancel(self):
+        """取消所有尚未开始的阶段（正在运行的阶段由调用者负责停止）。"""
+        for stage in self.stages:
+            if stage.status == 'pending':
+                self._set_status(stage, 'cancelled')
+
+    def _set_status(self, stage: PipelineStage, status: str):
+        stage.status = status
+        self.stage_changed.emit(stage.stage_id, status, stage.seconds)
+
+    def _advance(self):
+        while True:
+            stage = self._next_ready_stage()
+            if stage is None:
+                break
+            stage.started_at = time.monotonic()
+            stage.started_time = time.time()
+            try:
+                stage.inputs_hash = stage.fingerprint() if stage.fingerprint else None
+                previous = self._load_state().get(stage.stage_id, {})
+                if stage.inputs_hash and previous.get('inputs_hash') == stage.inputs_hash:
+                    self._set_status(stage, 'skipped')
+                    self.stage_message.emit(f"[PIPELINE] 阶段“{stage.name}”的输入未变化，跳过。")
+                    if stage.on_success:
+                        stage.on_success()
+                    continue
+                worker = stage.create_worker()
+            except Exception as e:
+                stage.seconds = time.monotonic() - stage.started_at
+                self._set_status(stage, 'failed')
+                self.stage_message.emit(f"[PIPELINE] 阶段“{stage.name}”无法启动: {e}")
+                continue
+            self.current = stage
+            self._set_status(stage, 'running')
+            self.stage_message.emit(f"[PIPELINE] 开始阶段: {stage.name}")
+            self.start_worker(worker)
+            return
+
+        self._running = False
+        self.current = None
+        success = all(stage.status in ('success', 'skipped') for stage in self.stages)
+        summary = self.summary()
+        self.stages = []
+        self.queue_finished.emit(success, summary)
+
+    def _next_ready_stage(self) -> Optional[PipelineStage]:
+        for stage in self.stages:
+            if stage.status != 'pending':
+                continue
+            if any(up.status in ('failed', 'cancelled') for up in stage.upstream):
+                self._set_status(stage, 'cancelled')
+                continue
+            if all(up.status in ('success', 'skipped') for up in stage.upstream):
+                return stage
+        return None
+
+    def stage_finished(self, is_success: bool, message: str):
+        """当前阶段的 worker 结束时调用，然后自动启动下一个就绪的阶段。"""
+        stage = self.current
+        if stage is None:
+            return
+        self.current = None
+        stage.seconds = time.monotonic() - stage.started_at
+        if is_success:
+            try:
+                if stage.on_success:
+                    stage.on_success()
+                if stage.inputs_hash:
+                    self._save_success(stage)
+                self._set_status(stage, 'success')
+            except Exception as e:
+                message = f"{message} ({e})"
+                self._set_status(stage, 'failed')
+        else:
+            self._set_status(stage, 'failed')
+        self.stage_message.emit(f"[PIPELINE] 阶段“{stage.name}”结束 ({stage.seconds:.1f} s): {message}")
+        self._advance()
+
+    def summary(self) -> str:
+        """各阶段状态与耗时的汇总表。"""
+        lines = [f"{'阶段':<10}{'状态':<14}{'耗时(s)':>10}"]
+        for stage in self.stages:
+            seconds = f"{stage.seconds:.1f}" if stage.status in ('success', 'failed') else "-"
+            lines.append(f"{stage.name:<10}{PipelineStage.STATUS_TEXT[stage.status]:<14}{seconds:>10}")
+        return "\n".join(lines)
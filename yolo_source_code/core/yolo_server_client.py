@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+'''
+@Project ：yolo_source_code
+@File    ：yolo_server_client.py
+@Author  ：fengzhengxiong
+@Date    ：2026/10/18 20:05
+'''
+
+
+import os
+import re
+import json
+import uuid
+import threading
+import subprocess
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from .task_config import PREDICT_SCRIPT
+
+SERVER_SCRIPT = Path(__file__).resolve().parent.parent / 'logic' / 'yolo_server.py'
+# 除 yolo 命令外，可以交给常驻进程执行的脚本（同样依赖 ultralytics，能复用已导入的框架）
+WARM_SCRIPTS = (str(PREDICT_SCRIPT),)
+
+
+def split_command(command: str) -> List[str]:
+    """按 task_config 的命令模板拆分命令行：空白分隔，双引号内的空白不拆分，引号本身去掉。"""
+    return [token.replace('"', '') for token in re.findall(r'(?:[^\s"]+|"[^"]*")+', command)]
+
+
+class WarmYoloServer:
+    """
+    训练环境中常驻的 yolo 任务进程（logic/yolo_server.py）的客户端，由 AppController 持有，跨任务复用。
+    第一次提交任务时启动进程，之后的训练/导出（yolo 命令）和验证（batch_predict.py）都在同一个
+    已导入 torch / ultralytics 的进程中执行，
+    省去每次启动解释器、导入框架的开销。任务的输出通过管道流回，用 read_job_output() 读取到结束标记为止。
+    停止任务时 ProcessWorker 照常终止进程树，常驻进程随之退出，下一个任务会重新启动它。
+    同一时间只能执行一个任务。
+    """
+
+    def __init__(self, python_exe: str, yolo_script: str):
+        self.python_exe = python_exe
+        self.yolo_script = yolo_script
+        self.process = None
+        self.jobs_done = 0
+        # 常驻进程从未完成过任务就退出（多半是训练环境无法导入 ultralytics）时不再尝试，改用子进程
+        self.disabled = False
+        self._nonce = None
+        self._lock = threading.Lock()
+
+    @property
+    def done_marker(self) -> bytes:
+        return f'@@yolo-server:{self._nonce}:done'.encode()
+
+    def job_for(self, command: str) -> Optional[dict]:
+        """
+        命令是 "<python_exe> <yolo_script> 参数..." 或 "<python_exe> <WARM_SCRIPTS 中的脚本> 参数..." 的形式时
+        返回提交给常驻进程的任务，否则返回 None（只能用子进程执行）。
+        """
+        tokens = split_command(command)
+        if len(tokens) < 3 or tokens[0] != self.python_exe:
+            return None
+        if tokens[1] == self.yolo_script:
+            return {'argv': tokens[2:]}
+        if tokens[1] in WARM_SCRIPTS:
+            return {'script': tokens[1], 'argv': tokens[2:]}
+        return None
+
+    def is_running(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        """确保常驻进程在运行（不等待导入完成：任务在导入完成后才会被读取，导入期间的输出算作该任务的输出）。"""
+        with self._lock:
+            if self.is_running():
+                return
+            self._nonce = uuid.uuid4().hex
+            self.jobs_done = 0
+            env = dict(os.environ, PYTHONIOENCODING='utf-8')
+            self.process = subprocess.Popen(
+                [self.python_exe, '-u', str(SERVER_SCRIPT), self._nonce],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                env=env,
+                creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+            )
+
+    def submit(self, job: dict, cwd: str):
+        self.process.stdin.write((json.dumps({**job, 'cwd': cwd}) + '\n').encode('utf-8'))
+        self.process.stdin.flush()
+
+    def read_job_output(self, sink: Callable[[bytes], None]) -> Optional[int]:
+        """
+        把当前任务的输出块交给 sink，直到读到结束标记，返回任务的返回码。
+        常驻进程在任务结束前退出（被终止或崩溃）时返回 None。
+        """
+        marker = self.done_marker
+        stdout = self.process.stdout
+        buffer = b''
+        while True:
+            chunk = stdout.read1(65536)
+            if not chunk:
+                if buffer:
+                    sink(buffer)
+                return None
+            buffer += chunk
+            pos = buffer.find(marker)
+            if pos >= 0:
+                end = buffer.find(b'\n', pos)
+                if end < 0:
+                    continue
+                if pos:
+                    sink(buffer[:pos])
+                self.jobs_done += 1
+                return int(buffer[pos + len(marker):end])
+            # 结尾可能是被分到两块里的结束标记的前半部分，留到下一块再判断，其余的立即交出
+            keep = next((k for k in range(min(len(marker) - 1, len(buffer)), 0, -1)
+                         if buffer.endswith(marker[:k])), 0)
+            if len(buffer) > keep:
+                sink(buffer[:len(buffer) - keep])
+                buffer = buffer[len(buffer) - keep:]
+
+    def shutdown(self, timeout: float = 5.0):
+        """通知常驻进程退出，超时则强制终止。由 AppController 在窗口关闭时调用。"""
+        if not self.is_running():
+            return
+        try:
+            self.process.stdin.write(b'{"exit": true}\n')
+            self.process.stdin.flush()
+            self.process.wait(timeout=timeout)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
@@ -11,9 +11,13 @@
 
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLineEdit,
-    QLabel, QTextEdit, QFileDialog, QMessageBox, QGroupBox
+    QLabel, QPlainTextEdit, QFileDialog, QMessageBox, QGroupBox, QListWidget, QListWidgetItem
 )
 from PySide6.QtCore import Signal, Slot, Qt
+from collections import deque
+
+# 资源占用趋势（迷你折线）使用的字符，从低到高
+_SPARK_CHARS = "▁▂▃▄▅▆▇█"
 
 class MainWindow(QMainWindow):
     convert_requested = Signal(dict)
@@ -54,14 +58,32 @@ class MainWindow(QMainWindow):
         self.validate_group = QGroupBox("2. 验证模块")
         self.validation_folder_edit = QLineEdit()
         self.validate_pt_edit = QLineEdit()
+        self.onnx_path_edit = QLineEdit()
 
         self.actions_group = QGroupBox("3. 操作与日志")
         self.train_button = QPushButton("开始训练")
         self.validate_button = QPushButton("开始验证")
         self.export_button = QPushButton("导出为ONNX")
+        self.benchmark_button = QPushButton("ONNX测速")
+        self.benchmark_button.setToolTip("用验证图片在 CPU 上测试不同 batch / 线程数 / 输入尺寸下的延迟、吞吐量和内存")
+        self.pipeline_button = QPushButton("一键流水线")
+        self.pipeline_button.setToolTip("依次执行 转换 -> 训练 -> 验证 -> 导出，输入未变化的阶段会被跳过")
         self.stop_button = QPushButton("停止当前任务")
-        self.log_console = QTextEdit()
+        # 日志控制台是一个有上限的环形缓冲区，超出上限时自动丢弃最早的行
+        self.log_console = QPlainTextEdit()
         self.log_console.setReadOnly(True)
+        self.log_console.setMaximumBlockCount(self.config.console_max_lines)
+        # 进度条等用回车刷新的输出只显示在这一行，不进入日志
+        self.progress_label = QLabel()
+        # 训练时显示最新一个 epoch 的关键指标
+        self.metrics_label = QLabel()
+        # 任务进程树的资源占用（最新值 + 最近的 CPU / 磁盘读取趋势）
+        self.resource_label = QLabel()
+        self._resource_history = deque(maxlen=40)
+        # 流水线各阶段的状态与耗时
+        self.pipeline_list = QListWidget()
+        self.pipeline_list.setMaximumHeight(90)
+        self.pipeline_list.hide()
 
     def _layout_widgets(self):
         main_layout = QVBoxLayout(self.central_widget)
@@ -80,18 +102,25 @@ class MainWindow(QMainWindow):
         validate_layout = QVBoxLayout()
         validate_layout.addLayout(self._create_path_selector("验证图片文件夹:", self.validation_folder_edit, is_file=False))
         validate_layout.addLayout(self._create_path_selector("模型文件 (best.pt):", self.validate_pt_edit, is_file=True))
+        validate_layout.addLayout(self._create_path_selector("ONNX模型 (best.onnx):", self.onnx_path_edit, is_file=True))
         self.validate_group.setLayout(validate_layout)
 
         actions_layout = QHBoxLayout()
         actions_layout.addWidget(self.train_button)
         actions_layout.addWidget(self.validate_button)
         actions_layout.addWidget(self.export_button)
+        actions_layout.addWidget(self.benchmark_button)
+        actions_layout.addWidget(self.pipeline_button)
         actions_layout.addStretch()
         actions_layout.addWidget(self.stop_button)
         log_layout = QVBoxLayout()
         log_layout.addLayout(actions_layout)
+        log_layout.addWidget(self.pipeline_list)
         log_layout.addWidget(QLabel("运行日志:"))
         log_layout.addWidget(self.log_console)
+        log_layout.addWidget(self.progress_label)
+        log_layout.addWidget(self.metrics_label)
+        log_layout.addWidget(self.resource_label)
         self.actions_group.setLayout(log_layout)
 
         main_layout.addWidget(self.train_group)
@@ -110,6 +139,7 @@ class MainWindow(QMainWindow):
         self.yaml_path_edit.textChanged.connect(self._update_button_states)
         self.validation_folder_edit.textChanged.connect(self._update_button_states)
         self.validate_pt_edit.textChanged.connect(self._update_button_states)
+        self.onnx_path_edit.textChanged.connect(self._update_button_states)
 
     @Slot()
     def _update_button_states(self):
@@ -120,28 +150,48 @@ class MainWindow(QMainWindow):
         yaml_path = self.yaml_path_edit.text().strip()
         val_folder = self.validation_folder_edit.text().strip()
         best_pt = self.validate_pt_edit.text().strip()
+        onnx_path = self.onnx_path_edit.text().strip()
 
         self.train_button.setEnabled(bool(train_folder) and bool(yaml_path))
         self.validate_button.setEnabled(bool(val_folder) and bool(best_pt))
         self.export_button.setEnabled(bool(yaml_path) and bool(best_pt))
+        self.benchmark_button.setEnabled(bool(onnx_path) and bool(val_folder))
+        # 填写了 LabelMe 根目录时，训练数据集由转换阶段提供
+        labelme_root = self.labelme_root_edit.text().strip() if self.prepare_group else ""
+        self.pipeline_button.setEnabled(bool(yaml_path) and (bool(train_folder) or bool(labelme_root)))
 
     def _get_current_paths(self) -> dict:
         paths = {
             'train_dataset_folder': self.train_dataset_edit.text().strip(),
             'yaml_path': self.yaml_path_edit.text().strip(),
             'validation_folder': self.validation_folder_edit.text().strip(),
-            'best_pt_path': self.validate_pt_edit.text().strip()
+            'best_pt_path': self.validate_pt_edit.text().strip(),
+            'onnx_path': self.onnx_path_edit.text().strip()
         }
         if self.prepare_group:
             paths['labelme_root'] = self.labelme_root_edit.text().strip()
         return paths
 
+    def set_path(self, key: str, value: str):
+        """按 _get_current_paths() 中的 key 回填路径（流水线中由上游阶段的产出填入）。"""
+        edits = {
+            'train_dataset_folder': self.train_dataset_edit,
+            'yaml_path': self.yaml_path_edit,
+            'validation_folder': self.validation_folder_edit,
+            'best_pt_path': self.validate_pt_edit,
+            'onnx_path': self.onnx_path_edit,
+        }
+        if self.prepare_group:
+            edits['labelme_root'] = self.labelme_root_edit
+        edits[key].setText(value)
+
     def get_field_name_by_key(self, key: str) -> str:
         mapping = {
             'train_dataset_folder': "训练数据集文件夹",
             'yaml_path': "训练配置文件 (yolo.yaml)",
             'validation_folder': "验证图片文件夹",
             'best_pt_path': "模型文件 (best.pt)",
+            'onnx_path': "ONNX模型 (best.onnx)",
             'labelme_root': "LabelMe数据集根目录"
         }
         return mapping.get(key, key)
@@ -162,6 +212,8 @@ class MainWindow(QMainWindow):
             self.train_button.setEnabled(False)
             self.validate_button.setEnabled(False)
             self.export_button.setEnabled(False)
+            self.benchmark_button.setEnabled(False)
+            self.pipeline_button.setEnabled(False)
         else:
             self._update_button_states()
 
@@ -185,9 +237,59 @@ class MainWindow(QMainWindow):
 
     @Slot(str)
     def add_log(self, text):
-        self.log_console.append(text)
+        self.log_console.appendPlainText(text)
         self.log_console.verticalScrollBar().setValue(self.log_console.verticalScrollBar().maximum())
 
+    @Slot(list)
+    def add_log_batch(self, lines):
+        """一次追加多行日志，只触发一次排版和滚动。"""
+        self.add_log('\n'.join(lines))
+
+    @Slot(str)
+    def set_progress_line(self, text):
+        self.progress_label.setText(text)
+
+    def show_pipeline_stages(self, stages):
+        """stages: [(stage_id, 显示文本), ...]"""
+        self.pipeline_list.clear()
+        for stage_id, text in stages:
+            item = QListWidgetItem(text)
+            item.setData(Qt.UserRole, stage_id)
+            self.pipeline_list.addItem(item)
+        self.pipeline_list.show()
+
+    def update_pipeline_stage(self, stage_id, text):
+        for row in range(self.pipeline_list.count()):
+            item = self.pipeline_list.item(row)
+            if item.data(Qt.UserRole) == stage_id:
+                item.setText(text)
+
+    @Slot(dict)
+    def show_metrics(self, latest):
+        parts = [f"Epoch {int(latest['epoch'])}" + (f"/{latest['total_epochs']}" if 'total_epochs' in latest else "")]
+        # 依次显示损失、mAP 和学习率
+        for matches in (lambda n: n.endswith('_loss'), lambda n: n.startswith('metrics/mAP'), lambda n: n == 'lr/pg0'):
+            parts.extend(f"{name.split('/')[-1]}: {value:.4g}" for name, value in latest.items() if matches(name))
+        self.metrics_label.setText(" | ".join(parts))
+
+    @Slot(dict)
+    def show_resources(self, sample):
+        history = self._resource_history
+        if history and sample['t'] < history[-1]['t']:
+            # 新任务开始，清空上一个任务的趋势
+            history.clear()
+        history.append(sample)
+
+        def spark(name):
+            values = [s[name] for s in history]
+            top = max(values) or 1.0
+            return ''.join(_SPARK_CHARS[min(len(_SPARK_CHARS) - 1, int(v / top * len(_SPARK_CHARS)))] for v in values)
+
+        self.resource_label.setText(
+            f"CPU {sample['cpu']:.0f}% (整机 {sample['sys_cpu']:.0f}%) {spark('cpu')} | "
+            f"内存 {sample['rss_mb']:.0f} MB | 读 {sample['read_mb_s']:.1f} MB/s {spark('read_mb_s')} | "
+            f"写 {sample['write_mb_s']:.1f} MB/s | 进程 {sample['procs']:.0f} / 线程 {sample['threads']:.0f}")
+
     def show_message(self, title, text, is_error=False):
         if is_error:
             QMessageBox.critical(self, title, text)
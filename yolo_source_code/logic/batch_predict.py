@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+'''
+@Project ：yolo_source_code
+@File    ：batch_predict.py
+@Author  ：fengzhengxiong
+@Date    ：2026/10/18 22:20
+'''
+
+
+# ==========================================================
+#  批量、分片、可续跑的推理（由训练环境的 python 运行，依赖 ultralytics）
+#
+#  用法（参数格式与 yolo 命令行一致，均为 key=value）:
+#      python batch_predict.py cfg=yolo.yaml model=best.pt source=val_images name=val_results \
+#          batch=16 retina_masks=False masks=polygon save=False shard_size=500 [output=目录]
+#  - 图片按文件名排序后每 shard_size 张为一个分片，分片的图片列表写成 .txt 交给 Ultralytics，
+#    以 stream=True 逐批（batch）读取和推理，
+#    每完成一个分片就写入 <output>/shards/，任务中断后再次运行只推理未完成的分片；
+#  - 模型、图片列表（文件名、大小、修改时间）或推理参数变化时，已有的分片作废；
+#  - 全部完成后汇总为 <output>/predictions.json（每张图片的检测结果与耗时），然后删除分片；
+#    output 默认为 runs/predict/<name>；
+#  - retina_masks 决定掩膜轮廓的精度（True 为原图分辨率，False 为模型输出分辨率再缩放），
+#    masks=none 时不输出轮廓，只保留检测框；
+#  - save=True 时额外由 Ultralytics 渲染每张图片（保存在 <output>/renders），默认不渲染。
+#  cfg 中只取与推理相关的项（imgsz、conf、iou、device 等），命令行参数优先。
+# ==========================================================
+
+import os
+import sys
+import ast
+import json
+import time
+import shutil
+import hashlib
+
+IMG_FORMATS = ('.bmp', '.jpg', '.jpeg', '.png', '.tif', '.tiff', '.webp')
+DEFAULTS = {'name': 'predict', 'batch': 16, 'retina_masks': False, 'masks': 'polygon', 'save': False,
+            'shard_size': 500}
+# 从 cfg 中读取的推理参数
+PREDICT_KEYS = ('imgsz', 'conf', 'iou', 'device', 'half', 'max_det', 'classes', 'agnostic_nms', 'augment')
+RESULT_FILE = 'predictions.json'
+# 坐标保留的小数位数（像素），置信度保留 4 位
+COORD_DECIMALS = 1
+
+
+def _literal(value: str):
+    try:
+        return ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return value
+
+
+def parse_args(argv) -> dict:
+    args = dict(DEFAULTS)
+    for token in argv:
+        key, sep, value = token.partition('=')
+        if not sep:
+            raise ValueError(f"无法识别的参数 '{token}'，应为 key=value")
+        args[key.strip()] = _literal(value.strip().strip('"'))
+    for key in ('model', 'source'):
+        if not args.get(key):
+            raise ValueError(f"缺少参数 {key}=")
+    return args
+
+
+def predict_options(args: dict) -> dict:
+    """合并 cfg 与命令行参数，得到传给 model.predict() 的推理参数。"""
+    options = {}
+    cfg_path = args.get('cfg')
+    if cfg_path and os.path.isfile(str(cfg_path)):
+        import yaml
+        with open(cfg_path, 'r', encoding='utf-8') as f:
+            cfg = yaml.safe_load(f) or {}
+        options.update({key: cfg[key] for key in PREDICT_KEYS if cfg.get(key) is not None})
+    options.update({key: args[key] for key in PREDICT_KEYS if key in args})
+    options['batch'] = int(args['batch'])
+    options['retina_masks'] = bool(args['retina_masks'])
+    return options
+
+
+def list_images(source: str):
+    return sorted(name for name in os.listdir(source) if os.path.splitext(name)[1].lower() in IMG_FORMATS)
+
+
+def run_signature(model: str, source: str, images, options: dict, args: dict) -> str:
+    """决定已有分片（和汇总结果）是否仍然有效：模型、图片（名称、大小、修改时间）、推理参数、是否渲染和分片大小。"""
+    digest = hashlib.sha1()
+    stat = os.stat(model)
+    digest.update(f"{os.path.abspath(model)}|{stat.st_size}|{stat.st_mtime_ns}\n".encode('utf-8'))
+    for name in images:
+        stat = os.stat(os.path.join(source, name))
+        digest.update(f"{name}|{stat.st_size}|{stat.st_mtime_ns}\n".encode('utf-8'))
+    settings = {**options, 'masks': args['masks'], 'save': bool(args['save']), 'shard_size': int(args['shard_size'])}
+    digest.update(json.dumps(settings, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _round(values, decimals: int = COORD_DECIMALS):
+    return [round(float(v), decimals) for v in values]
+
+
+def compact_result(result, source: str, with_polygons: bool) -> dict:
+    """把一个 ultralytics Results 转为紧凑的字典：类别下标、置信度、xyxy 框，以及可选的分割轮廓（展平的 x,y 序列）。"""
+    detections = []
+    boxes = result.boxes
+    if boxes is not None and len(boxes):
+        polygons = result.masks.xy if with_polygons and result.masks is not None else None
+        for k, (box, cls, conf) in enumerate(zip(boxes.xyxy.tolist(), boxes.cls.tolist(), boxes.conf.tolist())):
+            detection = {'cls': int(cls), 'conf': round(float(conf), 4), 'box': _round(box)}
+            if polygons is not None:
+                detection['polygon'] = _round(polygons[k].reshape(-1))
+            detections.append(detection)
+    return {
+        'file': os.path.relpath(result.path, source),
+        'shape': list(result.orig_shape),
+        'speed_ms': {key: round(float(value), 2) for key, value in (result.speed or {}).items()},
+        'detections': detections,
+    }
+
+
+def _write_json(path: str, data):
+    # 先写临时文件再替换，任务在写入中途被终止时不会留下残缺的分片
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: str):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _summarize(results, names: dict, wall_seconds: float) -> dict:
+    speeds = {}
+    per_class = {}
+    for item in results:
+        for key, value in item['speed_ms'].items():
+            speeds[key] = speeds.get(key, 0.0) + value
+        for detection in item['detections']:
+            name = names.get(detection['cls'], str(detection['cls']))
+            per_class[name] = per_class.get(name, 0) + 1
+    count = len(results)
+    return {
+        'images': count,
+        'images_with_detections': sum(1 for item in results if item['detections']),
+        'detections_per_class': per_class,
+        'mean_speed_ms': {key: round(total / count, 2) for key, total in speeds.items()} if count else {},
+        'inference_wall_seconds': round(wall_seconds, 2),
+        'images_per_second': round(count / wall_seconds, 2) if wall_seconds > 0 else None,
+    }
+
+
+def main(argv) -> int:
+    args = parse_args(argv)
+    source = os.path.abspath(args['source'])
+    model_path = os.path.abspath(str(args['model']))
+    output = os.path.abspath(args.get('output') or os.path.join('runs', 'predict', str(args['name'])))
+    shard_dir = os.path.join(output, 'shards')
+    options = predict_options(args)
+    shard_size = max(1, int(args['shard_size']))
+    with_polygons = str(args['masks']).lower() != 'none'
+
+    images = list_images(source)
+    if not images:
+        print(f"错误: {source} 中没有图片")
+        return 2
+    signature = run_signature(model_path, source, images, options, args)
+    result_path = os.path.join(output, RESULT_FILE)
+    previous = _read_json(result_path)
+    if previous is not None and previous.get('signature') == signature:
+        print(f"模型、图片和参数均未变化，结果已是最新: {result_path}")
+        return 0
+
+    shards = [images[i:i + shard_size] for i in range(0, len(images), shard_size)]
+    manifest_path = os.path.join(shard_dir, 'manifest.json')
+    manifest = _read_json(manifest_path)
+    if manifest is None or manifest.get('signature') != signature:
+        shutil.rmtree(shard_dir, ignore_errors=True)
+        os.makedirs(shard_dir)
+        _write_json(manifest_path, {'signature': signature, 'shards': len(shards)})
+
+    def shard_path(index: int) -> str:
+        return os.path.join(shard_dir, f'shard_{index:05d}.json')
+
+    pending = [index for index in range(len(shards)) if not os.path.isfile(shard_path(index))]
+    print(f"共 {len(images)} 张图片，{len(shards)} 个分片（每片 {shard_size} 张），"
+          f"已完成 {len(shards) - len(pending)} 个；batch={options['batch']}，retina_masks={options['retina_masks']}")
+
+    names = {}
+    if pending:
+        load_start = time.perf_counter()
+        from ultralytics import YOLO
+        model = YOLO(model_path)
+        print(f"模型加载耗时 {time.perf_counter() - load_start:.1f} s", flush=True)
+        render = {'save': True, 'project': output, 'name': 'renders', 'exist_ok': True} if args['save'] else {'save': False}
+        for done, index in enumerate(pending, 1):
+            # 以 .txt 列表作为 source：Ultralytics 对列表会一次性解码全部图片并作为一个批次，
+            # 对 .txt 则用 LoadImagesAndVideos 逐批（batch）读取，内存只与 batch 有关
+            list_path = os.path.join(shard_dir, f'shard_{index:05d}.txt')
+            with open(list_path, 'w', encoding='utf-8') as f:
+                f.writelines(os.path.join(source, name) + '\n' for name in shards[index])
+            start = time.perf_counter()
+            items = []
+            for result in model.predict(source=list_path, stream=True, verbose=False, **options, **render):
+                items.append(compact_result(result, source, with_polygons))
+                names = result.names
+            seconds = time.perf_counter() - start
+            _write_json(shard_path(index), {'seconds': seconds, 'names': names, 'results': items})
+            print(f"[分片 {index + 1}/{len(shards)}] {len(items)} 张，{seconds:.1f} s，"
+                  f"{len(items) / seconds if seconds > 0 else 0:.1f} 张/s（本次剩余 {len(pending) - done} 个分片）", flush=True)
+
+    # ---- 汇总 ----
+    results, wall_seconds = [], 0.0
+    for index in range(len(shards)):
+        shard = _read_json(shard_path(index))
+        if shard is None:
+            print(f"错误: 分片 {shard_path(index)} 无法读取，请重新运行")
+            return 1
+        results.extend(shard['results'])
+        wall_seconds += shard['seconds']
+        names = names or shard['names']
+    names = {int(key): value for key, value in names.items()}
+    report = {
+        'signature': signature,
+        'model': model_path,
+        'source': source,
+        'options': {**options, 'masks': args['masks']},
+        'names': names,
+        'summary': _summarize(results, names, wall_seconds),
+        'results': results,
+    }
+    _write_json(result_path, report)
+    shutil.rmtree(shard_dir, ignore_errors=True)
+    summary = report['summary']
+    print(f"推理完成: {summary['images']} 张图片，{summary['images_with_detections']} 张有检测结果，"
+          f"平均每张 {summary['mean_speed_ms']}（ms），{summary['images_per_second']} 张/s")
+    print(f"各类别检测数: {summary['detections_per_class']}")
+    print(f"汇总结果已写入 {result_path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
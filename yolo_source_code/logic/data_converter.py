@@ -10,13 +10,338 @@
 
 
 import os
+import re
+import sys
 import json
+import math
+import time
+import pickle
+import tempfile
 import random
-import yaml
 import shutil
+import hashlib
+from array import array
+from functools import lru_cache
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from typing import List, Dict, Any, Optional
+
+from logic.instrumentation import Instrumentation, NULL_INSTRUMENTATION
+from logic.dataset_index import DatasetIndex, annotation_entry
+
+try:
+    # NumPy 是可选依赖：有则使用向量化的归一化，没有则退回纯 Python 实现
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# ==========================================================
+#  单个JSON的处理函数
+#  定义在模块顶层，这样线程池和进程池可以共用同一套逻辑
+#  （进程池要求任务函数可以被 pickle）。
+# ==========================================================
+_IMAGE_DATA_KEY = b'"imageData"'
+_IMAGE_DATA_RE = re.compile(rb'"imageData"\s*:\s*')
+_IMAGE_DATA_PARTIAL_RE = re.compile(rb'\s*(:\s*)?')
+_READ_CHUNK_SIZE = 1024 * 1024
+
+
+def _read_json_without_image_data(json_path: Path):
+    """
+    分块读取JSON，把 LabelMe 内嵌的 imageData（base64 字符串，可达数 MB）替换为 null，
+    该字符串的内容只参与哈希计算，从不保留在内存中。返回 (去掉 imageData 的字节, sha1)。
+    base64 中不会出现引号，所以遇到的第一个引号就是字符串的结尾。
+    """
+    sha1 = hashlib.sha1()
+    out = bytearray()
+    pending = b''
+    skipping = False
+    with open(json_path, 'rb') as f:
+        while True:
+            chunk = f.read(_READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            sha1.update(chunk)
+            data = pending + chunk if pending else chunk
+            pending = b''
+            while data:
+                if skipping:
+                    quote = data.find(b'"')
+                    if quote < 0:
+                        break
+                    out += b'null'
+                    data = data[quote + 1:]
+                    skipping = False
+                    continue
+
+                key = data.find(_IMAGE_DATA_KEY)
+                if key < 0:
+                    # 保留末尾可能被截断的键名，留给下一块
+                    keep = len(_IMAGE_DATA_KEY) - 1
+                    out += data[:-keep]
+                    pending = data[-keep:]
+                    break
+
+                match = _IMAGE_DATA_RE.match(data, key)
+                if match and match.end() < len(data):
+                    out += data[:match.end()]
+                    data = data[match.end():]
+                    if data[:1] == b'"':
+                        data = data[1:]
+                        skipping = True
+                elif _IMAGE_DATA_PARTIAL_RE.fullmatch(data, key + len(_IMAGE_DATA_KEY)):
+                    # 键名之后的冒号或值还在下一块里
+                    out += data[:key]
+                    pending = data[key:]
+                    break
+                else:
+                    # 只是一个内容为 "imageData" 的字符串，不是键
+                    out += data[:key + len(_IMAGE_DATA_KEY)]
+                    data = data[key + len(_IMAGE_DATA_KEY):]
+    out += pending
+    return bytes(out), sha1.hexdigest()
+
+
+def _parse_labelme_json(json_path: Path) -> Dict[str, Any]:
+    """
+    单趟解析：每个JSON只读取一次，转成紧凑的内存结构。
+    shapes 中每一项为 (label, shape_type, coords)：
+      - 矩形: coords 为 (x1, y1, x2, y2)
+      - 多边形: coords 为展平后的 array('d')，[x0, y0, x1, y1, ...]
+      - 其它不支持的类型: shape_type 为 None，只保留标签用于类别发现
+    """
+    raw, sha1 = _read_json_without_image_data(json_path)
+    data = json.loads(raw)
+    del raw
+
+    shapes = []
+    for shape in data.get('shapes', []):
+        label = shape['label']
+        points = shape['points']
+        shape_type = shape.get('shape_type', 'polygon')
+
+        if shape_type == 'rectangle' and len(points) == 2:
+            (x1, y1), (x2, y2) = points[0], points[1]
+            shapes.append((label, 'rectangle', (x1, y1, x2, y2)))
+        elif shape_type == 'polygon':
+            shapes.append((label, 'polygon', array('d', (c for pair in points for c in pair[:2]))))
+        else:
+            shapes.append((label, None, None))
+
+    stat = json_path.stat()
+    return {
+        'json_path': json_path,
+        'width': data.get('imageWidth'),
+        'height': data.get('imageHeight'),
+        'shapes': shapes,
+        'fingerprint': {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha1': sha1,
+            'labels': sorted({label for label, _, _ in shapes}),
+        },
+    }
+
+
+def _format_shape(shape_type: Optional[str], coords, w, h, decimals: int = 6) -> str:
+    """
+    把一个形状格式化为 YOLO 标签行中类别索引之后的部分，不支持的类型返回空字符串。
+    """
+    if shape_type == 'rectangle':
+        x1, y1, x2, y2 = coords
+        cx = (x1 + x2) / 2 / w
+        cy = (y1 + y2) / 2 / h
+        width = abs(x2 - x1) / w
+        height = abs(y2 - y1) / h
+        # 优化：使用固定的小数位数，使输出更整洁
+        return _coord_format(4, decimals) % (cx, cy, width, height)
+
+    if shape_type == 'polygon':
+        values = _normalize_polygon(coords, w, h)
+        # 一次格式化整行，'%.6f' 与 f"{p:.6f}" 的舍入结果完全一致
+        return _coord_format(len(values), decimals) % tuple(values)
+
+    return ""
+
+
+@lru_cache(maxsize=1024)
+def _coord_format(count: int, decimals: int = 6) -> str:
+    """按坐标个数和小数位数缓存整行的格式化模板。"""
+    return ' '.join([f'%.{decimals}f'] * count)
+
+
+def _point_segment_distance(px, py, ax, ay, bx, by) -> float:
+    """点 (px, py) 到线段 AB 的距离。"""
+    dx, dy = bx - ax, by - ay
+    length_sq = dx * dx + dy * dy
+    if length_sq == 0:
+        return math.hypot(px - ax, py - ay)
+    t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length_sq))
+    return math.hypot(px - (ax + t * dx), py - (ay + t * dy))
+
+
+def _douglas_peucker(coords, tolerance: float) -> array:
+    """
+    对闭合多边形做 Douglas-Peucker 简化（像素坐标系，tolerance 单位为像素）。
+    把首点追加到末尾当作折线处理，保证闭合边也参与简化，最后去掉重复的首点。
+    """
+    xs, ys = coords[0::2], coords[1::2]
+    n = len(xs)
+    if n <= 3 or tolerance <= 0:
+        return array('d', coords)
+    xs.append(xs[0])
+    ys.append(ys[0])
+
+    keep = [False] * (n + 1)
+    keep[0] = keep[n] = True
+    stack = [(0, n)]
+    while stack:
+        start, end = stack.pop()
+        max_dist, max_idx = 0.0, -1
+        ax, ay, bx, by = xs[start], ys[start], xs[end], ys[end]
+        for i in range(start + 1, end):
+            dist = _point_segment_distance(xs[i], ys[i], ax, ay, bx, by)
+            if dist > max_dist:
+                max_dist, max_idx = dist, i
+        if max_dist > tolerance:
+            keep[max_idx] = True
+            stack.append((start, max_idx))
+            stack.append((max_idx, end))
+
+    kept = [i for i in range(n) if keep[i]]
+    if len(kept) < 3:
+        # 退化成线段时保留原始多边形
+        return array('d', coords)
+    return array('d', (c for i in kept for c in (xs[i], ys[i])))
+
+
+def _decimate_polygon(coords, max_vertices: int) -> array:
+    """按顶点序号均匀抽取 max_vertices 个顶点（Douglas-Peucker 无法把顶点数降到上限以内时的兜底）。"""
+    n = len(coords) // 2
+    count = min(n, max(3, max_vertices))
+    return array('d', (coords[2 * (i * n // count) + k] for i in range(count) for k in (0, 1)))
+
+
+def _simplify_polygon(coords, tolerance: float, max_vertices: Optional[int]) -> array:
+    """
+    多边形简化：先按像素容差做 Douglas-Peucker，
+    若顶点数仍超过 max_vertices，则逐步放大容差（最大到多边形外接框的对角线长度）直到满足上限；
+    容差再大就会退化成线段时，改为均匀抽取顶点。结果的顶点数总是 <= max(max_vertices, 3)。
+    """
+    simplified = _douglas_peucker(coords, tolerance) if tolerance > 0 else coords
+    if max_vertices and len(simplified) // 2 > max(max_vertices, 3):
+        cap = max(max_vertices, 3)
+        xs, ys = coords[0::2], coords[1::2]
+        extent = math.hypot(max(xs) - min(xs), max(ys) - min(ys))
+        step = max(tolerance, 0.5)
+        while len(simplified) // 2 > cap and step <= extent:
+            step *= 1.5
+            # 容差过小时返回原多边形，过大而退化时也返回原多边形，两种情况都不会减少顶点
+            candidate = _douglas_peucker(coords, step)
+            if len(candidate) < len(simplified):
+                simplified = candidate
+        if len(simplified) // 2 > cap:
+            simplified = _decimate_polygon(simplified, cap)
+    return simplified
+
+
+def _normalize_polygon(coords, w, h) -> list:
+    """
+    多边形坐标归一化，coords 为展平的 array('d')：偶数位是 x，奇数位是 y。
+    有 NumPy 时零拷贝转为 (N, 2) 数组，一次除以 (w, h)。
+    """
+    if np is not None and len(coords) % 2 == 0:
+        points = np.frombuffer(coords, dtype=np.float64).reshape(-1, 2)
+        return (points / np.array((w, h), dtype=np.float64)).ravel().tolist()
+    return [c / (h if i & 1 else w) for i, c in enumerate(coords)]
+
+
+def _write_label_file(label_dir: Path, json_name: str, bodies: List[tuple], class_index: Dict[str, int]) -> int:
+    """
+    写出单个文件的 YOLO 标签。bodies 为 [(label, 坐标文本), ...]，返回写出的字符数。
+    """
+    lines = []
+    for label, body in bodies:
+        label_idx = class_index.get(label)
+        if label_idx is None:
+            # 优化：当标签不在类别列表中时，打印警告而不是静默忽略
+            print(f"警告: 在文件 '{json_name}' 中发现未知标签 '{label}'，将被忽略。")
+            continue
+        lines.append(f"{label_idx} {body}")
+
+    text = '\n'.join(lines)
+    with open(label_dir / (Path(json_name).stem + '.txt'), 'w', encoding='utf-8') as f:
+        f.write(text)
+    return len(text)
+
+
+def _convert_json_batch(json_paths: List[Path], label_dir: Path, class_index: Optional[Dict[str, int]],
+                        known_hashes: Dict[str, str], options: Dict[str, Any], instrument: bool = False):
+    """
+    转换一批JSON，返回 (结果摘要列表, 统计)。只返回体积很小的摘要，避免进程间传输大量数据。
+    - class_index 已知且覆盖了文件中的全部标签时，直接写出标签 (status='written')；
+    - 内容哈希与上次相同且标签文件仍在时，不重写 (status='skipped')；
+    - 否则返回格式化好的坐标文本，等类别确定后由主进程写出 (status='pending')。
+    options 为多边形简化/精度选项，启用时 stats 记录 [原顶点数, 简化后顶点数, 原字节数, 输出字节数]。
+    instrument 为 True 时统计本批次各环节的耗时，以 Instrumentation.to_dict() 的形式返回，否则为 None。
+    """
+    instr = Instrumentation() if instrument else NULL_INSTRUMENTATION
+    tolerance = options.get('simplify_tolerance') or 0.0
+    max_vertices = options.get('max_vertices')
+    decimals = options.get('decimals', 6)
+    lossy = bool(tolerance or max_vertices or decimals != 6)
+
+    summaries = []
+    for json_path in json_paths:
+        summary = {'name': json_path.name, 'status': 'error', 'fingerprint': None, 'bodies': None, 'error': None,
+                   'stats': [0, 0, 0, 0], 'index': None}
+        summaries.append(summary)
+        try:
+            with instr.timer('convert.parse_json'):
+                record = _parse_labelme_json(json_path)
+            fingerprint = summary['fingerprint'] = record['fingerprint']
+            # 顺带生成数据集索引的条目，建索引时不必再读一遍 JSON
+            summary['index'] = annotation_entry(json_path.name, record)
+            instr.add_bytes('convert.json_read', fingerprint['size'])
+            if (known_hashes.get(json_path.name) == fingerprint['sha1']
+                    and (label_dir / (json_path.stem + '.txt')).exists()):
+                summary['status'] = 'skipped'
+                instr.count('convert.skipped_same_content')
+                continue
+
+            w, h = record['width'], record['height']
+            stats = summary['stats']
+            bodies = []
+            with instr.timer('convert.format_labels'):
+                for label, shape_type, coords in record['shapes']:
+                    original = coords
+                    if shape_type == 'polygon' and (tolerance or max_vertices):
+                        coords = _simplify_polygon(coords, tolerance, max_vertices)
+                    body = _format_shape(shape_type, coords, w, h, decimals)
+                    if not body:
+                        continue
+                    bodies.append((label, body))
+                    if shape_type == 'polygon':
+                        stats[0] += len(original) // 2
+                        stats[1] += len(coords) // 2
+                    # 未启用简化/降精度时原始字节数即输出字节数，无需再格式化一遍
+                    stats[2] += len(_format_shape(shape_type, original, w, h)) if lossy else len(body)
+                    stats[3] += len(body)
+            instr.count('convert.shapes', len(bodies))
+
+            if class_index is not None and all(label in class_index for label in fingerprint['labels']):
+                with instr.timer('convert.write_labels'):
+                    instr.add_bytes('convert.labels_written', _write_label_file(label_dir, json_path.name, bodies,
+                                                                                class_index))
+                summary['status'] = 'written'
+            else:
+                summary['bodies'] = bodies
+                summary['status'] = 'pending'
+        except Exception as e:
+            summary['error'] = str(e)
+            instr.count('convert.errors')
+    return summaries, (instr.to_dict() if instrument else None)
 
 
 class LabelmeConverter:
@@ -24,124 +349,608 @@ class LabelmeConverter:
     一个健壮的LabelMe到YOLO格式转换器。
     它结合了您两个版本的优点，并修复了关键的bug。
     """
+    MANIFEST_VERSION = 1
+    BACKENDS = ('auto', 'thread', 'process')
+    # auto 模式下，待解析的JSON总量超过该阈值时使用进程池
+    PROCESS_BACKEND_MIN_BYTES = 64 * 1024 * 1024
+    PROCESS_BACKEND_MIN_FILES = 2000
 
-    def __init__(self, dataset_root: str):
+    def __init__(self, dataset_root: str, backend: str = 'auto', max_workers: int = None,
+                 simplify_tolerance: float = 0.0, max_vertices: int = None, decimals: int = 6,
+                 streaming: bool = False, window: int = None, instrumentation: Instrumentation = None,
+                 use_index: bool = True):
+        """
+        simplify_tolerance: 多边形 Douglas-Peucker 简化的像素容差，0 表示不简化
+        max_vertices: 每个多边形的最大顶点数，None 表示不限制
+        decimals: 输出标签的小数位数
+        streaming: 流式模式，同时在途的批次数受 window 限制，待写出的标签暂存到磁盘，
+                   内存占用与文件数量无关
+        window: 流式模式下同时在途的批次数，默认为工作线程/进程数的 2 倍
+        instrumentation: 传入时记录各环节的耗时、计数和字节数
+        use_index: 维护数据集根目录下的 dataset_index.db，类别从索引中查询
+        """
+        if backend not in self.BACKENDS:
+            raise ValueError(f"未知的转换后端 '{backend}'，可选: {self.BACKENDS}")
+        if simplify_tolerance < 0:
+            raise ValueError(f"simplify_tolerance 不能为负数: {simplify_tolerance}")
+        if max_vertices is not None and max_vertices < 3:
+            raise ValueError(f"max_vertices 至少为 3: {max_vertices}")
+        if not 1 <= decimals <= 10:
+            raise ValueError(f"decimals 必须在 1~10 之间: {decimals}")
         self.root = Path(dataset_root)
         self.json_dir = self.root / 'jsons'
         # 保持 image_dir 的定义，split_dataset 函数会用到
         self.image_dir = self.root / 'images'
         self.label_dir = self.root / 'labels'
+        # 增量转换的清单文件，与 labels 文件夹放在一起
+        self.manifest_path = self.root / 'labels_manifest.json'
+        self.backend = backend
+        self.max_workers = max_workers or os.cpu_count() or 4
+        self.streaming = streaming
+        self.window = window or self.max_workers * 2
+        self.instrumentation = instrumentation or NULL_INSTRUMENTATION
+        self.use_index = use_index
+        # 影响标签内容的选项，会记录到清单中，变化时触发全量重建
+        self.options = {
+            'simplify_tolerance': float(simplify_tolerance),
+            'max_vertices': max_vertices,
+            'decimals': decimals,
+        }
         self.classes: List[str] = []
 
-    def _discover_classes_and_jsons(self) -> List[Path]:
+    def _discover_jsons(self) -> List[Path]:
         """
-        自动从所有JSON文件中发现类别。这是一个很好的功能，我们予以保留。
+        列出 'jsons' 文件夹下的所有JSON文件（不做解析）。
         """
         if not self.json_dir.exists():
             raise FileNotFoundError(f"错误: 未在 '{self.root}' 找到 'jsons' 文件夹。")
         json_files = list(self.json_dir.glob('*.json'))
         if not json_files:
             raise ValueError(f"'jsons' 文件夹 '{self.json_dir}' 中没有找到任何 .json 文件。")
-
-        class_set = set()
-        for json_path in json_files:
-            with open(json_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                for shape in data.get('shapes', []):
-                    class_set.add(shape['label'])
-
-        self.classes = sorted(list(class_set))
-        if not self.classes:
-            raise ValueError("在所有JSON文件中都未能发现任何标签(label)。")
         return json_files
 
-    def _process_single_json(self, json_path: Path):
+    def _choose_backend(self, json_files: List[Path]) -> str:
         """
-        处理单个JSON文件，包含了对矩形和多边形的正确转换逻辑。
+        auto 策略：小数据集用线程池（启动快），大数据集用进程池（绕开 GIL）。
         """
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        if self.backend != 'auto':
+            return self.backend
+        if self.max_workers < 2:
+            return 'thread'
+        if len(json_files) >= self.PROCESS_BACKEND_MIN_FILES:
+            return 'process'
+        total_bytes = sum(p.stat().st_size for p in json_files)
+        return 'process' if total_bytes >= self.PROCESS_BACKEND_MIN_BYTES else 'thread'
 
-        h, w = data['imageHeight'], data['imageWidth']
-        txt_filename = json_path.stem + '.txt'
-        txt_path = self.label_dir / txt_filename
+    def _run_batches(self, json_files: List[Path], class_index: Optional[Dict[str, int]],
+                     known_hashes: Dict[str, str], backend: str, spool=None) -> List[Dict[str, Any]]:
+        """
+        把JSON按块分发给线程池或进程池，分块可以摊薄进程间通信的开销。
+        传入 spool 时为流式模式：最多 self.window 个批次同时在途（背压），
+        待写出的坐标文本立即追加到 spool 文件，不在内存中累积。
+        """
+        if not json_files:
+            return []
+        chunk_size = min(256, max(8, math.ceil(len(json_files) / (self.max_workers * 4))))
+        if spool is not None:
+            # 流式模式下用小批次，进一步限制单个批次的内存
+            chunk_size = min(chunk_size, 32)
+        chunks = (json_files[i:i + chunk_size] for i in range(0, len(json_files), chunk_size))
+        num_chunks = math.ceil(len(json_files) / chunk_size)
+        executor_cls = ProcessPoolExecutor if backend == 'process' else ThreadPoolExecutor
+        max_in_flight = self.window if spool is not None else num_chunks
 
-        lines = []
-        for shape in data.get('shapes', []):
-            label = shape['label']
-            points = shape['points']
-            shape_type = shape.get('shape_type', 'polygon')
+        summaries = []
+        with executor_cls(max_workers=min(self.max_workers, num_chunks)) as executor:
+            in_flight = set()
+            for chunk in chunks:
+                in_flight.add(executor.submit(
+                    _convert_json_batch, chunk, self.label_dir, class_index,
+                    {p.name: known_hashes[p.name] for p in chunk if p.name in known_hashes}, self.options,
+                    self.instrumentation.enabled))
+                if len(in_flight) >= max_in_flight:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        summaries.extend(self._collect_batch(future.result(), spool))
+            for future in as_completed(in_flight):
+                summaries.extend(self._collect_batch(future.result(), spool))
+        self.instrumentation.count('convert.batches', num_chunks)
 
-            try:
-                label_idx = self.classes.index(label)
-            except ValueError:
-                # 优化：当标签不在类别列表中时，打印警告而不是静默忽略
-                print(f"警告: 在文件 '{json_path.name}' 中发现未知标签 '{label}'，将被忽略。")
-                continue
+        for summary in summaries:
+            if summary['status'] == 'error':
+                # 提供更详细的错误日志
+                print(f"处理文件 {summary['name']} 时发生严重错误: {summary['error']}")
+        return summaries
 
-            line = ""
-            if shape_type == 'rectangle' and len(points) == 2:
-                # 矩形逻辑是正确的，我们保持并优化格式
-                x1, y1 = points[0]
-                x2, y2 = points[1]
-                cx = (x1 + x2) / 2 / w
-                cy = (y1 + y2) / 2 / h
-                width = abs(x2 - x1) / w
-                height = abs(y2 - y1) / h
-                # 优化：使用固定的小数位数，使输出更整洁
-                line = f"{label_idx} {cx:.6f} {cy:.6f} {width:.6f} {height:.6f}"
+    def _collect_batch(self, result: tuple, spool) -> List[Dict[str, Any]]:
+        """
+        合并批次的统计；流式模式下把待写出的坐标文本转存到 spool 文件，只在内存中保留摘要。
+        """
+        batch, metrics = result
+        self.instrumentation.merge(metrics)
+        if spool is not None:
+            for summary in batch:
+                if summary['status'] == 'pending':
+                    pickle.dump((summary['name'], summary['bodies']), spool, pickle.HIGHEST_PROTOCOL)
+                    summary['bodies'] = None
+                    summary['status'] = 'spooled'
+        return batch
 
-            elif shape_type == 'polygon':
-                # <<< 核心修正：采用您之前代码中的正确逻辑来处理多边形
-                norm_points = []
-                for point_pair in points:  # point_pair is [x, y]
-                    x_norm = point_pair[0] / w
-                    y_norm = point_pair[1] / h
-                    norm_points.append(x_norm)
-                    norm_points.append(y_norm)
+    def _load_manifest(self) -> Dict[str, Any]:
+        """
+        读取上一次转换的清单，不存在或格式不对时返回 None（触发全量重建）。
+        """
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get('version') != self.MANIFEST_VERSION:
+            return None
+        return manifest
 
-                # 优化：使用固定的小数位数
-                points_str = ' '.join(f"{p:.6f}" for p in norm_points)
-                line = f"{label_idx} {points_str}"
+    def _save_manifest(self, files: Dict[str, Dict[str, Any]]):
+        """
+        原子地写出清单：先写临时文件再替换，避免中途崩溃留下半个文件。
+        """
+        manifest = {'version': self.MANIFEST_VERSION, 'classes': self.classes, 'options': self.options,
+                    'files': files}
+        tmp_path = self.manifest_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
 
-            if line:
-                lines.append(line)
+    def _is_unchanged(self, json_path: Path, entry: Dict[str, Any]) -> bool:
+        """
+        通过文件大小和修改时间快速判断JSON是否未变化（且对应的标签仍在）。
+        """
+        if not entry:
+            return False
+        stat = json_path.stat()
+        if stat.st_size != entry['size'] or stat.st_mtime_ns != entry['mtime_ns']:
+            return False
+        return (self.label_dir / (json_path.stem + '.txt')).exists()
 
-        with open(txt_path, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(lines))
+    def _update_index(self, index: DatasetIndex, summaries: List[Dict[str, Any]], unchanged: List[Path]):
+        """
+        把本次解析得到的条目写入索引，删除已不存在或解析失败的 JSON 的条目。
+        清单认为未变化、但索引中没有的文件（例如索引被删除）在这里补充解析。
+        """
+        entries = [s['index'] for s in summaries if s['index']]
+        for summary in summaries:
+            summary['index'] = None
+        indexed = index.annotated_names()
+        missing = [p for p in unchanged if p.name not in indexed]
+        if missing:
+            def parse_entry(json_path):
+                try:
+                    return annotation_entry(json_path.name, _parse_labelme_json(json_path))
+                except Exception as e:
+                    print(f"建立索引时无法解析文件 {json_path.name}: {e}")
+                    return None
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                entries.extend(entry for entry in executor.map(parse_entry, missing) if entry)
+        index.update_annotations(entries)
+        valid_names = {p.name for p in unchanged} | {e['json_name'] for e in entries}
+        index.remove_annotations(indexed - valid_names)
 
-        return txt_path.name
+    def _finish_classes(self, summaries: List[Dict[str, Any]], unchanged: List[Path],
+                        old_files: Dict[str, Dict[str, Any]], index: DatasetIndex = None) -> Dict[str, int]:
+        """
+        得到排序后的类别及其索引。有索引时直接查询索引，
+        否则汇总本次解析和清单中未变化文件的标签。
+        """
+        if index is not None:
+            self.classes = index.classes()
+        else:
+            class_set = {label for s in summaries if s['fingerprint'] for label in s['fingerprint']['labels']}
+            for p in unchanged:
+                class_set.update(old_files[p.name]['labels'])
+            self.classes = sorted(class_set)
+        if not self.classes:
+            raise ValueError("在所有JSON文件中都未能发现任何标签(label)。")
+        return {name: idx for idx, name in enumerate(self.classes)}
 
-    def convert(self) -> Dict[str, Any]:
+    def convert(self, incremental: bool = True) -> Dict[str, Any]:
         """
-        转换流程的总入口。
+        转换流程的总入口（单趟解析）：
+        1. 对比清单，只解析新增或变化的JSON，同时收集类别；
+        2. 类别排序后统一解析标签索引，写出 labels；
+        3. 类别列表变化时回退为全量重建，JSON 已删除的标签会被清理。
+        incremental=False 时忽略清单，强制全量转换。
         """
-        json_files = self._discover_classes_and_jsons()
+        instr = self.instrumentation
+        with instr.timer('convert.discover'):
+            json_files = self._discover_jsons()
+            manifest = self._load_manifest() if incremental else None
+        old_files = manifest['files'] if manifest else {}
+        previous_names = set(old_files)
+        if manifest and manifest.get('options') != self.options:
+            # 简化/精度选项变化后所有标签内容都会变，直接全量重建
+            print(f"转换选项发生变化: {manifest.get('options')} -> {self.options}，执行全量重建。")
+            manifest, old_files = None, {}
+
+        with instr.timer('convert.check_unchanged'):
+            unchanged = [p for p in json_files if self._is_unchanged(p, old_files.get(p.name))]
+        unchanged_names = {p.name for p in unchanged}
+        to_parse = [p for p in json_files if p.name not in unchanged_names]
+        backend = self._choose_backend(to_parse)
         self.label_dir.mkdir(parents=True, exist_ok=True)
-        total_files = len(json_files)
 
-        with ThreadPoolExecutor(max_workers=os.cpu_count() or 4) as executor:
-            futures = {executor.submit(self._process_single_json, json_path): json_path for json_path in json_files}
-            for future in as_completed(futures):
-                try:
-                    future.result()
-                except Exception as e:
-                    # 提供更详细的错误日志
-                    json_path_for_error = futures[future]
-                    print(f"处理文件 {json_path_for_error.name} 时发生严重错误: {e}")
+        # 上次的类别列表作为提示：新文件的标签都在其中时，工作线程/进程可直接写出标签
+        hint_index = {name: idx for idx, name in enumerate(manifest['classes'])} if manifest else None
+        known_hashes = {name: entry['sha1'] for name, entry in old_files.items()}
+        spool = tempfile.TemporaryFile(dir=self.root) if self.streaming else None
+        index = DatasetIndex(self.root) if self.use_index else None
+        try:
+            with instr.timer('convert.run_batches'):
+                summaries = self._run_batches(to_parse, hint_index, known_hashes, backend, spool)
+            if index is not None:
+                with instr.timer('convert.update_index'):
+                    self._update_index(index, summaries, unchanged)
+            class_index = self._finish_classes(summaries, unchanged, old_files, index)
 
+            if manifest and manifest['classes'] != self.classes:
+                # 类别列表变化会导致索引错位，必须全量重建
+                print(f"类别列表发生变化: {manifest['classes']} -> {self.classes}，执行全量重建。")
+                old_files, unchanged = {}, []
+                instr.count('convert.class_change_rebuilds')
+                with instr.timer('convert.run_batches'):
+                    summaries = self._run_batches(json_files, class_index, {}, backend)
+                for summary in summaries:
+                    summary['index'] = None
+
+            # 类别确定后由主线程写出的标签（新类别或流式暂存的文件）
+            with instr.timer('convert.write_pending'):
+                for summary in summaries:
+                    if summary['status'] == 'pending':
+                        instr.add_bytes('convert.labels_written', _write_label_file(
+                            self.label_dir, summary['name'], summary['bodies'], class_index))
+                        summary['status'] = 'written'
+                        summary['bodies'] = None
+
+                spooled = {s['name']: s for s in summaries if s['status'] == 'spooled'}
+                if spooled:
+                    spool.seek(0)
+                    for _ in range(len(spooled)):
+                        name, bodies = pickle.load(spool)
+                        instr.add_bytes('convert.labels_written',
+                                        _write_label_file(self.label_dir, name, bodies, class_index))
+                        spooled[name]['status'] = 'written'
+
+            # 清理 JSON 已被删除的标签
+            current_names = {p.name for p in json_files}
+            removed = 0
+            with instr.timer('convert.remove_stale'):
+                for name in previous_names:
+                    if name not in current_names:
+                        stale_label = self.label_dir / (Path(name).stem + '.txt')
+                        if stale_label.exists():
+                            stale_label.unlink()
+                            removed += 1
+
+            # 标签写完后刷新索引中的文件列表，之后的划分和统计直接查询索引
+            if index is not None:
+                with instr.timer('convert.refresh_index_files'):
+                    index.refresh_files()
+        finally:
+            if spool is not None:
+                spool.close()
+            if index is not None:
+                index.close()
+
+        new_files = {p.name: old_files[p.name] for p in unchanged}
+        new_files.update({s['name']: s['fingerprint'] for s in summaries if s['status'] in ('written', 'skipped')})
+
+        with instr.timer('convert.save_manifest'):
+            self._save_manifest(new_files)
+
+        converted = sum(1 for s in summaries if s['status'] == 'written')
+        if converted or removed:
+            # 标签有变化时训练器的 labels.cache 已过期（其哈希只比较文件大小，内容变化但大小不变时无法察觉）
+            from logic.label_cache import remove_stale_caches
+            remove_stale_caches(self.root)
+        skipped = len(unchanged) + sum(1 for s in summaries if s['status'] == 'skipped')
+        instr.count('convert.files', len(json_files))
+        instr.count('convert.converted', converted)
+        instr.count('convert.unchanged_by_manifest', len(unchanged))
+        instr.count('convert.removed', removed)
+        message = f"成功转换 {converted} 个文件。"
+        if skipped or removed:
+            message += f" 跳过 {skipped} 个未变化文件，删除 {removed} 个过期标签。"
+
+        vertices_in, vertices_out, bytes_in, bytes_out = (
+            sum(s['stats'][i] for s in summaries if s['status'] == 'written') for i in range(4))
+        simplify_report = {
+            'vertices_in': vertices_in,
+            'vertices_out': vertices_out,
+            'vertex_reduction': 1 - vertices_out / vertices_in if vertices_in else 0.0,
+            'bytes_in': bytes_in,
+            'bytes_out': bytes_out,
+            'byte_reduction': 1 - bytes_out / bytes_in if bytes_in else 0.0,
+        }
+        if vertices_in != vertices_out or bytes_in != bytes_out:
+            message += (f" 多边形顶点 {vertices_in} -> {vertices_out} (减少 {simplify_report['vertex_reduction']:.1%})，"
+                        f"标签字节 {bytes_in} -> {bytes_out} (减少 {simplify_report['byte_reduction']:.1%})。")
         return {
             "status": "success",
-            "message": f"成功转换 {total_files} 个文件。",
+            "message": message,
             "output_label_dir": str(self.label_dir),
             "classes": self.classes,
+            "backend": backend,
+            "converted": converted,
+            "skipped": skipped,
+            "removed": removed,
+            "simplify": simplify_report,
         }
 
 
 # ==========================================================
-#  split_dataset 函数保持不变，它已经是正确的
+#  验证集图片落地：复制 / 硬链接 / 符号链接 / reflink
+# ==========================================================
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.bmp', '.webp']
+MATERIALIZE_MODES = ('copy', 'hardlink', 'symlink', 'reflink', 'auto')
+# 每种模式失败后依次尝试的方式，最终都会退回到普通复制
+_MATERIALIZE_CHAINS = {
+    'copy': ('copy',),
+    'hardlink': ('hardlink', 'copy'),
+    'symlink': ('symlink', 'copy'),
+    'reflink': ('reflink', 'copy'),
+    'auto': ('reflink', 'hardlink', 'copy'),
+}
+# 每种模式下可以直接沿用的已有目标（reflink 克隆与普通复制无法区分）
+_MATERIALIZED_KINDS = {
+    'copy': ('copy',),
+    'hardlink': ('hardlink',),
+    'symlink': ('symlink',),
+    'reflink': ('copy',),
+    'auto': ('hardlink', 'copy'),
+}
+# Linux 的 FICLONE ioctl（btrfs / xfs 等支持写时复制的文件系统）
+_FICLONE = 0x40049409
+
+
+def _reflink(src: Path, dst: Path):
+    """写时复制克隆文件，文件系统或平台不支持时抛出 OSError。"""
+    if not sys.platform.startswith('linux'):
+        raise OSError(f"当前平台 '{sys.platform}' 不支持 reflink")
+    import fcntl
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            dst.unlink()
+            raise
+    shutil.copystat(src, dst)
+
+
+def _materialized_kind(src: Path, dst: Path) -> Optional[str]:
+    """目标文件与源文件一致时返回其落地方式 'symlink' / 'hardlink' / 'copy'，不存在或不一致时返回 None。"""
+    try:
+        if dst.is_symlink():
+            return 'symlink' if dst.resolve() == src.resolve() else None
+        dst_stat = dst.stat()
+    except OSError:
+        return None
+    src_stat = src.stat()
+    if (dst_stat.st_dev, dst_stat.st_ino) == (src_stat.st_dev, src_stat.st_ino):
+        return 'hardlink'
+    if dst_stat.st_size == src_stat.st_size and int(dst_stat.st_mtime) == int(src_stat.st_mtime):
+        return 'copy'
+    return None
+
+
+def _materialize_file(src: Path, dst: Path, mode: str) -> str:
+    """
+    按模式把 src 落地到 dst，返回实际使用的方式；目标已一致且落地方式与模式相符时返回 'skipped'。
+    方式不符（例如从 symlink 改为 copy）时重新落地；先写到临时文件再替换，
+    链接全部失败而已有的复制仍然一致时保留它，不再重复复制。
+    """
+    kind = _materialized_kind(src, dst)
+    if kind in _MATERIALIZED_KINDS[mode]:
+        return 'skipped'
+    tmp = dst.with_name(dst.name + '.tmp')
+    if tmp.exists() or tmp.is_symlink():
+        tmp.unlink()
+
+    error = None
+    for method in _MATERIALIZE_CHAINS[mode]:
+        if method == 'copy' and kind == 'copy':
+            return 'skipped'
+        try:
+            if method == 'reflink':
+                _reflink(src, tmp)
+            elif method == 'hardlink':
+                os.link(src, tmp)
+            elif method == 'symlink':
+                os.symlink(src.resolve(), tmp)
+            else:
+                shutil.copy2(src, tmp)
+            os.replace(tmp, dst)
+            return method
+        except OSError as e:
+            error = e
+            if tmp.exists() or tmp.is_symlink():
+                tmp.unlink()
+    raise error
+
+
+def materialize_files(src_files: List[Path], dst_dir: Path, mode: str = 'copy') -> Dict[str, int]:
+    """
+    并行地把一批文件落地到 dst_dir，返回每种实际方式的文件数。
+    链接/克隆失败（跨分区、权限不足、文件系统不支持）时自动退回复制。
+    """
+    if mode not in MATERIALIZE_MODES:
+        raise ValueError(f"未知的落地模式 '{mode}'，可选: {MATERIALIZE_MODES}")
+    counts = {}
+    if not src_files:
+        return counts
+    dst_dir.mkdir(parents=True, exist_ok=True)
+    # 纯 I/O 任务，线程数可以比 CPU 核数多
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 4) * 4)) as executor:
+        futures = {executor.submit(_materialize_file, p, dst_dir / p.name, mode): p for p in src_files}
+        for future in as_completed(futures):
+            try:
+                method = future.result()
+            except Exception as e:
+                print(f"落地文件 {futures[future].name} 时发生错误: {e}")
+                method = 'failed'
+            counts[method] = counts.get(method, 0) + 1
+    return counts
+
+
+# ==========================================================
+#  划分训练/验证集并生成 data.yaml
 # ==========================================================
-def split_dataset(dataset_path: str, classes: List[str], train_ratio: float = 0.9) -> str:
+def _split_units(matched_images: List[Path], duplicates: List[List[str]], duplicate_mode: str):
+    """
+    把待划分的图片组织成划分单元，返回 (单元列表, 丢弃的图片数)。
+    'drop': 每个近似重复簇只保留第一张（簇的代表，通常是连拍的第一帧），其余丢弃；
+    'group': 同一簇的图片组成一个单元，整体划入训练集或验证集。
+    """
+    by_name = {p.name: p for p in matched_images}
+    units, clustered, dropped = [], set(), 0
+    for cluster in duplicates:
+        members = [by_name[name] for name in cluster if name in by_name]
+        clustered.update(p.name for p in members)
+        if duplicate_mode == 'drop':
+            units.extend([p] for p in members[:1])
+            dropped += max(len(members) - 1, 0)
+        elif members:
+            units.append(members)
+    units.extend([p] for p in matched_images if p.name not in clustered)
+    return units, dropped
+
+
+SPLIT_MODES = ('random', 'hash')
+# 哈希划分的盐值：改变它等于重新洗牌，所有图片的归属都会变化
+_SPLIT_HASH_SALT = 'yolo-split-v1:'
+
+
+def _stable_fraction(stem: str) -> float:
+    """把文件名（不含扩展名）稳定地映射到 [0, 1)，只取决于名称本身，与数据集中的其它图片无关。"""
+    digest = hashlib.sha1((_SPLIT_HASH_SALT + stem).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') / 2 ** 64
+
+
+def _label_classes(label_dir: Path, stems) -> Dict[str, set]:
+    """每个标签文件中出现的类别下标。"""
+    result = {}
+    for stem in stems:
+        try:
+            with open(label_dir / f'{stem}.txt', 'r', encoding='utf-8') as f:
+                result[stem] = {int(line.split(maxsplit=1)[0]) for line in f if line.strip()}
+        except (OSError, ValueError):
+            result[stem] = set()
+    return result
+
+
+SPLIT_STATE_FILE = 'split_state.json'
+
+
+def _load_split_state(dataset_path: Path, train_ratio: float):
+    """
+    上一次分层哈希划分的状态：(补入验证集的单元, 上一次训练集中的文件名主干)。
+    盐值或 train_ratio 不同、或上一次不是分层哈希划分时返回两个空集合。
+    """
+    try:
+        with open(dataset_path / SPLIT_STATE_FILE, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return set(), set()
+    if (not state.get('stratify') or state.get('salt') != _SPLIT_HASH_SALT
+            or state.get('train_ratio') != train_ratio):
+        return set(), set()
+    try:
+        with open(dataset_path / 'train.txt', 'r', encoding='utf-8') as f:
+            previous_train = {Path(line.strip()).stem for line in f if line.strip()}
+    except OSError:
+        previous_train = set()
+    return set(state.get('promoted', [])), previous_train
+
+
+def _hash_split(units: List[List[Path]], train_ratio: float, label_dir: Path = None,
+                promoted_before: set = frozenset(), previous_train: set = frozenset()):
+    """
+    按哈希划分，返回 (每个单元是否划入验证集, 补入验证集的单元键集合)。
+    单元的键取其中最小的文件名主干，键的哈希值 >= train_ratio 的单元进入验证集。新增图片不会改变已有图片的归属，
+    train_ratio 变化时也只有落在新旧阈值之间的图片移动。
+    传入 label_dir 时按类别分层：从图片数最少的类别开始，验证集中该类别的单元数少于
+    round(n * (1 - train_ratio))（至少 1，类别只出现在 1 个单元中时除外）时，从训练集中补入含该类别的单元，
+    优先补入上一次划分时不在训练集中的（新增的）单元，其次是哈希值最接近阈值的。
+    补入的单元记录在 split_state.json 中（promoted_before），之后的划分中始终留在验证集，
+    所以数据集增长时已有图片不会从验证集回到训练集；代价是稀有类别的验证集比例可能逐渐高于目标。
+    关闭分层或改变 train_ratio 后，补入记录失效，这些图片按哈希值重新归属。
+    """
+    keys = [min(p.stem for p in unit) for unit in units]
+    scores = [_stable_fraction(key) for key in keys]
+    is_val = [score >= train_ratio for score in scores]
+    promoted = set()
+    if label_dir is not None:
+        for k, key in enumerate(keys):
+            if not is_val[k] and key in promoted_before:
+                is_val[k] = True
+                promoted.add(key)
+        classes_by_stem = _label_classes(label_dir, [p.stem for unit in units for p in unit])
+        unit_classes = [set().union(*(classes_by_stem[p.stem] for p in unit)) for unit in units]
+        counts = {}
+        for unit_class in unit_classes:
+            for cls in unit_class:
+                counts[cls] = counts.get(cls, 0) + 1
+        for cls in sorted(counts, key=lambda c: (counts[c], c)):
+            if counts[cls] < 2:
+                continue
+            target = max(1, round(counts[cls] * (1 - train_ratio)))
+            have = sum(1 for k, unit_class in enumerate(unit_classes) if is_val[k] and cls in unit_class)
+            candidates = sorted((k for k, unit_class in enumerate(unit_classes) if not is_val[k] and cls in unit_class),
+                                key=lambda k: (any(p.stem in previous_train for p in units[k]), -scores[k]))
+            for k in candidates[:max(0, target - have)]:
+                is_val[k] = True
+                promoted.add(keys[k])
+    if len(units) > 1 and not any(is_val):
+        # 数据集很小时可能没有单元超过阈值，验证集至少要有一个单元
+        k = max(range(len(units)), key=lambda k: scores[k])
+        is_val[k] = True
+        promoted.add(keys[k])
+    return is_val, promoted
+
+
+def _remove_stale_files(directory: Path, keep_names: set) -> int:
+    """删除目录中不在 keep_names 里的图片文件（上次划分留下、本次已不属于验证集的），返回删除数。"""
+    if not directory.is_dir():
+        return 0
+    removed = 0
+    for entry in os.scandir(directory):
+        if entry.name not in keep_names and os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS:
+            try:
+                os.unlink(entry.path)
+                removed += 1
+            except OSError as e:
+                print(f"删除过期的验证集图片 {entry.name} 时发生错误: {e}")
+    return removed
+
+
+def split_dataset(dataset_path: str, classes: List[str], train_ratio: float = 0.9,
+                  materialize_mode: str = 'copy', instrumentation: Instrumentation = None,
+                  index: DatasetIndex = None, duplicates: List[List[str]] = None,
+                  duplicate_mode: str = 'group', split_mode: str = 'random', stratify: bool = False) -> str:
+    """
+    划分训练/验证集，写出 train.txt / val.txt / data.yaml，并落地 val_images。
+    传入 index 时图片和标签列表从索引中查询（调用者需保证索引已刷新，例如刚执行过转换），不再遍历文件夹。
+    duplicates 为 image_dedup.find_near_duplicates 得到的近似重复簇（图片文件名列表），
+    duplicate_mode 为 'drop' 时每簇只保留一张，为 'group' 时同一簇不会被拆到训练集和验证集两边。
+    split_mode 为 'random' 时每次随机打乱；为 'hash' 时按文件名的稳定哈希划分（见 _hash_split），
+    重新转换或数据集增长时已有图片的归属不变，stratify 为 True 时再按类别分层（补入验证集的图片记录在
+    split_state.json 中，之后始终留在验证集）。
+    val_images 只落地新增/变化的图片，并删除已不属于验证集的图片。
+    """
+    if duplicate_mode not in ('drop', 'group'):
+        raise ValueError(f"未知的 duplicate_mode '{duplicate_mode}'，可选: drop / group")
+    if split_mode not in SPLIT_MODES:
+        raise ValueError(f"未知的 split_mode '{split_mode}'，可选: {' / '.join(SPLIT_MODES)}")
+    instr = instrumentation or NULL_INSTRUMENTATION
+    scan_start = time.perf_counter()
     dataset_path = Path(dataset_path)
     image_dir = dataset_path / 'images'
     label_dir = dataset_path / 'labels'
@@ -150,38 +959,93 @@ def split_dataset(dataset_path: str, classes: List[str], train_ratio: float = 0.
     if not image_dir.exists() or not label_dir.exists():
         raise FileNotFoundError(f"错误: 必须同时存在 'images' ({image_dir}) 和 'labels' ({label_dir}) 文件夹。")
 
-    image_extensions = ['.jpg', '.jpeg', '.png', '.bmp', '.webp']
-    image_files = [p for p in image_dir.glob('*') if p.suffix.lower() in image_extensions]
+    if index is not None:
+        image_files = [image_dir / name for name in index.files('image')]
+    else:
+        image_files = [p for p in image_dir.glob('*') if p.suffix.lower() in IMAGE_EXTENSIONS]
     if not image_files:
         raise FileNotFoundError(f"错误: 在 'images' 文件夹 ({image_dir}) 中没有找到任何支持的图片文件。")
-    label_stems = {p.stem for p in label_dir.glob('*.txt')}
+    label_stems = index.stems('label') if index is not None else {p.stem for p in label_dir.glob('*.txt')}
     if not label_stems:
         raise FileNotFoundError(f"错误: 在 'labels' 文件夹 ({label_dir}) 中没有找到任何 .txt 标签文件。")
     matched_images = [p for p in image_files if p.stem in label_stems]
+    image_stems = {p.stem for p in image_files}
+    labels_not_in_images, images_not_in_labels = label_stems - image_stems, image_stems - label_stems
     if not matched_images:
-        image_stems = {p.stem for p in image_files}
-        labels_not_in_images, images_not_in_labels = label_stems - image_stems, image_stems - label_stems
         error_msg = f"在 'images' 文件夹中没有找到任何与 'labels' 文件夹中标签匹配的图片。\n"
         error_msg += f"诊断信息: 共找到 {len(image_stems)} 张图片, {len(label_stems)} 个标签。\n"
         if labels_not_in_images: error_msg += f"- 示例标签 (有标签但无对应图片): {list(labels_not_in_images)[:3]}...\n"
         if images_not_in_labels: error_msg += f"- 示例图片 (有图片但无对应标签): {list(images_not_in_labels)[:3]}...\n"
         error_msg += "请重点检查：文件名是否完全一致（除扩展名）？文件名是否包含特殊字符或大小写不一致？"
         raise ValueError(error_msg)
+    if labels_not_in_images or images_not_in_labels:
+        # 部分不配对时不中断，但给出与上面相同格式的诊断，详细检查可运行 python -m cli check
+        print(f"警告: {len(images_not_in_labels)} 张图片没有标签、{len(labels_not_in_images)} 个标签没有图片，"
+              f"它们不参与划分。示例: {sorted(images_not_in_labels)[:3] + sorted(labels_not_in_images)[:3]}")
+    instr.count('split.unpaired_images', len(images_not_in_labels))
+    instr.count('split.unpaired_labels', len(labels_not_in_images))
+    instr.add_time('split.scan', time.perf_counter() - scan_start)
 
-    random.shuffle(matched_images)
-    split_index = int(len(matched_images) * train_ratio)
-    train_files, val_files = matched_images[:split_index], matched_images[split_index:]
+    with instr.timer('split.write_lists'):
+        if split_mode == 'hash':
+            if duplicates:
+                units, dropped = _split_units(matched_images, duplicates, duplicate_mode)
+                if dropped:
+                    print(f"已丢弃 {dropped} 张近似重复的图片。")
+                instr.count('split.duplicates_dropped', dropped)
+            else:
+                units = [[p] for p in matched_images]
+            promoted_before, previous_train = _load_split_state(dataset_path, train_ratio) if stratify else (set(), set())
+            is_val, promoted = _hash_split(units, train_ratio, label_dir if stratify else None,
+                                           promoted_before, previous_train)
+            train_files = sorted((p for unit, val in zip(units, is_val) if not val for p in unit), key=lambda p: p.name)
+            val_files = sorted((p for unit, val in zip(units, is_val) if val for p in unit), key=lambda p: p.name)
+            if promoted:
+                print(f"按类别分层补入验证集 {len(promoted)} 组图片（其中新补入 {len(promoted - promoted_before)} 组）。")
+            instr.count('split.stratify_promoted', len(promoted))
+            if stratify:
+                with open(dataset_path / SPLIT_STATE_FILE, 'w', encoding='utf-8') as f:
+                    json.dump({'stratify': True, 'salt': _SPLIT_HASH_SALT, 'train_ratio': train_ratio,
+                               'promoted': sorted(promoted)}, f, ensure_ascii=False)
+        elif duplicates:
+            units, dropped = _split_units(matched_images, duplicates, duplicate_mode)
+            random.shuffle(units)
+            target = int(sum(len(unit) for unit in units) * train_ratio)
+            train_files, val_files = [], []
+            for unit in units:
+                (train_files if len(train_files) < target else val_files).extend(unit)
+            if dropped:
+                print(f"已丢弃 {dropped} 张近似重复的图片。")
+            instr.count('split.duplicates_dropped', dropped)
+        else:
+            random.shuffle(matched_images)
+            split_index = int(len(matched_images) * train_ratio)
+            train_files, val_files = matched_images[:split_index], matched_images[split_index:]
+        if not (split_mode == 'hash' and stratify):
+            # 本次没有分层，之前的补入记录作废，之后重新开启分层时从头计算
+            try:
+                (dataset_path / SPLIT_STATE_FILE).unlink()
+            except FileNotFoundError:
+                pass
 
-    with open(dataset_path / 'train.txt', 'w', encoding='utf-8') as f:
-        for p in train_files: f.write(f'./images/{p.name}\n')
-    with open(dataset_path / 'val.txt', 'w', encoding='utf-8') as f:
-        for p in val_files: f.write(f'./images/{p.name}\n')
+        with open(dataset_path / 'train.txt', 'w', encoding='utf-8') as f:
+            for p in train_files: f.write(f'./images/{p.name}\n')
+        with open(dataset_path / 'val.txt', 'w', encoding='utf-8') as f:
+            for p in val_files: f.write(f'./images/{p.name}\n')
+    instr.count('split.train_images', len(train_files))
+    instr.count('split.val_images', len(val_files))
 
-    if val_files:
-        val_images_dir.mkdir(parents=True, exist_ok=True)
-        for img_path in val_files:
-            destination_path = val_images_dir / img_path.name
-            shutil.copy2(img_path, destination_path)
+    with instr.timer('split.materialize'):
+        counts = materialize_files(val_files, val_images_dir, materialize_mode)
+        removed = _remove_stale_files(val_images_dir, {p.name for p in val_files})
+    if removed:
+        counts['removed'] = removed
+    if counts:
+        print(f"验证集图片落地完成 (模式: {materialize_mode}): {counts}")
+        for method, n in counts.items():
+            instr.count(f'split.materialize.{method}', n)
+        if instr.enabled and val_files:
+            instr.add_bytes('split.val_images', sum(p.stat().st_size for p in val_files))
 
     data_yaml_content = {
         'train': str(dataset_path / 'train.txt'),
@@ -190,7 +1054,10 @@ def split_dataset(dataset_path: str, classes: List[str], train_ratio: float = 0.
         'names': classes
     }
     data_yaml_path = dataset_path / 'data.yaml'
-    with open(data_yaml_path, 'w', encoding='utf-8') as f:
-        yaml.dump(data_yaml_content, f, sort_keys=False, allow_unicode=True)
+    with instr.timer('split.write_yaml'):
+        # yaml 只在这里用到，按需导入，让只做转换或只跑命令行任务的场景启动更快
+        import yaml
+        with open(data_yaml_path, 'w', encoding='utf-8') as f:
+            yaml.dump(data_yaml_content, f, sort_keys=False, allow_unicode=True)
 
     return str(data_yaml_path)
\ No newline at end of file
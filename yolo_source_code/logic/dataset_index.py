@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+'''
+@Project ：yolo_source_code
+@File    ：dataset_index.py
+@Author  ：fengzhengxiong
+@Date    ：2026/10/18 17:10
+'''
+
+
+import os
+import sqlite3
+from pathlib import Path
+from typing import Dict, Any, Iterable, List, Set
+
+INDEX_FILENAME = 'dataset_index.db'
+SCHEMA_VERSION = '2'
+# files 表中各类文件所在的文件夹及其扩展名（图片扩展名与 data_converter.IMAGE_EXTENSIONS 一致）
+FILE_KINDS = {
+    'json': ('jsons', ('.json',)),
+    'image': ('images', ('.jpg', '.jpeg', '.png', '.bmp', '.webp')),
+    'label': ('labels', ('.txt',)),
+}
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (
+    kind TEXT, name TEXT, stem TEXT, size INTEGER, mtime_ns INTEGER, PRIMARY KEY (kind, name));
+CREATE INDEX IF NOT EXISTS files_stem ON files (kind, stem);
+CREATE TABLE IF NOT EXISTS annotations (
+    json_name TEXT PRIMARY KEY, stem TEXT, width INTEGER, height INTEGER,
+    size INTEGER, mtime_ns INTEGER, sha1 TEXT, shapes INTEGER, vertices INTEGER,
+    min_x REAL, min_y REAL, max_x REAL, max_y REAL);
+CREATE TABLE IF NOT EXISTS instances (
+    json_name TEXT, label TEXT, shape_type TEXT, count INTEGER, vertices INTEGER,
+    PRIMARY KEY (json_name, label, shape_type));
+'''
+
+
+def annotation_entry(json_name: str, record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    把 _parse_labelme_json 的结果压缩成索引条目（体积很小，可以从进程池传回）。
+    instances 为 [(label, shape_type, 数量, 顶点数), ...]，不支持的形状类型记为 'other'。
+    extent 为所有点的外接范围 (min_x, min_y, max_x, max_y)（像素坐标），没有点时为 None，供完整性检查使用。
+    """
+    grouped = {}
+    vertices = 0
+    extent = None
+    for label, shape_type, coords in record['shapes']:
+        points = (len(coords) // 2 if shape_type == 'polygon' else 2) if shape_type else 0
+        vertices += points
+        if points:
+            xs, ys = coords[0::2], coords[1::2]
+            box = (min(xs), min(ys), max(xs), max(ys))
+            extent = box if extent is None else (min(extent[0], box[0]), min(extent[1], box[1]),
+                                                 max(extent[2], box[2]), max(extent[3], box[3]))
+        entry = grouped.setdefault((label, shape_type or 'other'), [0, 0])
+        entry[0] += 1
+        entry[1] += points
+    fingerprint = record['fingerprint']
+    return {
+        'json_name': json_name, 'width': record['width'], 'height': record['height'],
+        'size': fingerprint['size'], 'mtime_ns': fingerprint['mtime_ns'], 'sha1': fingerprint['sha1'],
+        'shapes': len(record['shapes']), 'vertices': vertices, 'extent': extent,
+        'instances': [(label, shape_type, n, v) for (label, shape_type), (n, v) in grouped.items()],
+    }
+
+
+class DatasetIndex:
+    """
+    数据集根目录下的持久化索引（SQLite，单个文件 dataset_index.db）：
+    - files: jsons / images / labels 中的文件及其 (大小, 修改时间)
+    - annotations / instances: 每个 JSON 的图片尺寸、内容指纹，以及按 (类别, 形状类型) 统计的实例数和顶点数
+    标注信息由 LabelmeConverter 在转换时顺带写入（不会为建索引再读一遍 JSON），
+    files 由 refresh_files() 增量刷新。类别发现、划分数据集和统计信息都直接查询索引。
+    连接只能在创建它的线程中使用。
+    """
+
+    def __init__(self, dataset_root):
+        self.root = Path(dataset_root)
+        self.path = self.root / INDEX_FILENAME
+        self.conn = sqlite3.connect(self.path)
+        # 索引可以随时从数据集重建，不需要每次提交都落盘同步
+        self.conn.execute('PRAGMA synchronous = OFF')
+        self.conn.execute('PRAGMA journal_mode = MEMORY')
+        self._init_schema()
+
+    def _init_schema(self):
+        self.conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+        if row is None or row[0] != SCHEMA_VERSION:
+            # 表结构变化时直接重建，索引内容会在下一次转换时重新写入
+            with self.conn:
+                for table in ('files', 'annotations', 'instances'):
+                    self.conn.execute(f'DROP TABLE IF EXISTS {table}')
+        self.conn.executescript(_SCHEMA)
+        if row is None or row[0] != SCHEMA_VERSION:
+            with self.conn:
+                self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('schema_version', ?)", (SCHEMA_VERSION,))
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    # ---------------- 文件列表 ----------------
+    def refresh_files(self, kinds: Iterable[str] = tuple(FILE_KINDS)) -> Dict[str, Dict[str, int]]:
+        """
+        用 os.scandir 列出各文件夹（只读目录项和元数据，不读文件内容），与索引比对后增量更新。
+        返回每类文件的 {'total', 'added', 'changed', 'removed'}。
+        """
+        report = {}
+        for kind in kinds:
+            folder, extensions = FILE_KINDS[kind]
+            known = {name: (size, mtime_ns) for name, size, mtime_ns in
+                     self.conn.execute('SELECT name, size, mtime_ns FROM files WHERE kind = ?', (kind,))}
+            current = {}
+            directory = self.root / folder
+            if directory.is_dir():
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if entry.is_file() and os.path.splitext(entry.name)[1].lower() in extensions:
+                            stat = entry.stat()
+                            current[entry.name] = (stat.st_size, stat.st_mtime_ns)
+            upserts = [(kind, name, os.path.splitext(name)[0], size, mtime_ns)
+                       for name, (size, mtime_ns) in current.items() if known.get(name) != (size, mtime_ns)]
+            removed = [(kind, name) for name in known if name not in current]
+            with self.conn:
+                self.conn.executemany('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)', upserts)
+                self.conn.executemany('DELETE FROM files WHERE kind = ? AND name = ?', removed)
+            added = sum(1 for _, name, *_ in upserts if name not in known)
+            report[kind] = {'total': len(current), 'added': added, 'changed': len(upserts) - added,
+                            'removed': len(removed)}
+        return report
+
+    def files(self, kind: str) -> List[str]:
+        return [row[0] for row in self.conn.execute('SELECT name FROM files WHERE kind = ? ORDER BY name', (kind,))]
+
+    def stems(self, kind: str) -> Set[str]:
+        return {row[0] for row in self.conn.execute('SELECT stem FROM files WHERE kind = ?', (kind,))}
+
+    def paired_images(self) -> List[str]:
+        """有对应标签文件的图片文件名。"""
+        return [row[0] for row in self.conn.execute(
+            "SELECT i.name FROM files i JOIN files l ON l.kind = 'label' AND l.stem = i.stem "
+            "WHERE i.kind = 'image' ORDER BY i.name")]
+
+    # ---------------- 标注信息 ----------------
+    def annotated_names(self) -> Set[str]:
+        return {row[0] for row in self.conn.execute('SELECT json_name FROM annotations')}
+
+    def update_annotations(self, entries: List[Dict[str, Any]]):
+        """写入（覆盖）一批 annotation_entry() 生成的条目。"""
+        if not entries:
+            return
+        names = [(e['json_name'],) for e in entries]
+        with self.conn:
+            self.conn.executemany('DELETE FROM instances WHERE json_name = ?', names)
+            self.conn.executemany('INSERT OR REPLACE INTO annotations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', [
+                (e['json_name'], os.path.splitext(e['json_name'])[0], e['width'], e['height'], e['size'],
+                 e['mtime_ns'], e['sha1'], e['shapes'], e['vertices'], *(e['extent'] or (None,) * 4))
+                for e in entries])
+            self.conn.executemany('INSERT INTO instances VALUES (?, ?, ?, ?, ?)', [
+                (e['json_name'], *instance) for e in entries for instance in e['instances']])
+
+    def remove_annotations(self, json_names: Iterable[str]):
+        names = [(name,) for name in json_names]
+        if not names:
+            return
+        with self.conn:
+            self.conn.executemany('DELETE FROM instances WHERE json_name = ?', names)
+            self.conn.executemany('DELETE FROM annotations WHERE json_name = ?', names)
+
+    def classes(self) -> List[str]:
+        """所有标注中出现过的类别，排序后即为 YOLO 的类别索引顺序。"""
+        return [row[0] for row in self.conn.execute('SELECT DISTINCT label FROM instances ORDER BY label')]
+
+    def annotation_geometry(self) -> Dict[str, tuple]:
+        """
+        每个 JSON 的 (size, mtime_ns, width, height, extent)，extent 为 (min_x, min_y, max_x, max_y) 或 None。
+        size / mtime_ns 与 JSON 当前的元数据一致时，这些值可以代替重新解析。
+        """
+        return {row[0]: (row[1], row[2], row[3], row[4], None if row[5] is None else row[5:]) for row in
+                self.conn.execute('SELECT json_name, size, mtime_ns, width, height, '
+                                  'min_x, min_y, max_x, max_y FROM annotations')}
+
+    def image_size(self, stem: str):
+        """JSON 中记录的图片尺寸 (width, height)，没有时返回 None。"""
+        return self.conn.execute('SELECT width, height FROM annotations WHERE stem = ?', (stem,)).fetchone()
+
+    def stats(self) -> Dict[str, Any]:
+        """数据集统计：文件数、各类别的实例数/图片数/形状类型/顶点数、图片尺寸分布。"""
+        file_counts = dict(self.conn.execute('SELECT kind, COUNT(*) FROM files GROUP BY kind').fetchall())
+        annotated, shapes, vertices = self.conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(shapes), 0), COALESCE(SUM(vertices), 0) FROM annotations').fetchone()
+        classes = {}
+        for label, shape_type, count, class_vertices in self.conn.execute(
+                'SELECT label, shape_type, SUM(count), SUM(vertices) FROM instances '
+                'GROUP BY label, shape_type ORDER BY label'):
+            entry = classes.setdefault(label, {'instances': 0, 'vertices': 0, 'shape_types': {}})
+            entry['instances'] += count
+            entry['vertices'] += class_vertices
+            entry['shape_types'][shape_type] = count
+        for label, images in self.conn.execute(
+                'SELECT label, COUNT(DISTINCT json_name) FROM instances GROUP BY label'):
+            classes[label]['images'] = images
+        image_sizes = {f'{w}x{h}': n for w, h, n in self.conn.execute(
+            'SELECT width, height, COUNT(*) FROM annotations GROUP BY width, height ORDER BY COUNT(*) DESC')}
+        return {
+            'files': {kind: file_counts.get(kind, 0) for kind in FILE_KINDS},
+            'annotated': annotated,
+            'shapes': shapes,
+            'vertices': vertices,
+            'classes': classes,
+            'image_sizes': image_sizes,
+        }
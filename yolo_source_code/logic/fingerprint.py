@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+'''
+@Project ：yolo_source_code
+@File    ：fingerprint.py
+@Author  ：fengzhengxiong
+@Date    ：2026/10/18 15:00
+'''
+
+
+import os
+import hashlib
+from pathlib import Path
+from typing import Iterable
+
+# 超过该大小的文件只用 (大小, 修改时间) 作为指纹，避免每次都完整读取大文件
+CONTENT_HASH_MAX_BYTES = 256 * 1024 * 1024
+
+
+def _update_with_file(sha1, path: Path, stat: os.stat_result):
+    if stat.st_size > CONTENT_HASH_MAX_BYTES:
+        sha1.update(f'{stat.st_size}:{stat.st_mtime_ns}'.encode())
+        return
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            sha1.update(block)
+
+
+def _update_with_dir(sha1, root: Path):
+    """目录按 (相对路径, 大小, 修改时间) 计算指纹，不读取文件内容。"""
+    entries = []
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        with os.scandir(current) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(Path(entry.path))
+                else:
+                    stat = entry.stat()
+                    entries.append(f'{Path(entry.path).relative_to(root).as_posix()}:{stat.st_size}:{stat.st_mtime_ns}')
+    for line in sorted(entries):
+        sha1.update(line.encode('utf-8'))
+        sha1.update(b'\n')
+
+
+def fingerprint_paths(paths: Iterable, extra: Iterable[str] = ()) -> str:
+    """
+    计算一组输入的指纹：文件按内容，目录按其中文件的元数据，不存在的路径也会记录下来。
+    extra 用于加入命令行、转换参数等非文件输入。
+    """
+    sha1 = hashlib.sha1()
+    for path in paths:
+        path = Path(path)
+        sha1.update(f'<{path.as_posix()}>'.encode('utf-8'))
+        try:
+            stat = path.stat()
+        except OSError:
+            sha1.update(b'missing')
+            continue
+        if path.is_dir():
+            _update_with_dir(sha1, path)
+        else:
+            _update_with_file(sha1, path, stat)
+    for item in extra:
+        sha1.update(f'[{item}]'.encode('utf-8'))
+    return sha1.hexdigest()
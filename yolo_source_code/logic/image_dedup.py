@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+'''
+@Project ：yolo_source_code
+@File    ：image_dedup.py
+@Author  ：fengzhengxiong
+@Date    ：2026/10/18 18:20
+'''
+
+
+import os
+import json
+import time
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Tuple
+
+from logic.data_converter import IMAGE_EXTENSIONS
+
+CACHE_FILENAME = 'image_hashes.json'
+DUPLICATES_FILENAME = 'duplicates.json'
+CACHE_VERSION = 1
+DEDUP_MODES = ('off', 'drop', 'group')
+LINKAGES = ('single', 'leader')
+# 每个进程任务处理的图片数
+_BATCH_SIZE = 64
+
+# Python 3.10 起 int 自带 bit_count()
+_popcount = getattr(int, 'bit_count', None) or (lambda x: bin(x).count('1'))
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return _popcount(a ^ b)
+
+
+# ==========================================================
+#  感知哈希（dHash）：缩小为 (n+1) x n 的灰度图，比较每行相邻像素的明暗，得到 n*n 位的整数。
+#  亮度、压缩噪声的小变化不影响结果，连拍的相邻帧之间汉明距离通常只有几位。
+# ==========================================================
+def _dhash_pixels(pixels, hash_size: int) -> int:
+    value = 0
+    width = hash_size + 1
+    for y in range(hash_size):
+        row = y * width
+        for x in range(hash_size):
+            value = (value << 1) | (pixels[row + x] < pixels[row + x + 1])
+    return value
+
+
+def compute_dhash(image_path, hash_size: int = 8) -> int:
+    """计算单张图片的 dHash。优先使用 Pillow，没有安装时退回 PySide6 的 QImage。"""
+    size = (hash_size + 1, hash_size)
+    try:
+        from PIL import Image
+    except ImportError:
+        Image = None
+
+    if Image is not None:
+        with Image.open(image_path) as img:
+            # JPEG 可以在解码时直接缩小，其它格式忽略 draft
+            img.draft('L', (size[0] * 8, size[1] * 8))
+            small = img.convert('L').resize(size, Image.BOX)
+            return _dhash_pixels(small.tobytes(), hash_size)
+
+    from PySide6.QtCore import Qt
+    from PySide6.QtGui import QImage
+    image = QImage(str(image_path))
+    if image.isNull():
+        raise ValueError(f"无法读取图片 '{Path(image_path).name}'")
+    small = image.convertToFormat(QImage.Format_Grayscale8).scaled(
+        size[0], size[1], Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+    pixels = [small.pixel(x, y) & 0xFF for y in range(size[1]) for x in range(size[0])]
+    return _dhash_pixels(pixels, hash_size)
+
+
+def _hash_batch(paths: List[Path], hash_size: int) -> List[Tuple[str, Any]]:
+    """在进程池中计算一批图片的哈希，返回 [(文件名, 十六进制哈希 或 异常), ...]。"""
+    results = []
+    for path in paths:
+        try:
+            results.append((path.name, format(compute_dhash(path, hash_size), 'x')))
+        except Exception as e:
+            results.append((path.name, e))
+    return results
+
+
+class BKTree:
+    """
+    以汉明距离为度量的 BK 树，用于查找距离不超过 radius 的所有哈希。
+    每个节点为 [哈希, 条目列表, {到该节点的距离: 子节点}]，相同哈希的条目放在同一个节点里。
+    """
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, value: int, item):
+        self.size += 1
+        if self.root is None:
+            self.root = [value, [item], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming_distance(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def search(self, value: int, radius: int) -> List[Tuple[int, Any]]:
+        """返回 [(距离, 条目), ...]。三角不等式保证只需访问距离在 [d - radius, d + radius] 内的子树。"""
+        results = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming_distance(value, node[0])
+            if distance <= radius:
+                results.extend((distance, item) for item in node[1])
+            for child_distance, child in node[2].items():
+                if distance - radius <= child_distance <= distance + radius:
+                    stack.append(child)
+        return results
+
+
+def cluster_hashes(hashes: Dict[str, int], threshold: int, linkage: str = 'single') -> List[List[str]]:
+    """
+    把汉明距离不超过 threshold 的图片聚成簇，只返回包含两张及以上图片的簇，簇内和簇之间都按文件名排序。
+    - 'single': 单链接，相似关系传递连通成一簇（并查集）。连拍序列会整段连在一起，适合保证同组图片划入同一侧；
+    - 'leader': 按文件名顺序，尚未归簇的图片作为代表，吸收距离它不超过 threshold 的其余图片。
+      簇内每张图片都与代表（第一张）足够接近，适合只保留代表、丢弃其余图片。
+    """
+    if linkage not in LINKAGES:
+        raise ValueError(f"未知的 linkage '{linkage}'，可选: {LINKAGES}")
+    by_hash = {}
+    for name in sorted(hashes):
+        by_hash.setdefault(hashes[name], []).append(name)
+    tree = BKTree()
+    for value in by_hash:
+        tree.add(value, value)
+
+    if linkage == 'leader':
+        assigned, clusters = set(), []
+        # 按文件名顺序选代表，簇内其余图片的文件名都在代表之后，排序后代表就是第一张
+        for value in sorted(by_hash, key=lambda v: by_hash[v][0]):
+            if value in assigned:
+                continue
+            members = [other for _, other in tree.search(value, threshold) if other not in assigned]
+            assigned.update(members)
+            cluster = sorted(name for other in members for name in by_hash[other])
+            if len(cluster) > 1:
+                clusters.append(cluster)
+        return clusters
+
+    parent = {value: value for value in by_hash}
+
+    def find(value):
+        while parent[value] != value:
+            parent[value] = parent[parent[value]]
+            value = parent[value]
+        return value
+
+    for value in by_hash:
+        for _, other in tree.search(value, threshold):
+            root_a, root_b = find(value), find(other)
+            if root_a != root_b:
+                parent[root_b] = root_a
+
+    groups = {}
+    for value, names in by_hash.items():
+        groups.setdefault(find(value), []).extend(names)
+    return sorted((sorted(names) for names in groups.values() if len(names) > 1), key=lambda names: names[0])
+
+
+def find_near_duplicates(dataset_path: str, threshold: int = 4, hash_size: int = 8, linkage: str = 'single',
+                         max_workers: int = None) -> Dict[str, Any]:
+    """
+    计算 images/ 中所有图片的感知哈希并聚类近似重复的图片，结果写入数据集根目录的 duplicates.json。
+    哈希按 (文件大小, 修改时间) 缓存在 image_hashes.json 中，重复运行只计算新增或变化的图片。
+    threshold 为判定为近似重复的最大汉明距离（hash_size=8 时共 64 位），linkage 见 cluster_hashes()。
+    """
+    dataset_path = Path(dataset_path)
+    image_dir = dataset_path / 'images'
+    if not image_dir.is_dir():
+        raise FileNotFoundError(f"错误: 未找到 'images' 文件夹 ({image_dir})。")
+    cache_path = dataset_path / CACHE_FILENAME
+    settings = {'algorithm': 'dhash', 'hash_size': hash_size}
+
+    cache = {}
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+        if saved.get('version') == CACHE_VERSION and saved.get('settings') == settings:
+            cache = saved['files']
+    except (OSError, ValueError):
+        pass
+
+    start_time = time.perf_counter()
+    new_cache, to_hash = {}, []
+    with os.scandir(image_dir) as it:
+        for entry in it:
+            if not entry.is_file() or os.path.splitext(entry.name)[1].lower() not in IMAGE_EXTENSIONS:
+                continue
+            stat = entry.stat()
+            known = cache.get(entry.name)
+            if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+                new_cache[entry.name] = known
+            else:
+                new_cache[entry.name] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': None}
+                to_hash.append(Path(entry.path))
+
+    failed = 0
+    if to_hash:
+        to_hash.sort()
+        batches = [to_hash[i:i + _BATCH_SIZE] for i in range(0, len(to_hash), _BATCH_SIZE)]
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count() or 4) as executor:
+            for results in executor.map(_hash_batch, batches, [hash_size] * len(batches)):
+                for name, value in results:
+                    if isinstance(value, Exception):
+                        print(f"计算图片 {name} 的哈希时发生错误: {value}")
+                        del new_cache[name]
+                        failed += 1
+                    else:
+                        new_cache[name]['hash'] = value
+    hash_seconds = time.perf_counter() - start_time
+
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': CACHE_VERSION, 'settings': settings, 'files': new_cache}, f, indent=1)
+
+    clusters = cluster_hashes({name: int(entry['hash'], 16) for name, entry in new_cache.items()}, threshold, linkage)
+    duplicates = sum(len(cluster) - 1 for cluster in clusters)
+    with open(dataset_path / DUPLICATES_FILENAME, 'w', encoding='utf-8') as f:
+        json.dump({'threshold': threshold, 'linkage': linkage, **settings, 'clusters': clusters}, f,
+                  ensure_ascii=False, indent=1)
+
+    return {
+        'images': len(new_cache),
+        'hashed': len(to_hash) - failed,
+        'cached': len(new_cache) - len(to_hash) + failed,
+        'failed': failed,
+        'clusters': clusters,
+        'duplicates': duplicates,
+        'hash_seconds': hash_seconds,
+        'seconds': time.perf_counter() - start_time,
+    }
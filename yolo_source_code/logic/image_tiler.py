@@ -0,0 +1,325 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+'''
+@Project ：yolo_source_code
+@File    ：image_tiler.py
+@Author  ：fengzhengxiong
+@Date    ：2026/10/18 18:50
+'''
+
+
+import os
+import json
+import time
+import zlib
+from array import array
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict, Any, Tuple
+
+from logic.data_converter import IMAGE_EXTENSIONS, _parse_labelme_json, _format_shape
+from logic.image_transcoder import _read_split_list
+
+CACHE_VERSION = 1
+TILE_SUFFIX = '.png'
+
+
+def tile_positions(length: int, tile: int, stride: int) -> List[int]:
+    """
+    一个方向上各切片的起点。最后一片与图片边缘对齐，保证边缘区域也被覆盖；
+    图片比切片小时只有一片（切片尺寸即图片尺寸）。
+    """
+    if length <= tile:
+        return [0]
+    positions = list(range(0, length - tile + 1, stride))
+    if positions[-1] + tile < length:
+        positions.append(length - tile)
+    return positions
+
+
+def default_stride(tile_size: int) -> int:
+    """默认相邻切片重叠 20%，切在边界上的目标至少在一片中比较完整。"""
+    return tile_size - tile_size // 5
+
+
+def tiled_dataset_dir(dataset_path, tile_size: int, stride: int = None) -> Path:
+    """切片数据集的输出目录（其中有自己的 data.yaml，可直接作为训练数据集文件夹）。"""
+    return Path(dataset_path) / 'tiled' / f'{tile_size}_s{stride or default_stride(tile_size)}'
+
+
+# ==========================================================
+#  形状裁剪（像素坐标）
+# ==========================================================
+def _polygon_area(points: List[Tuple[float, float]]) -> float:
+    area = 0.0
+    for i in range(len(points)):
+        x1, y1 = points[i - 1]
+        x2, y2 = points[i]
+        area += x1 * y2 - x2 * y1
+    return abs(area) / 2
+
+
+def _clip_edge(points, axis: int, bound: float, keep_greater: bool):
+    """Sutherland-Hodgman 的一步：用一条轴对齐的直线裁剪多边形。"""
+    def inside(p):
+        return p[axis] >= bound if keep_greater else p[axis] <= bound
+
+    def intersect(p, q):
+        t = (bound - p[axis]) / (q[axis] - p[axis])
+        other = p[1 - axis] + t * (q[1 - axis] - p[1 - axis])
+        return (bound, other) if axis == 0 else (other, bound)
+
+    result = []
+    prev = points[-1]
+    prev_inside = inside(prev)
+    for cur in points:
+        cur_inside = inside(cur)
+        if cur_inside:
+            if not prev_inside:
+                result.append(intersect(prev, cur))
+            result.append(cur)
+        elif prev_inside:
+            result.append(intersect(prev, cur))
+        prev, prev_inside = cur, cur_inside
+    return result
+
+
+def clip_polygon(points: List[Tuple[float, float]], box: Tuple[float, float, float, float]):
+    """把多边形裁剪到矩形 box = (x0, y0, x1, y1) 内。裁剪窗口是凸的，凹多边形同样适用。"""
+    x0, y0, x1, y1 = box
+    for axis, bound, keep_greater in ((0, x0, True), (0, x1, False), (1, y0, True), (1, y1, False)):
+        if not points:
+            break
+        points = _clip_edge(points, axis, bound, keep_greater)
+    return points
+
+
+def clip_shapes(shapes: list, box: Tuple[float, float, float, float], min_visibility: float):
+    """
+    把一张图的形状裁剪到切片 box 内，坐标平移到切片左上角。
+    可见面积占原面积的比例低于 min_visibility 的形状被丢弃（只露出一小角的目标会成为噪声标注）。
+    返回 ([(label, shape_type, 切片内坐标), ...], 被丢弃的形状数)。
+    """
+    x0, y0, x1, y1 = box
+    kept, dropped = [], 0
+    for label, shape_type, coords in shapes:
+        if shape_type == 'rectangle':
+            ax1, ax2 = sorted((coords[0], coords[2]))
+            ay1, ay2 = sorted((coords[1], coords[3]))
+            if ax2 <= x0 or ax1 >= x1 or ay2 <= y0 or ay1 >= y1:
+                continue
+            area = (ax2 - ax1) * (ay2 - ay1)
+            cx1, cy1, cx2, cy2 = max(ax1, x0), max(ay1, y0), min(ax2, x1), min(ay2, y1)
+            if area <= 0 or (cx2 - cx1) * (cy2 - cy1) < area * min_visibility:
+                dropped += 1
+                continue
+            kept.append((label, 'rectangle', (cx1 - x0, cy1 - y0, cx2 - x0, cy2 - y0)))
+        elif shape_type == 'polygon':
+            xs, ys = coords[0::2], coords[1::2]
+            if len(xs) < 3 or max(xs) <= x0 or min(xs) >= x1 or max(ys) <= y0 or min(ys) >= y1:
+                continue
+            points = list(zip(xs, ys))
+            if x0 <= min(xs) and max(xs) <= x1 and y0 <= min(ys) and max(ys) <= y1:
+                clipped = points
+            else:
+                clipped = clip_polygon(points, box)
+                area = _polygon_area(points)
+                if len(clipped) < 3 or area <= 0 or _polygon_area(clipped) < area * min_visibility:
+                    dropped += 1
+                    continue
+            kept.append((label, 'polygon', array('d', (c for x, y in clipped for c in (x - x0, y - y0)))))
+    return kept, dropped
+
+
+# ==========================================================
+#  单张图片的切片（在进程池中执行）
+# ==========================================================
+def _open_image(image_path: Path):
+    """返回 (crop(x, y, w, h, 输出路径) 函数, 宽, 高)。优先使用 Pillow，没有安装时退回 PySide6 的 QImage。"""
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        Image = None
+
+    if Image is not None:
+        with Image.open(image_path) as img:
+            # LabelMe 按 EXIF 方向显示和标注图片，切片也要在旋转后的图上进行
+            img = ImageOps.exif_transpose(img)
+            img.load()
+
+        def crop(x, y, w, h, dst):
+            img.crop((x, y, x + w, y + h)).save(dst, 'PNG', compress_level=1)
+        return crop, img.width, img.height
+
+    from PySide6.QtGui import QImageReader
+    reader = QImageReader(str(image_path))
+    reader.setAutoTransform(True)
+    image = reader.read()
+    if image.isNull():
+        raise ValueError(f"无法读取图片 '{image_path.name}': {reader.errorString()}")
+
+    def crop(x, y, w, h, dst):
+        if not image.copy(x, y, w, h).save(str(dst), 'PNG'):
+            raise ValueError(f"无法保存切片 '{Path(dst).name}'")
+    return crop, image.width(), image.height()
+
+
+def _keep_empty_tile(tile_name: str, keep_empty: float) -> bool:
+    """按切片名的哈希抽样空切片，同一切片每次运行的结果相同。"""
+    return keep_empty >= 1 or zlib.crc32(tile_name.encode('utf-8')) / 0xFFFFFFFF < keep_empty
+
+
+def _tile_one(json_path: Path, image_path: Path, out_image_dir: Path, out_label_dir: Path,
+              class_index: Dict[str, int], settings: Dict[str, Any]) -> Dict[str, Any]:
+    record = _parse_labelme_json(json_path)
+    crop, width, height = _open_image(image_path)
+    if (record['width'], record['height']) != (width, height):
+        # 尺寸不一致时以图片为准（完整性预检会报告这种情况），标注坐标本身是像素坐标
+        print(f"警告: {json_path.name} 记录的尺寸 {record['width']}x{record['height']} "
+              f"与图片 {width}x{height} 不一致，按图片尺寸切片。")
+
+    tile_size, stride = settings['tile_size'], settings['stride']
+    summary = {'tiles': [], 'positive': 0, 'empty_kept': 0, 'empty_dropped': 0, 'instances': 0, 'clipped_away': 0}
+    for y in tile_positions(height, tile_size, stride):
+        for x in tile_positions(width, tile_size, stride):
+            w, h = min(tile_size, width), min(tile_size, height)
+            tile_name = f'{image_path.stem}__{x}_{y}'
+            shapes, dropped = clip_shapes(record['shapes'], (x, y, x + w, y + h), settings['min_visibility'])
+            summary['clipped_away'] += dropped
+            lines = []
+            for label, shape_type, coords in shapes:
+                label_idx = class_index.get(label)
+                if label_idx is not None:
+                    lines.append(f"{label_idx} {_format_shape(shape_type, coords, w, h, settings['decimals'])}")
+            if lines:
+                summary['positive'] += 1
+                summary['instances'] += len(lines)
+            elif _keep_empty_tile(tile_name, settings['keep_empty']):
+                summary['empty_kept'] += 1
+            else:
+                summary['empty_dropped'] += 1
+                continue
+            crop(x, y, w, h, out_image_dir / (tile_name + TILE_SUFFIX))
+            # 空切片也写出空标签文件，训练器据此把它当作背景图
+            with open(out_label_dir / (tile_name + '.txt'), 'w', encoding='utf-8') as f:
+                f.write('\n'.join(lines))
+            summary['tiles'].append(tile_name)
+    return summary
+
+
+def tile_dataset(dataset_path: str, classes: List[str], tile_size: int = 640, stride: int = None,
+                 keep_empty: float = 0.1, min_visibility: float = 0.3, decimals: int = 6,
+                 max_workers: int = None) -> Dict[str, Any]:
+    """
+    把划分好的数据集（需要在 split_dataset 之后调用）切成 tile_size x tile_size、步长为 stride 的重叠切片，
+    写出一个标准的 YOLO 数据集: tiled/<尺寸>_s<步长>/{images, labels, train.txt, val.txt, data.yaml}。
+    - 标注从 LabelMe JSON 的像素坐标裁剪到每个切片并重新归一化，可见比例低于 min_visibility 的形状被丢弃；
+    - 没有目标的切片按 keep_empty 的比例保留为背景（0 表示全部丢弃，1 表示全部保留）；
+    - 切片继承原图所在的一侧（训练/验证），同一张图的切片不会同时出现在两边。
+    每张原图的切片按 (JSON, 图片) 的元数据缓存，参数或类别不变时重复运行只处理新增或变化的图片。
+    """
+    stride = stride or default_stride(tile_size)
+    if tile_size <= 0 or not 0 < stride <= tile_size:
+        raise ValueError(f"切片参数错误: tile_size={tile_size}, stride={stride}（需要 0 < stride <= tile_size）")
+    if not 0 <= keep_empty <= 1 or not 0 <= min_visibility <= 1:
+        raise ValueError(f"keep_empty 和 min_visibility 必须在 0~1 之间: {keep_empty}, {min_visibility}")
+
+    dataset_path = Path(dataset_path)
+    out_root = tiled_dataset_dir(dataset_path, tile_size, stride)
+    out_image_dir, out_label_dir = out_root / 'images', out_root / 'labels'
+    cache_path = out_root / 'tile_cache.json'
+    settings = {'tile_size': tile_size, 'stride': stride, 'keep_empty': keep_empty,
+                'min_visibility': min_visibility, 'decimals': decimals, 'classes': list(classes)}
+
+    split_lists = {name: _read_split_list(dataset_path / name) for name in ('train.txt', 'val.txt')}
+    stems = {stem for stems in split_lists.values() for stem in stems}
+    if not stems:
+        raise FileNotFoundError("错误: 未找到 train.txt / val.txt，请先执行 split_dataset。")
+    sources = {p.stem: p for p in (dataset_path / 'images').glob('*')
+               if p.stem in stems and p.suffix.lower() in IMAGE_EXTENSIONS}
+
+    cache = {}
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+        if saved.get('version') == CACHE_VERSION and saved.get('settings') == settings:
+            cache = saved['files']
+    except (OSError, ValueError):
+        pass
+
+    out_image_dir.mkdir(parents=True, exist_ok=True)
+    out_label_dir.mkdir(parents=True, exist_ok=True)
+    new_cache, to_tile = {}, []
+    for stem, image_path in sorted(sources.items()):
+        json_path = dataset_path / 'jsons' / (stem + '.json')
+        if not json_path.exists():
+            continue
+        image_stat, json_stat = image_path.stat(), json_path.stat()
+        meta = {'image': [image_stat.st_size, image_stat.st_mtime_ns], 'json': [json_stat.st_size, json_stat.st_mtime_ns]}
+        entry = cache.get(stem)
+        if (entry and entry['image'] == meta['image'] and entry['json'] == meta['json']
+                and all((out_image_dir / (name + TILE_SUFFIX)).exists() for name in entry['tiles'])):
+            new_cache[stem] = entry
+        else:
+            to_tile.append((stem, json_path, image_path, meta))
+
+    start_time = time.perf_counter()
+    class_index = {name: idx for idx, name in enumerate(classes)}
+    totals = dict.fromkeys(('positive', 'empty_kept', 'empty_dropped', 'instances', 'clipped_away'), 0)
+    failed = 0
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count() or 4) as executor:
+        futures = {executor.submit(_tile_one, json_path, image_path, out_image_dir, out_label_dir, class_index,
+                                   settings): (stem, meta)
+                   for stem, json_path, image_path, meta in to_tile}
+        for future in as_completed(futures):
+            stem, meta = futures[future]
+            try:
+                summary = future.result()
+            except Exception as e:
+                print(f"切片图片 {stem} 时发生错误: {e}")
+                failed += 1
+                continue
+            for key in totals:
+                totals[key] += summary[key]
+            new_cache[stem] = {**meta, 'tiles': summary['tiles']}
+    elapsed = time.perf_counter() - start_time
+
+    # 删除本次没有生成的旧切片（原图被删除、变化后切片位置不同，或切片参数变化后缓存作废时留下的全部切片）
+    current_tiles = {name for entry in new_cache.values() for name in entry['tiles']}
+    for directory, suffix in ((out_image_dir, TILE_SUFFIX), (out_label_dir, '.txt')):
+        for entry in os.scandir(directory):
+            if entry.name.endswith(suffix) and entry.name[:-len(suffix)] not in current_tiles:
+                os.unlink(entry.path)
+
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': CACHE_VERSION, 'settings': settings, 'files': new_cache}, f, indent=1)
+
+    tile_counts = {}
+    for list_name, list_stems in split_lists.items():
+        with open(out_root / list_name, 'w', encoding='utf-8') as f:
+            count = 0
+            for stem in list_stems:
+                for name in new_cache.get(stem, {}).get('tiles', ()):
+                    f.write(f'./images/{name}{TILE_SUFFIX}\n')
+                    count += 1
+        tile_counts[list_name] = count
+
+    data_yaml_path = out_root / 'data.yaml'
+    import yaml
+    with open(data_yaml_path, 'w', encoding='utf-8') as f:
+        yaml.dump({'train': str(out_root / 'train.txt'), 'val': str(out_root / 'val.txt'),
+                   'nc': len(classes), 'names': list(classes)}, f, sort_keys=False, allow_unicode=True)
+
+    return {
+        'output_dir': str(out_root),
+        'data_yaml': str(data_yaml_path),
+        'images': len(sources),
+        'tiled': len(to_tile) - failed,
+        'skipped': len(new_cache) - (len(to_tile) - failed),
+        'failed': failed,
+        'train_tiles': tile_counts['train.txt'],
+        'val_tiles': tile_counts['val.txt'],
+        **totals,
+        'seconds': elapsed,
+    }
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+'''
+@Project ：yolo_source_code
+@File    ：image_transcoder.py
+@Author  ：fengzhengxiong
+@Date    ：2026/10/18 10:30
+'''
+
+
+import os
+import json
+import time
+import hashlib
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional
+
+from logic.data_converter import IMAGE_EXTENSIONS, materialize_files
+
+
+TRANSCODE_FORMATS = {
+    # 格式名: (文件扩展名, Pillow 格式名)
+    'png': ('.png', 'PNG'),
+    'jpeg': ('.jpg', 'JPEG'),
+    'webp': ('.webp', 'WEBP'),
+}
+CACHE_VERSION = 1
+
+
+def _encode_image(src: Path, dst: Path, fmt: str, quality: int):
+    """
+    把单张图片编码为目标格式。优先使用 Pillow，没有安装时退回 PySide6 的 QImage。
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        Image = None
+
+    if Image is not None:
+        with Image.open(src) as img:
+            if fmt == 'jpeg' and img.mode not in ('L', 'RGB'):
+                img = img.convert('RGB')
+            if fmt == 'png':
+                # 压缩级别 1 的速度比默认级别快很多，体积只略大
+                img.save(dst, 'PNG', compress_level=1)
+            elif fmt == 'webp':
+                img.save(dst, 'WEBP', quality=quality, lossless=quality >= 100, method=4)
+            else:
+                img.save(dst, 'JPEG', quality=quality)
+        return
+
+    from PySide6.QtGui import QImage
+    image = QImage(str(src))
+    if image.isNull():
+        raise ValueError(f"无法读取图片 '{src.name}'")
+    # QImage.save 的扩展名用于推断格式，所以这里显式传入格式名
+    if not image.save(str(dst), TRANSCODE_FORMATS[fmt][1], quality):
+        raise ValueError(f"无法以 {fmt} 格式保存 '{dst.name}'（可能缺少 Qt 图像插件）")
+
+
+def _transcode_one(src: Path, dst: Path, fmt: str, quality: int, known_sha1: Optional[str]) -> Dict[str, Any]:
+    """
+    转码单张图片（在进程池中执行），源文件内容哈希与缓存一致且目标仍在时直接跳过。
+    """
+    sha1 = hashlib.sha1(src.read_bytes()).hexdigest()
+    if sha1 == known_sha1 and dst.exists():
+        return {'status': 'skipped', 'sha1': sha1}
+
+    # 先写临时文件再替换，避免中断时留下损坏的图片
+    tmp_path = dst.with_name(dst.stem + '.tmp' + dst.suffix)
+    _encode_image(src, tmp_path, fmt, quality)
+    os.replace(tmp_path, dst)
+    return {'status': 'transcoded', 'sha1': sha1}
+
+
+def _read_split_list(list_path: Path) -> List[str]:
+    """
+    读取 train.txt / val.txt 中的图片文件名主干（stem）。
+    列表可能已经指向上一次的转码结果，所以只按文件名主干匹配源图片。
+    """
+    if not list_path.exists():
+        return []
+    with open(list_path, 'r', encoding='utf-8') as f:
+        return [Path(line.strip()).stem for line in f if line.strip()]
+
+
+def transcode_images(dataset_path: str, fmt: str = 'png', quality: int = 95,
+                     max_workers: int = None) -> Dict[str, Any]:
+    """
+    把 images/ 中的图片（通常是工业相机输出的无压缩 BMP）转码为压缩格式，
+    并让 train.txt / val.txt 指向转码后的文件。需要在 split_dataset 之后调用。
+
+    转码结果放在 transcoded/<格式>_q<质量>/images/ 下，标签同步复制到同级的 labels/，
+    这样训练器按 "images -> labels" 的规则仍能找到对应标签。
+    已转码的图片按 (源文件哈希, 转码参数) 缓存，重复运行只处理新增或变化的图片，
+    源图片已不在划分列表中的转码结果会被删除。
+    """
+    if fmt not in TRANSCODE_FORMATS:
+        raise ValueError(f"未知的转码格式 '{fmt}'，可选: {list(TRANSCODE_FORMATS)}")
+    if not 1 <= quality <= 100:
+        raise ValueError(f"quality 必须在 1~100 之间: {quality}")
+
+    dataset_path = Path(dataset_path)
+    image_dir = dataset_path / 'images'
+    label_dir = dataset_path / 'labels'
+    out_root = dataset_path / 'transcoded' / f'{fmt}_q{quality}'
+    out_image_dir = out_root / 'images'
+    cache_path = out_root / 'transcode_cache.json'
+    suffix = TRANSCODE_FORMATS[fmt][0]
+    settings = {'format': fmt, 'quality': quality}
+
+    split_lists = {name: _read_split_list(dataset_path / name) for name in ('train.txt', 'val.txt')}
+    stems = {stem for stems in split_lists.values() for stem in stems}
+    if not stems:
+        raise FileNotFoundError("错误: 未找到 train.txt / val.txt，请先执行 split_dataset。")
+    sources = {p.stem: p for p in image_dir.glob('*') if p.stem in stems and p.suffix.lower() in IMAGE_EXTENSIONS}
+    missing = stems - sources.keys()
+    if missing:
+        print(f"警告: {len(missing)} 个划分列表中的图片在 'images' 中不存在，将被忽略: {sorted(missing)[:3]}...")
+
+    cache = {}
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+        if saved.get('version') == CACHE_VERSION and saved.get('settings') == settings:
+            cache = saved['files']
+    except (OSError, ValueError):
+        pass
+
+    out_image_dir.mkdir(parents=True, exist_ok=True)
+    # 缓存以文件名主干为键
+    new_cache, to_transcode = {}, []
+    for stem, src in sorted(sources.items()):
+        dst = out_image_dir / (stem + suffix)
+        stat = src.stat()
+        entry = cache.get(stem)
+        # 大小和修改时间都没变，就不必再读取源文件计算哈希
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns and dst.exists():
+            new_cache[stem] = entry
+        else:
+            to_transcode.append((src, dst, stat, entry))
+
+    start_time = time.perf_counter()
+    transcoded = 0
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count() or 4) as executor:
+        futures = {executor.submit(_transcode_one, src, dst, fmt, quality, entry and entry['sha1']): (src, stat)
+                   for src, dst, stat, entry in to_transcode}
+        for future in as_completed(futures):
+            src, stat = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"转码图片 {src.name} 时发生错误: {e}")
+                continue
+            if result['status'] == 'transcoded':
+                transcoded += 1
+            new_cache[src.stem] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha1': result['sha1']}
+    elapsed = time.perf_counter() - start_time
+
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': CACHE_VERSION, 'settings': settings, 'files': new_cache}, f, indent=1)
+
+    # 标签文件很小，直接复制（未变化的会被跳过）
+    label_files = [label_dir / (stem + '.txt') for stem in new_cache]
+    materialize_files([p for p in label_files if p.exists()], out_root / 'labels', 'copy')
+
+    # 删除源图片已不在划分列表中（被删除或不再参与划分）的转码图片和标签
+    removed = {'images': 0, 'labels': 0}
+    for kind, directory, kind_suffix in (('images', out_image_dir, suffix), ('labels', out_root / 'labels', '.txt')):
+        if not directory.is_dir():
+            continue
+        for entry in os.scandir(directory):
+            stem, ext = os.path.splitext(entry.name)
+            if ext == kind_suffix and stem not in new_cache:
+                os.unlink(entry.path)
+                removed[kind] += 1
+
+    # 改写划分列表，只保留转码成功的图片
+    relative_dir = out_image_dir.relative_to(dataset_path).as_posix()
+    for list_name, list_stems in split_lists.items():
+        with open(dataset_path / list_name, 'w', encoding='utf-8') as f:
+            for stem in list_stems:
+                if stem in new_cache:
+                    f.write(f'./{relative_dir}/{stem}{suffix}\n')
+
+    bytes_in = sum(entry['size'] for entry in new_cache.values())
+    bytes_out = sum((out_image_dir / (stem + suffix)).stat().st_size for stem in new_cache)
+    return {
+        'output_dir': str(out_image_dir),
+        'total': len(stems),
+        'transcoded': transcoded,
+        'skipped': len(new_cache) - transcoded,
+        'failed': len(stems) - len(new_cache),
+        'removed': removed['images'],
+        'bytes_in': bytes_in,
+        'bytes_out': bytes_out,
+        'bytes_saved': bytes_in - bytes_out,
+        'seconds': elapsed,
+        'images_per_second': transcoded / elapsed if transcoded and elapsed > 0 else 0.0,
+    }
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+'''
+@Project ：yolo_source_code
+@File    ：instrumentation.py
+@Author  ：fengzhengxiong
+@Date    ：2026/10/18 16:40
+'''
+
+
+import os
+import json
+import time
+from typing import Dict, Any, List
+
+
+class _Timer:
+    __slots__ = ('_owner', '_name', '_start')
+
+    def __init__(self, owner: 'Instrumentation', name: str):
+        self._owner = owner
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._owner.add_time(self._name, time.perf_counter() - self._start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Instrumentation:
+    """
+    轻量的运行统计：计时器（累计秒数与调用次数）、计数器和字节数。
+    enabled=False 时所有方法直接返回，timer() 返回共享的空上下文，几乎没有开销。
+    实例不是线程安全的：线程池/进程池中每个批次各自统计，用 to_dict() 传回主线程后 merge()。
+    名称用 "阶段.子项" 的形式，例如 convert.parse、split.materialize。
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.timers: Dict[str, List[float]] = {}
+        self.counters: Dict[str, int] = {}
+        self.bytes: Dict[str, int] = {}
+
+    def timer(self, name: str):
+        return _Timer(self, name) if self.enabled else _NULL_TIMER
+
+    def add_time(self, name: str, seconds: float, calls: int = 1):
+        if not self.enabled:
+            return
+        entry = self.timers.get(name)
+        if entry is None:
+            self.timers[name] = [seconds, calls]
+        else:
+            entry[0] += seconds
+            entry[1] += calls
+
+    def count(self, name: str, n: int = 1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_bytes(self, name: str, n: int):
+        if self.enabled:
+            self.bytes[name] = self.bytes.get(name, 0) + n
+
+    def merge(self, data: Dict[str, Any]):
+        """合并另一个实例 to_dict() 的结果（例如进程池中的批次统计）。"""
+        if not self.enabled or not data:
+            return
+        for name, entry in data.get('timers', {}).items():
+            self.add_time(name, entry['seconds'], entry['calls'])
+        for name, n in data.get('counters', {}).items():
+            self.count(name, n)
+        for name, n in data.get('bytes', {}).items():
+            self.add_bytes(name, n)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'timers': {name: {'seconds': round(seconds, 6), 'calls': calls}
+                       for name, (seconds, calls) in self.timers.items()},
+            'counters': dict(self.counters),
+            'bytes': dict(self.bytes),
+        }
+
+    def summary_table(self) -> str:
+        """日志中显示的汇总表。"""
+        lines = [f"{'计时项':<32}{'耗时(s)':>10}{'次数':>10}"]
+        for name, (seconds, calls) in sorted(self.timers.items()):
+            lines.append(f"{name:<32}{seconds:>10.3f}{calls:>10}")
+        for name, n in sorted(self.counters.items()):
+            lines.append(f"{name:<32}{n:>20}")
+        for name, n in sorted(self.bytes.items()):
+            lines.append(f"{name:<32}{n / 1024 / 1024:>17.2f} MB")
+        return "\n".join(lines)
+
+    def write_report(self, report_path: str, **extra) -> str:
+        """写出 JSON 报告，extra 中的字段（如任务名、命令行）一并写入。"""
+        os.makedirs(os.path.dirname(os.path.abspath(report_path)), exist_ok=True)
+        report = {'created_at': time.strftime('%Y-%m-%d %H:%M:%S'), **extra, **self.to_dict()}
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+        return report_path
+
+
+# 未启用统计时使用的共享实例
+NULL_INSTRUMENTATION = Instrumentation(enabled=False)
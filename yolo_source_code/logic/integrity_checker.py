@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+'''
+@Project ：yolo_source_code
+@File    ：integrity_checker.py
+@Author  ：fengzhengxiong
+@Date    ：2026/10/18 17:50
+'''
+
+
+import os
+import time
+import struct
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+from logic.data_converter import IMAGE_EXTENSIONS, _parse_labelme_json
+from logic.dataset_index import DatasetIndex, annotation_entry
+from logic.instrumentation import Instrumentation, NULL_INSTRUMENTATION
+
+# 问题类型 -> 说明。errors 会导致归一化坐标错误或样本丢失，warnings 只是提示
+ERROR_KINDS = {
+    'invalid_json': "JSON 无法解析",
+    'missing_size': "JSON 中缺少 imageWidth / imageHeight",
+    'missing_image': "JSON 没有对应的图片",
+    'unreadable_image': "图片头无法识别或文件已损坏",
+    'size_mismatch': "JSON 记录的尺寸与图片实际尺寸不一致",
+    'out_of_bounds': "标注点超出图片范围",
+}
+WARNING_KINDS = {
+    'image_without_json': "图片没有对应的 JSON（不会参与训练）",
+    'orphan_label': "标签文件没有对应的 JSON（过期标签）",
+    'duplicate_stem': "多张图片的文件名（除扩展名）相同，只有一张会被使用",
+}
+
+# 每个线程任务处理的文件数，减少 10 万级文件时逐个提交任务的开销
+_BATCH_SIZE = 256
+# JPEG 中 SOF 段的标记（不含 DHT=C4、JPG=C8、DAC=CC）
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+# ==========================================================
+#  只读文件头的图片尺寸解析（不解码像素），支持 BMP / PNG / JPEG / WebP
+# ==========================================================
+def _jpeg_exif_orientation(segment: bytes) -> int:
+    """从 APP1 段的 EXIF 中读取方向标签 (0x0112)，没有时返回 1。"""
+    if segment[:6] != b'Exif\x00\x00' or len(segment) < 14:
+        return 1
+    tiff = segment[6:]
+    endian = '<' if tiff[:2] == b'II' else '>'
+    offset = struct.unpack(endian + 'I', tiff[4:8])[0]
+    if offset + 2 > len(tiff):
+        return 1
+    count = struct.unpack(endian + 'H', tiff[offset:offset + 2])[0]
+    for i in range(count):
+        entry = offset + 2 + i * 12
+        if entry + 12 > len(tiff):
+            break
+        tag, _, _, value = struct.unpack(endian + 'HHIH', tiff[entry:entry + 10])
+        if tag == 0x0112:
+            return value
+    return 1
+
+
+def _jpeg_size(f) -> Tuple[int, int]:
+    f.seek(2)
+    orientation = 1
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            raise ValueError("JPEG 段结构损坏")
+        code = marker[1]
+        while code == 0xFF:
+            # 段之间允许有填充的 0xFF
+            code = f.read(1)[0]
+        if code in (0xD8, 0x01) or 0xD0 <= code <= 0xD7:
+            continue
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            raise ValueError("JPEG 文件被截断")
+        length = struct.unpack('>H', length_bytes)[0]
+        if code in _JPEG_SOF_MARKERS:
+            height, width = struct.unpack('>xHH', f.read(5))
+            # LabelMe 加载图片时会按 EXIF 方向旋转，方向 5~8 时宽高互换
+            return (height, width) if orientation >= 5 else (width, height)
+        if code == 0xE1 and orientation == 1:
+            orientation = _jpeg_exif_orientation(f.read(length - 2))
+        else:
+            f.seek(length - 2, os.SEEK_CUR)
+
+
+def read_image_size(image_path) -> Tuple[int, int]:
+    """
+    只读取文件头得到图片的 (宽, 高)，不解码像素。JPEG 按 EXIF 方向修正，与 LabelMe 的处理一致。
+    无法识别时抛出 ValueError，文件无法读取时抛出 OSError。
+    """
+    with open(image_path, 'rb') as f:
+        head = f.read(32)
+        if head[:2] == b'BM' and len(head) >= 26:
+            if struct.unpack('<I', head[14:18])[0] == 12:
+                # OS/2 的 BITMAPCOREHEADER
+                return struct.unpack('<HH', head[18:22])
+            width, height = struct.unpack('<ii', head[18:26])
+            # 高度为负表示自上而下存储
+            return width, abs(height)
+        if head[:8] == b'\x89PNG\r\n\x1a\n' and head[12:16] == b'IHDR':
+            return struct.unpack('>II', head[16:24])
+        if head[:2] == b'\xff\xd8':
+            return _jpeg_size(f)
+        if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+            chunk = head[12:16]
+            if chunk == b'VP8X':
+                return (int.from_bytes(head[24:27], 'little') + 1, int.from_bytes(head[27:30], 'little') + 1)
+            if chunk == b'VP8L':
+                b = head[21:25]
+                return 1 + (b[0] | (b[1] & 0x3F) << 8), 1 + (b[1] >> 6 | b[2] << 2 | (b[3] & 0x0F) << 10)
+            if chunk == b'VP8 ':
+                width, height = struct.unpack('<HH', head[26:30])
+                return width & 0x3FFF, height & 0x3FFF
+    raise ValueError("不支持的图片格式或文件头已损坏")
+
+
+# ==========================================================
+#  逐对检查（在线程池中执行）
+# ==========================================================
+def _check_pair(json_path: Path, image_path: Optional[Path], cached: Optional[tuple], tolerance: float):
+    """
+    检查一对 JSON / 图片，返回 (问题列表, 新解析出的索引条目或 None, 是否读了图片头)。
+    cached 为索引中与 JSON 当前元数据一致的 (width, height, extent)，有则不再解析 JSON。
+    """
+    issues = []
+    entry = None
+    if cached is not None:
+        width, height, extent = cached
+    else:
+        try:
+            record = _parse_labelme_json(json_path)
+        except Exception as e:
+            return [('invalid_json', str(e))], None, False
+        entry = annotation_entry(json_path.name, record)
+        width, height, extent = entry['width'], entry['height'], entry['extent']
+    if not width or not height:
+        issues.append(('missing_size', f"imageWidth={width}, imageHeight={height}"))
+
+    if image_path is None:
+        issues.append(('missing_image', f"images/ 中没有 {json_path.stem}.*"))
+        return issues, entry, False
+
+    try:
+        actual = read_image_size(image_path)
+    except (OSError, ValueError, IndexError, struct.error) as e:
+        issues.append(('unreadable_image', f"{image_path.name}: {e}"))
+        actual = None
+    if actual is not None and width and height and (width, height) != tuple(actual):
+        issues.append(('size_mismatch', f"JSON {width}x{height}，图片 {image_path.name} 为 {actual[0]}x{actual[1]}"))
+
+    # 越界按图片实际尺寸判断，读不到时退回 JSON 中的尺寸
+    bound_w, bound_h = actual if actual is not None else (width, height)
+    if extent is not None and bound_w and bound_h:
+        min_x, min_y, max_x, max_y = extent
+        if min_x < -tolerance or min_y < -tolerance or max_x > bound_w + tolerance or max_y > bound_h + tolerance:
+            issues.append(('out_of_bounds', f"点的范围 x∈[{min_x:.1f}, {max_x:.1f}] y∈[{min_y:.1f}, {max_y:.1f}]，"
+                                            f"图片 {bound_w}x{bound_h}"))
+    return issues, entry, True
+
+
+def _check_batch(items: List[tuple], tolerance: float):
+    return [(json_path.name, *_check_pair(json_path, image_path, cached, tolerance))
+            for json_path, image_path, cached in items]
+
+
+def _scan(directory: Path, extensions) -> List[str]:
+    if not directory.is_dir():
+        return []
+    with os.scandir(directory) as it:
+        return [entry.name for entry in it
+                if entry.is_file() and os.path.splitext(entry.name)[1].lower() in extensions]
+
+
+def check_dataset(dataset_path: str, max_workers: int = None, tolerance: float = 1.0,
+                  index: DatasetIndex = None, instrumentation: Instrumentation = None) -> Dict[str, Any]:
+    """
+    转换前的完整性预检：并行读取图片文件头（不解码），与 JSON 中的 imageWidth / imageHeight 和标注点范围比对，
+    并列出 JSON / 图片 / 标签之间缺失或多余的文件。
+    传入 index 时，元数据未变化的 JSON 直接使用索引中的尺寸和点范围，不再解析；新解析的结果会写回索引。
+    tolerance 为越界判断的像素容差。返回
+    {'jsons', 'images', 'labels', 'parsed', 'from_index', 'headers_read', 'seconds',
+     'issues': {类型: [(文件名, 说明), ...]}, 'errors': 错误数, 'warnings': 警告数}
+    """
+    instr = instrumentation or NULL_INSTRUMENTATION
+    start = time.perf_counter()
+    root = Path(dataset_path)
+    json_dir, image_dir, label_dir = root / 'jsons', root / 'images', root / 'labels'
+    if not json_dir.is_dir():
+        raise FileNotFoundError(f"错误: 在 '{root}' 中未找到 'jsons' 文件夹。")
+
+    with instr.timer('check.scan'):
+        json_names = _scan(json_dir, ('.json',))
+        image_names = _scan(image_dir, IMAGE_EXTENSIONS)
+        label_names = _scan(label_dir, ('.txt',))
+    issues = {kind: [] for kind in (*ERROR_KINDS, *WARNING_KINDS)}
+
+    images_by_stem = {}
+    for name in sorted(image_names):
+        stem = os.path.splitext(name)[0]
+        if stem in images_by_stem:
+            issues['duplicate_stem'].append((name, f"与 {images_by_stem[stem]} 同名"))
+        else:
+            images_by_stem[stem] = name
+    json_stems = {os.path.splitext(name)[0] for name in json_names}
+    for stem in sorted(set(images_by_stem) - json_stems):
+        issues['image_without_json'].append((images_by_stem[stem], ""))
+    for name in sorted(label_names):
+        if os.path.splitext(name)[0] not in json_stems:
+            issues['orphan_label'].append((name, ""))
+
+    geometry = index.annotation_geometry() if index is not None else {}
+    items = []
+    from_index = 0
+    for name in sorted(json_names):
+        json_path = json_dir / name
+        stem = os.path.splitext(name)[0]
+        image_path = image_dir / images_by_stem[stem] if stem in images_by_stem else None
+        cached = None
+        known = geometry.get(name)
+        if known is not None:
+            stat = json_path.stat()
+            if (known[0], known[1]) == (stat.st_size, stat.st_mtime_ns):
+                cached = known[2:]
+                from_index += 1
+        items.append((json_path, image_path, cached))
+
+    parsed_entries = []
+    headers_read = 0
+    batches = [items[i:i + _BATCH_SIZE] for i in range(0, len(items), _BATCH_SIZE)]
+    # 读文件头是小块 I/O，线程池即可并行（读文件时会释放 GIL）
+    workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+    with instr.timer('check.pairs'):
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for results in executor.map(_check_batch, batches, [tolerance] * len(batches)):
+                for name, pair_issues, entry, header_read in results:
+                    for kind, detail in pair_issues:
+                        issues[kind].append((name, detail))
+                    if entry is not None:
+                        parsed_entries.append(entry)
+                    headers_read += header_read
+    if index is not None and parsed_entries:
+        with instr.timer('check.update_index'):
+            index.update_annotations(parsed_entries)
+
+    report = {
+        'jsons': len(json_names), 'images': len(image_names), 'labels': len(label_names),
+        'parsed': len(items) - from_index, 'from_index': from_index, 'headers_read': headers_read,
+        'seconds': round(time.perf_counter() - start, 3),
+        'issues': {kind: entries for kind, entries in issues.items() if entries},
+        'errors': sum(len(issues[kind]) for kind in ERROR_KINDS),
+        'warnings': sum(len(issues[kind]) for kind in WARNING_KINDS),
+    }
+    instr.count('check.jsons', report['jsons'])
+    instr.count('check.parsed', report['parsed'])
+    instr.count('check.headers_read', headers_read)
+    instr.count('check.errors', report['errors'])
+    instr.count('check.warnings', report['warnings'])
+    return report
+
+
+def format_report(report: Dict[str, Any], limit: int = 5) -> List[str]:
+    """日志中显示的检查结果，每类问题最多列出 limit 个示例。"""
+    lines = [f"检查了 {report['jsons']} 个 JSON、{report['images']} 张图片、{report['labels']} 个标签，"
+             f"耗时 {report['seconds']:.2f} 秒（解析 JSON {report['parsed']} 个，索引命中 {report['from_index']} 个，"
+             f"读取图片头 {report['headers_read']} 个）。"]
+    if not report['issues']:
+        lines.append("未发现问题。")
+        return lines
+    lines.append(f"发现 {report['errors']} 个错误、{report['warnings']} 个警告:")
+    for kind, entries in report['issues'].items():
+        level = "错误" if kind in ERROR_KINDS else "警告"
+        description = ERROR_KINDS.get(kind) or WARNING_KINDS[kind]
+        lines.append(f"  [{level}] {description}: {len(entries)} 个")
+        for name, detail in entries[:limit]:
+            lines.append(f"      {name}" + (f" - {detail}" if detail else ""))
+        if len(entries) > limit:
+            lines.append(f"      ... 另有 {len(entries) - limit} 个")
+    return lines
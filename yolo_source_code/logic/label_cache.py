@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+'''
+@Project ：yolo_source_code
+@File    ：label_cache.py
+@Author  ：fengzhengxiong
+@Date    ：2026/10/18 19:20
+'''
+
+
+# ==========================================================
+#  预先生成 Ultralytics 的 labels.cache
+#
+#  训练开始时 Ultralytics 会逐个打开图片和标签来生成 <labels 文件夹>.cache，
+#  数据集在 NAS 上时这一步要几分钟。缓存的有效性只由 DATASET_CACHE_VERSION 和
+#  get_hash(标签路径 + 图片路径)（文件大小之和 + 路径）决定，所以转换完成后按同样的规则
+#  写出缓存，训练时就会直接命中。这里的路径规则、哈希和标签解析与
+#  ultralytics/data/utils.py 的 img2label_paths / get_hash / verify_image_label 保持一致
+#  （对应 ultralytics 8.1 ~ 8.3，缓存版本 1.0.3）。
+# ==========================================================
+
+import os
+import struct
+import hashlib
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+
+from logic.integrity_checker import read_image_size
+
+try:
+    # 缓存是 np.save 保存的字典，没有 NumPy 时无法生成
+    import numpy as np
+except ImportError:
+    np = None
+
+DATASET_CACHE_VERSION = '1.0.3'
+# ultralytics.data.utils.IMG_FORMATS
+IMG_FORMATS = {'bmp', 'dng', 'jpeg', 'jpg', 'mpo', 'png', 'tif', 'tiff', 'webp', 'pfm', 'heic'}
+# 训练集和验证集共用一个 labels 文件夹时，验证集通过该目录下的链接访问，缓存文件才不会互相覆盖
+VAL_SPLIT_DIRNAME = 'val_split'
+
+
+def img2label_paths(img_paths: List[str]) -> List[str]:
+    """与 Ultralytics 相同：把路径中最后一个 /images/ 换成 /labels/，扩展名换成 .txt。"""
+    sa, sb = f'{os.sep}images{os.sep}', f'{os.sep}labels{os.sep}'
+    return [sb.join(x.rsplit(sa, 1)).rsplit('.', 1)[0] + '.txt' for x in img_paths]
+
+
+def get_hash(paths: List[str]) -> str:
+    """与 Ultralytics 相同：文件大小之和 + 路径拼接的 sha256。"""
+    size = 0
+    for p in paths:
+        try:
+            size += os.stat(p).st_size
+        except OSError:
+            continue
+    h = hashlib.sha256(str(size).encode())
+    h.update(''.join(paths).encode())
+    return h.hexdigest()
+
+
+def list_image_files(list_path) -> List[str]:
+    """
+    按 Ultralytics 读取 train.txt / val.txt 的方式得到图片路径：列表文件的路径先 resolve，
+    './' 换成列表所在目录，再统一分隔符、过滤扩展名并排序。
+    """
+    list_path = Path(list_path).resolve()
+    parent = str(list_path.parent) + os.sep
+    with open(list_path, 'r', encoding='utf-8') as f:
+        lines = f.read().strip().splitlines()
+    files = [x.replace('./', parent) if x.startswith('./') else x for x in lines]
+    return sorted(x.replace('/', os.sep) for x in files if x.split('.')[-1].lower() in IMG_FORMATS)
+
+
+def cache_path_for(im_files: List[str]) -> Path:
+    """Ultralytics 的缓存位置: 第一个标签文件所在文件夹加上 .cache 后缀。"""
+    return Path(img2label_paths(im_files[:1])[0]).parent.with_suffix('.cache')
+
+
+def _segments2boxes(segments):
+    boxes = np.array([[s[:, 0].min(), s[:, 1].min(), s[:, 0].max(), s[:, 1].max()] for s in segments])
+    xywh = np.empty_like(boxes)
+    xywh[:, 0] = (boxes[:, 0] + boxes[:, 2]) / 2
+    xywh[:, 1] = (boxes[:, 1] + boxes[:, 3]) / 2
+    xywh[:, 2] = boxes[:, 2] - boxes[:, 0]
+    xywh[:, 3] = boxes[:, 3] - boxes[:, 1]
+    return xywh
+
+
+def parse_label_text(text: str):
+    """
+    按 verify_image_label 的规则解析一个标签文件的内容，返回 (lb, segments)。
+    有任意一行超过 6 列时整份文件按多边形处理，外接框由多边形计算；重复的行会被去掉（顺序随之改变）。
+    标签越界或列数不对时抛出 ValueError，Ultralytics 会把这样的图片当作损坏而跳过。
+    """
+    rows = [x.split() for x in text.strip().splitlines() if len(x)]
+    segments = []
+    if any(len(x) > 6 for x in rows):
+        classes = np.array([x[0] for x in rows], dtype=np.float32)
+        segments = [np.array(x[1:], dtype=np.float32).reshape(-1, 2) for x in rows]
+        lb = np.concatenate((classes.reshape(-1, 1), _segments2boxes(segments)), 1)
+    lb = np.array(rows if not segments else lb, dtype=np.float32)
+    if not len(lb):
+        return np.zeros((0, 5), dtype=np.float32), segments
+    if lb.ndim != 2 or lb.shape[1] != 5:
+        raise ValueError(f"标签需要 5 列，实际为 {lb.shape}")
+    if lb[:, 1:].max() > 1:
+        raise ValueError("坐标未归一化或超出范围")
+    if lb.min() < 0:
+        raise ValueError("标签中有负值")
+    _, i = np.unique(lb, axis=0, return_index=True)
+    if len(i) < len(lb):
+        lb = lb[i]
+        if segments:
+            segments = [segments[x] for x in i]
+    return lb, segments
+
+
+def _build_entry(im_file: str, label_file: str):
+    """单张图片的缓存条目，返回 (条目或 None, 状态, 警告或 None)。状态为 found / missing / empty / corrupt。"""
+    try:
+        width, height = read_image_size(im_file)
+    except (OSError, ValueError, IndexError, struct.error) as e:
+        return None, 'corrupt', f"{im_file}: {e}"
+    status = 'found'
+    try:
+        with open(label_file, 'r', encoding='utf-8') as f:
+            lb, segments = parse_label_text(f.read())
+        if not len(lb):
+            status = 'empty'
+    except FileNotFoundError:
+        lb, segments, status = np.zeros((0, 5), dtype=np.float32), [], 'missing'
+    except ValueError as e:
+        return None, 'corrupt', f"{label_file}: {e}"
+    return {
+        'im_file': im_file,
+        'shape': (height, width),
+        'cls': lb[:, 0:1],
+        'bboxes': lb[:, 1:],
+        'segments': segments,
+        'keypoints': None,
+        'normalized': True,
+        'bbox_format': 'xywh',
+    }, status, None
+
+
+def write_label_cache(im_files: List[str], max_workers: int = None) -> Dict[str, Any]:
+    """
+    为一组图片写出 Ultralytics 格式的标签缓存（写在 cache_path_for(im_files)），返回统计信息。
+    图片尺寸只读取文件头（不解码），标签文件刚由转换器写出，读取它们几乎没有 I/O 开销。
+    """
+    if np is None:
+        raise RuntimeError("生成标签缓存需要安装 NumPy。")
+    if not im_files:
+        raise ValueError("图片列表为空。")
+    label_files = img2label_paths(im_files)
+    counts = dict.fromkeys(('found', 'missing', 'empty', 'corrupt'), 0)
+    labels, msgs = [], []
+    with ThreadPoolExecutor(max_workers=max_workers or min(32, (os.cpu_count() or 1) + 4)) as executor:
+        for entry, status, msg in executor.map(_build_entry, im_files, label_files):
+            counts[status] += 1
+            if entry is not None:
+                labels.append(entry)
+            if msg:
+                msgs.append(f"WARNING ⚠️ {msg}")
+
+    cache = {
+        'labels': labels,
+        'hash': get_hash(label_files + im_files),
+        'results': (counts['found'], counts['missing'], counts['empty'], counts['corrupt'], len(im_files)),
+        'msgs': msgs,
+        'version': DATASET_CACHE_VERSION,
+    }
+    path = cache_path_for(im_files)
+    if path.exists():
+        path.unlink()
+    with open(path, 'wb') as f:
+        np.save(f, cache)
+    return {'path': str(path), **counts, 'images': len(im_files)}
+
+
+def _link_dir(target: Path, link: Path):
+    """创建指向 target 的目录链接（Windows 上用不需要管理员权限的 junction），已存在时替换。"""
+    if os.path.lexists(link):
+        if os.path.islink(link):
+            os.unlink(link)
+        else:
+            # junction 或空目录；非空的真实目录会抛出 OSError，不会误删数据
+            os.rmdir(link)
+    if os.name == 'nt':
+        import _winapi
+        _winapi.CreateJunction(str(target), str(link))
+    else:
+        os.symlink(target, link, target_is_directory=True)
+
+
+def _separate_val_list(val_list: Path, im_files: List[str]) -> Optional[List[str]]:
+    """
+    训练集和验证集的缓存位置相同时，在验证集列表旁建立 val_split/images、val_split/labels 两个目录链接，
+    把验证集列表改为经由链接访问，这样验证集的缓存写在 val_split/labels.cache。
+    返回新的验证集图片路径；无法创建链接时返回 None。
+    """
+    image_dirs = {os.path.dirname(p) for p in im_files}
+    if len(image_dirs) != 1:
+        return None
+    image_dir = Path(image_dirs.pop())
+    label_dir = Path(os.path.dirname(img2label_paths(im_files[:1])[0]))
+    split_dir = val_list.resolve().parent / VAL_SPLIT_DIRNAME
+    try:
+        split_dir.mkdir(exist_ok=True)
+        _link_dir(image_dir, split_dir / 'images')
+        _link_dir(label_dir, split_dir / 'labels')
+    except OSError as e:
+        print(f"警告: 无法创建目录链接 ({e})，验证集与训练集将共用同一个标签缓存。")
+        return None
+    with open(val_list, 'w', encoding='utf-8') as f:
+        for p in im_files:
+            f.write(f'./{VAL_SPLIT_DIRNAME}/images/{os.path.basename(p)}\n')
+    return list_image_files(val_list)
+
+
+def write_label_caches(data_yaml_path: str, max_workers: int = None) -> Dict[str, Dict[str, Any]]:
+    """
+    为 data.yaml 中的 train / val 列表写出标签缓存，需要在所有改写列表的步骤（划分、切片、转码）之后调用。
+    两者会落在同一个缓存文件时（共用 labels 文件夹），验证集改为经由 val_split 目录链接访问。
+    """
+    import yaml
+    with open(data_yaml_path, 'r', encoding='utf-8') as f:
+        data = yaml.safe_load(f)
+    lists = {key: Path(data[key]) for key in ('train', 'val') if data.get(key)}
+    im_files = {key: list_image_files(path) for key, path in lists.items()}
+    im_files = {key: files for key, files in im_files.items() if files}
+    if 'train' in im_files and 'val' in im_files and \
+            cache_path_for(im_files['train']) == cache_path_for(im_files['val']):
+        separated = _separate_val_list(lists['val'], im_files['val'])
+        if separated is None:
+            del im_files['val']
+        else:
+            im_files['val'] = separated
+    return {key: write_label_cache(files, max_workers) for key, files in im_files.items()}
+
+
+def remove_stale_caches(dataset_path):
+    """
+    标签变化后删除由训练器或本模块生成的旧缓存，避免大小碰巧不变时命中过期缓存。
+    除了数据集根目录，切片（tiled/*/）和转码（transcoded/*/）数据集下的缓存也一并删除。
+    """
+    dataset_path = Path(dataset_path)
+    roots = [dataset_path] + [d for parent in ('tiled', 'transcoded') if (dataset_path / parent).is_dir()
+                              for d in (dataset_path / parent).iterdir() if d.is_dir()]
+    for root in roots:
+        for path in (root / 'labels.cache', root / VAL_SPLIT_DIRNAME / 'labels.cache'):
+            if path.exists():
+                path.unlink()
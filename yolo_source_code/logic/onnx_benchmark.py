@@ -0,0 +1,312 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+'''
+@Project ：yolo_source_code
+@File    ：onnx_benchmark.py
+@Author  ：fengzhengxiong
+@Date    ：2026/10/18 21:40
+'''
+
+
+# ==========================================================
+#  导出的 ONNX 模型在 CPU 上的推理测速（由训练环境的 python 运行，依赖 onnxruntime、numpy、Pillow）
+#
+#  用法（参数格式与 yolo 命令行一致，均为 key=value，列表用逗号分隔）:
+#      python onnx_benchmark.py model=best.onnx source=val_images \
+#          batch=1,2,4,8 threads=auto inter_threads=1 imgsz=auto runs=30 warmup=5 [output=结果.json]
+#  - threads: intra-op 线程数列表，auto 为 1,2,4... 直到物理核数；
+#  - inter_threads: inter-op 线程数列表，大于 1 时以 ORT_PARALLEL 模式执行；
+#  - imgsz: 输入尺寸列表，auto 为模型导出时的尺寸。模型输入是固定形状（导出时没有 dynamic=True）时，
+#           batch 和 imgsz 只能取模型本身的值，其余组合会被跳过并在结果中注明。
+#  输入取自 source 中的真实图片，按 Ultralytics 的方式 letterbox 到 imgsz。
+#  每个组合在单独的子进程中运行：线程池、内存分配器互不影响，峰值内存就是该组合自身的峰值。
+#  结果（p50/p95/p99 延迟、吞吐量、峰值内存）写入 output（默认 runs/benchmark/onnx_cpu_<时间>.json），
+#  并在输出中打印汇总表。
+# ==========================================================
+
+import os
+import sys
+import ast
+import json
+import time
+import subprocess
+
+IMG_FORMATS = ('.bmp', '.jpg', '.jpeg', '.png', '.tif', '.tiff', '.webp')
+DEFAULTS = {'batch': '1', 'threads': 'auto', 'inter_threads': '1', 'imgsz': 'auto', 'runs': '30', 'warmup': '5'}
+# 参与测速的图片数上限（同时受最大 batch 约束，不足时循环使用）
+MAX_IMAGES = 64
+STRIDE = 32
+
+
+def parse_args(argv):
+    args = dict(DEFAULTS)
+    for token in argv:
+        key, sep, value = token.partition('=')
+        if not sep:
+            raise ValueError(f"无法识别的参数 '{token}'，应为 key=value")
+        args[key.strip()] = value.strip().strip('"')
+    for key in ('model', 'source'):
+        if not args.get(key):
+            raise ValueError(f"缺少参数 {key}=")
+    return args
+
+
+def _int_list(value: str):
+    return [int(v) for v in value.split(',') if v.strip()]
+
+
+def physical_cores() -> int:
+    try:
+        import psutil
+        return psutil.cpu_count(logical=False) or os.cpu_count() or 1
+    except ImportError:
+        return os.cpu_count() or 1
+
+
+def thread_sweep(value: str, cores: int):
+    if value.strip().lower() != 'auto':
+        return _int_list(value)
+    counts, n = [], 1
+    while n < cores:
+        counts.append(n)
+        n *= 2
+    return counts + [cores]
+
+
+def list_images(source: str, limit: int):
+    names = sorted(name for name in os.listdir(source) if os.path.splitext(name)[1].lower() in IMG_FORMATS)
+    return [os.path.join(source, name) for name in names[:limit]]
+
+
+def letterbox(path: str, size: int):
+    """与 Ultralytics 推理预处理一致：等比缩放到长边 size，居中填充 114，RGB，CHW，float32 / 255。"""
+    import numpy as np
+    from PIL import Image
+    with Image.open(path) as im:
+        im = im.convert('RGB')
+        ratio = min(size / im.width, size / im.height)
+        new_w, new_h = round(im.width * ratio), round(im.height * ratio)
+        if (new_w, new_h) != im.size:
+            im = im.resize((new_w, new_h), Image.BILINEAR)
+        canvas = Image.new('RGB', (size, size), (114, 114, 114))
+        canvas.paste(im, ((size - new_w) // 2, (size - new_h) // 2))
+    return np.asarray(canvas, dtype=np.float32).transpose(2, 0, 1) / 255.0
+
+
+def inspect_model(model_path: str) -> dict:
+    """读取模型输入的形状（整数为固定维度，字符串或 None 为动态维度）和 Ultralytics 写入的元数据。"""
+    import onnxruntime as ort
+    session = ort.InferenceSession(model_path, providers=['CPUExecutionProvider'])
+    model_input = session.get_inputs()[0]
+    metadata = session.get_modelmeta().custom_metadata_map
+    shape = [dim if isinstance(dim, int) else None for dim in model_input.shape]
+    imgsz = None
+    if isinstance(shape[2], int):
+        imgsz = shape[2]
+    elif metadata.get('imgsz'):
+        try:
+            imgsz = max(ast.literal_eval(metadata['imgsz']))
+        except (ValueError, SyntaxError, TypeError):
+            imgsz = None
+    return {'input_name': model_input.name, 'input_shape': shape, 'input_type': model_input.type,
+            'imgsz': imgsz or 640, 'onnxruntime': ort.__version__,
+            'metadata': {key: metadata[key] for key in ('task', 'imgsz', 'batch', 'names') if key in metadata}}
+
+
+def plan_sweep(args: dict, info: dict):
+    """返回 (要测试的组合, 被跳过的说明)。"""
+    shape, notes = info['input_shape'], []
+    batches = _int_list(args['batch'])
+    if isinstance(shape[0], int):
+        if [b for b in batches if b != shape[0]]:
+            notes.append(f"模型的 batch 维度固定为 {shape[0]}，只测试 batch={shape[0]}（导出时设置 dynamic=True 才能测试其它 batch）")
+        batches = [shape[0]]
+    if args['imgsz'].strip().lower() == 'auto':
+        sizes = [info['imgsz']]
+    else:
+        sizes = []
+        for size in _int_list(args['imgsz']):
+            rounded = -(-size // STRIDE) * STRIDE
+            if rounded != size:
+                notes.append(f"imgsz={size} 不是 {STRIDE} 的倍数，按 {rounded} 测试")
+            sizes.append(rounded)
+    if isinstance(shape[2], int) and [s for s in sizes if s != shape[2]]:
+        notes.append(f"模型的输入尺寸固定为 {shape[2]}，只测试 imgsz={shape[2]}")
+        sizes = [shape[2]]
+    threads = thread_sweep(args['threads'], physical_cores())
+    inter = _int_list(args['inter_threads'])
+    combos = [{'imgsz': size, 'batch': batch, 'intra_threads': t, 'inter_threads': i}
+              for size in dict.fromkeys(sizes) for t in dict.fromkeys(threads)
+              for i in dict.fromkeys(inter) for batch in dict.fromkeys(batches)]
+    return combos, notes
+
+
+def _peak_rss_mb() -> float:
+    """本进程的内存峰值（MB）。"""
+    if os.name == 'nt':
+        import psutil
+        return psutil.Process().memory_info().peak_wset / 1024 ** 2
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 上单位为 KB，macOS 上为字节
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def _current_rss_mb() -> float:
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1024 ** 2
+    except ImportError:
+        return _peak_rss_mb()
+
+
+def run_combo(job: dict) -> dict:
+    """子进程中执行一个组合：预处理图片，建立会话，预热后计时 runs 次。"""
+    import numpy as np
+    import onnxruntime as ort
+
+    batch, size = job['batch'], job['imgsz']
+    images = [letterbox(path, size) for path in job['images'][:max(batch, 1) * 4]]
+    # 按图片顺序组成若干个批次，轮流作为输入，图片不足一个批次时循环使用
+    count = max(1, len(images) // batch)
+    batches = [np.ascontiguousarray(np.stack([images[(k * batch + j) % len(images)] for j in range(batch)]))
+               for k in range(count)]
+    base_mb = _current_rss_mb()
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = job['intra_threads']
+    options.inter_op_num_threads = job['inter_threads']
+    options.execution_mode = (ort.ExecutionMode.ORT_PARALLEL if job['inter_threads'] > 1
+                              else ort.ExecutionMode.ORT_SEQUENTIAL)
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    load_start = time.perf_counter()
+    session = ort.InferenceSession(job['model'], options, providers=['CPUExecutionProvider'])
+    load_ms = (time.perf_counter() - load_start) * 1000
+    name = session.get_inputs()[0].name
+
+    for k in range(job['warmup']):
+        session.run(None, {name: batches[k % count]})
+    latencies = []
+    for k in range(job['runs']):
+        start = time.perf_counter()
+        session.run(None, {name: batches[k % count]})
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    lat = np.asarray(latencies)
+    peak_mb = _peak_rss_mb()
+    return {
+        **{key: job[key] for key in ('imgsz', 'batch', 'intra_threads', 'inter_threads')},
+        'runs': len(latencies),
+        'p50_ms': float(np.percentile(lat, 50)),
+        'p95_ms': float(np.percentile(lat, 95)),
+        'p99_ms': float(np.percentile(lat, 99)),
+        'mean_ms': float(lat.mean()),
+        'per_image_p50_ms': float(np.percentile(lat, 50)) / batch,
+        'throughput_ips': batch * len(latencies) / (lat.sum() / 1000),
+        'peak_rss_mb': peak_mb,
+        'session_mb': max(0.0, peak_mb - base_mb),
+        'load_ms': load_ms,
+    }
+
+
+def _spawn_combo(job: dict) -> dict:
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), '--combo', json.dumps(job)],
+                            capture_output=True, text=True, encoding='utf-8')
+    lines = [line for line in result.stdout.splitlines() if line.startswith('{')]
+    if result.returncode != 0 or not lines:
+        error = (result.stderr.strip().splitlines() or ['未知错误'])[-1]
+        return {**{key: job[key] for key in ('imgsz', 'batch', 'intra_threads', 'inter_threads')}, 'error': error}
+    return json.loads(lines[-1])
+
+
+def format_table(results) -> str:
+    header = f"{'imgsz':>6}{'batch':>6}{'intra':>6}{'inter':>6}{'p50':>9}{'p95':>9}{'p99':>9}{'img/s':>9}{'峰值MB':>9}"
+    lines = [header]
+    for r in results:
+        prefix = f"{r['imgsz']:>6}{r['batch']:>6}{r['intra_threads']:>6}{r['inter_threads']:>6}"
+        if 'error' in r:
+            lines.append(f"{prefix}  失败: {r['error']}")
+        else:
+            lines.append(f"{prefix}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}"
+                         f"{r['throughput_ips']:>9.1f}{r['peak_rss_mb']:>9.0f}")
+    return '\n'.join(lines)
+
+
+def _write_report(path: str, report: dict):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+def main(argv) -> int:
+    if argv[:1] == ['--combo']:
+        print(json.dumps(run_combo(json.loads(argv[1]))), flush=True)
+        return 0
+
+    args = parse_args(argv)
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        print("错误: 训练环境中没有安装 onnxruntime，请先执行 pip install onnxruntime")
+        return 2
+    model = os.path.abspath(args['model'])
+    info = inspect_model(model)
+    combos, notes = plan_sweep(args, info)
+    max_batch = max(combo['batch'] for combo in combos)
+    images = list_images(args['source'], min(MAX_IMAGES, max_batch * 4))
+    if not images:
+        print(f"错误: {args['source']} 中没有图片")
+        return 2
+
+    cores = physical_cores()
+    print(f"模型 {model}，输入 {info['input_name']} {info['input_shape']}，onnxruntime {info['onnxruntime']}")
+    print(f"CPU 物理核 {cores} / 逻辑核 {os.cpu_count()}，测试图片 {len(images)} 张，共 {len(combos)} 个组合，"
+          f"每个组合预热 {args['warmup']} 次、计时 {args['runs']} 次")
+    for note in notes:
+        print(f"[提示] {note}")
+
+    results = []
+    for index, combo in enumerate(combos, 1):
+        job = {**combo, 'model': model, 'images': images, 'runs': int(args['runs']), 'warmup': int(args['warmup'])}
+        result = _spawn_combo(job)
+        results.append(result)
+        if 'error' in result:
+            print(f"[{index}/{len(combos)}] {combo} 失败: {result['error']}", flush=True)
+        else:
+            print(f"[{index}/{len(combos)}] imgsz={result['imgsz']} batch={result['batch']} "
+                  f"intra={result['intra_threads']} inter={result['inter_threads']}: "
+                  f"p50 {result['p50_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms, "
+                  f"{result['throughput_ips']:.1f} img/s, 峰值内存 {result['peak_rss_mb']:.0f} MB", flush=True)
+
+    output = args.get('output') or os.path.join('runs', 'benchmark', f"onnx_cpu_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    report = {
+        'model': model, 'source': os.path.abspath(args['source']), 'images': len(images),
+        'cpu': {'physical_cores': cores, 'logical_cores': os.cpu_count()},
+        'model_info': info, 'settings': {key: args[key] for key in DEFAULTS}, 'notes': notes,
+        'results': results, 'best': {},
+    }
+    # 先写出测量结果，之后的汇总即使出错也不会丢失已有的测量
+    _write_report(output, report)
+
+    ok = [r for r in results if 'error' not in r]
+    best = report['best']
+    if ok:
+        # 最小 batch 按成功的组合取：请求的最小 batch 可能全部失败（内存不足等）
+        smallest = min(r['batch'] for r in ok)
+        best['lowest_latency'] = min((r for r in ok if r['batch'] == smallest), key=lambda r: r['p50_ms'])
+        best['highest_throughput'] = max(ok, key=lambda r: r['throughput_ips'])
+        _write_report(output, report)
+
+    print(format_table(results))
+    for key, label in (('lowest_latency', "最低延迟"), ('highest_throughput', "最高吞吐")):
+        if key in best:
+            r = best[key]
+            print(f"{label}: imgsz={r['imgsz']} batch={r['batch']} intra={r['intra_threads']} "
+                  f"inter={r['inter_threads']} (p50 {r['p50_ms']:.1f} ms, {r['throughput_ips']:.1f} img/s)")
+    print(f"测速结果已写入 {os.path.abspath(output)}")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+'''
+@Project ：yolo_source_code
+@File    ：resource_sampler.py
+@Author  ：fengzhengxiong
+@Date    ：2026/10/18 20:40
+'''
+
+
+import os
+import json
+import time
+import threading
+from array import array
+from typing import Callable, Dict, List, Optional
+
+# 每个样本的列：时间（秒，相对采样开始）、进程树 CPU%（多核累加，可超过 100）、整机 CPU%、
+# 进程树 RSS（MB，共享内存会被重复计入）、磁盘读/写速率（MB/s，不含命中页缓存的读取）、线程数、进程数
+COLUMNS = ('t', 'cpu', 'sys_cpu', 'rss_mb', 'read_mb_s', 'write_mb_s', 'threads', 'procs')
+_MB = 1024 * 1024
+
+
+class ResourceSeries:
+    """
+    固定容量的环形时间序列：每一列是预先分配的 array('d')，写满后覆盖最早的样本，内存占用恒定。
+    另外对全程（包括已被覆盖的样本）累计平均值和峰值。
+    """
+
+    def __init__(self, capacity: int = 3600):
+        self.capacity = capacity
+        self._columns = {name: array('d', bytes(8 * capacity)) for name in COLUMNS}
+        self._next = 0
+        self.total = 0
+        self._sums = dict.fromkeys(COLUMNS, 0.0)
+        self._peaks = dict.fromkeys(COLUMNS, 0.0)
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def append(self, sample: Dict[str, float]):
+        for name in COLUMNS:
+            value = sample[name]
+            self._columns[name][self._next] = value
+            self._sums[name] += value
+            if value > self._peaks[name]:
+                self._peaks[name] = value
+        self._next = (self._next + 1) % self.capacity
+        self.total += 1
+
+    def get(self, name: str) -> List[float]:
+        """按时间顺序返回保留的样本。"""
+        column = self._columns[name]
+        if self.total <= self.capacity:
+            return list(column[:self.total])
+        return list(column[self._next:]) + list(column[:self._next])
+
+    def latest(self) -> Dict[str, float]:
+        if not self.total:
+            return {}
+        row = (self._next - 1) % self.capacity
+        return {name: self._columns[name][row] for name in COLUMNS}
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """全程各列的平均值与峰值（时间列除外）。"""
+        return {name: {'mean': self._sums[name] / self.total if self.total else 0.0, 'max': self._peaks[name]}
+                for name in COLUMNS if name != 't'}
+
+    def to_dict(self) -> Dict[str, List[float]]:
+        return {name: self.get(name) for name in COLUMNS}
+
+
+class ResourceSampler:
+    """
+    后台线程按固定间隔采样任务进程及其全部子进程（例如 dataloader 的 worker）的资源占用。
+    - pid_provider 返回当前要采样的根进程 PID（还没有进程时返回 None），根进程变化时重新建立进程树；
+    - 进程树每 tree_refresh 次采样才重新枚举一次（枚举子进程要扫描系统中所有进程），其余时候沿用已知的进程；
+    - 每个进程用 oneshot() 一次读取所需的全部信息，psutil.Process 对象跨采样复用，cpu_percent 才能算出增量。
+    采样线程自身消耗的 CPU 时间记录在 cpu_seconds 中，overhead() 为其占墙钟时间的比例。
+    """
+
+    def __init__(self, pid_provider: Callable[[], Optional[int]], interval: float = 1.0, capacity: int = 3600,
+                 on_sample: Callable[[Dict[str, float]], None] = None, tree_refresh: int = 5):
+        self.pid_provider = pid_provider
+        self.interval = interval
+        self.on_sample = on_sample
+        self.tree_refresh = max(1, tree_refresh)
+        self.series = ResourceSeries(capacity)
+        self.cpu_seconds = 0.0
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._started_at = 0.0
+        self._stopped_at = 0.0
+        self._root_pid = None
+        self._processes = {}
+        self._last_io = {}
+        self._last_time = 0.0
+        self._ticks = 0
+
+    def start(self):
+        self._stop_event.clear()
+        self._started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='ResourceSampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._stopped_at = time.perf_counter()
+
+    def overhead(self) -> float:
+        wall = (self._stopped_at or time.perf_counter()) - self._started_at
+        return self.cpu_seconds / wall if wall > 0 else 0.0
+
+    def _run(self):
+        import psutil
+        # 整机 CPU% 同样以上一次调用为基准，先调用一次建立基准
+        psutil.cpu_percent(None)
+        while not self._stop_event.wait(self.interval):
+            cpu_start = time.thread_time()
+            try:
+                sample = self._sample(psutil)
+            except Exception as e:
+                # 采样失败不影响任务本身，记录一次后停止采样
+                print(f"资源采样失败: {e}")
+                return
+            finally:
+                self.cpu_seconds += time.thread_time() - cpu_start
+            if sample is not None:
+                self.series.append(sample)
+                if self.on_sample is not None:
+                    self.on_sample(sample)
+
+    def _refresh_tree(self, psutil, root_pid: int):
+        if root_pid != self._root_pid:
+            self._root_pid = root_pid
+            self._processes, self._last_io = {}, {}
+        try:
+            root = self._processes.get(root_pid) or psutil.Process(root_pid)
+            current = [root] + root.children(recursive=True)
+        except psutil.Error:
+            self._processes = {}
+            return
+        # 已知进程保留原对象（保存着 cpu_percent 的基准），新进程加入
+        self._processes = {p.pid: self._processes.get(p.pid, p) for p in current}
+
+    def _sample(self, psutil) -> Optional[Dict[str, float]]:
+        root_pid = self.pid_provider()
+        if root_pid is None:
+            return None
+        if root_pid != self._root_pid or self._ticks % self.tree_refresh == 0:
+            self._refresh_tree(psutil, root_pid)
+        self._ticks += 1
+
+        now = time.perf_counter()
+        elapsed = now - self._last_time if self._last_time else self.interval
+        self._last_time = now
+        cpu = rss = threads = 0.0
+        read_bytes = write_bytes = 0
+        for pid, process in list(self._processes.items()):
+            try:
+                with process.oneshot():
+                    cpu += process.cpu_percent(None)
+                    rss += process.memory_info().rss
+                    threads += process.num_threads()
+                    try:
+                        io = process.io_counters()
+                    except (AttributeError, psutil.AccessDenied):
+                        # macOS 没有 io_counters；无权限读取的进程只统计 CPU 和内存
+                        io = None
+            except psutil.Error:
+                # 进程已退出
+                del self._processes[pid]
+                self._last_io.pop(pid, None)
+                continue
+            if io is not None:
+                last = self._last_io.get(pid)
+                if last is not None:
+                    read_bytes += max(0, io.read_bytes - last[0])
+                    write_bytes += max(0, io.write_bytes - last[1])
+                self._last_io[pid] = (io.read_bytes, io.write_bytes)
+
+        return {
+            't': round(now - self._started_at, 3),
+            'cpu': cpu,
+            'sys_cpu': psutil.cpu_percent(None),
+            'rss_mb': rss / _MB,
+            'read_mb_s': read_bytes / _MB / elapsed,
+            'write_mb_s': write_bytes / _MB / elapsed,
+            'threads': threads,
+            'procs': float(len(self._processes)),
+        }
+
+    def to_dict(self) -> Dict:
+        return {
+            'interval': self.interval,
+            'samples': self.series.total,
+            'retained': len(self.series),
+            'sampler_cpu_seconds': round(self.cpu_seconds, 4),
+            'overhead': self.overhead(),
+            'summary': self.series.summary(),
+            'series': self.series.to_dict(),
+        }
+
+    def write(self, path: str) -> str:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        return path
+
+
+def format_summary(sampler: ResourceSampler) -> str:
+    """一行资源占用汇总，用于任务结束时的日志。"""
+    s = sampler.series.summary()
+    return (f"CPU 平均 {s['cpu']['mean']:.0f}% / 峰值 {s['cpu']['max']:.0f}%，"
+            f"整机 CPU 平均 {s['sys_cpu']['mean']:.0f}%，内存峰值 {s['rss_mb']['max']:.0f} MB，"
+            f"磁盘读 平均 {s['read_mb_s']['mean']:.1f} / 峰值 {s['read_mb_s']['max']:.1f} MB/s，"
+            f"写 平均 {s['write_mb_s']['mean']:.1f} MB/s，进程峰值 {s['procs']['max']:.0f}；"
+            f"采样 {sampler.series.total} 次，采样开销 {sampler.overhead():.2%}")
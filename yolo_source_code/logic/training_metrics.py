@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+'''
+@Project ：yolo_source_code
+@File    ：training_metrics.py
+@Author  ：fengzhengxiong
+@Date    ：2026/10/18 14:10
+'''
+
+
+import re
+import math
+from array import array
+from pathlib import Path
+from typing import List, Dict, Optional
+
+
+class MetricSeries:
+    """
+    训练指标的列式存储：每一列是一个 array('d')，按 epoch 追加。
+    同一个 epoch 再次出现时覆盖该行（例如 stdout 兜底数据之后又读到了 results.csv）。
+    """
+
+    def __init__(self):
+        self.epochs = array('d')
+        self._columns: Dict[str, array] = {}
+
+    def __len__(self):
+        return len(self.epochs)
+
+    def add_row(self, epoch: float, values: Dict[str, float]):
+        if self.epochs and epoch == self.epochs[-1]:
+            row = len(self.epochs) - 1
+        else:
+            row = len(self.epochs)
+            self.epochs.append(epoch)
+        for name, value in values.items():
+            column = self._columns.get(name)
+            if column is None:
+                column = self._columns[name] = array('d')
+            # 新出现的列用 NaN 补齐之前的行
+            if len(column) < row:
+                column.extend([math.nan] * (row - len(column)))
+            if len(column) == row:
+                column.append(value)
+            else:
+                column[row] = value
+
+    def clear(self):
+        self.epochs = array('d')
+        self._columns.clear()
+
+    def columns(self) -> List[str]:
+        return list(self._columns)
+
+    def get(self, name: str) -> List[float]:
+        """返回某一列，长度与 epochs 一致，缺失值为 NaN。"""
+        column = self._columns.get(name, array('d'))
+        return list(column) + [math.nan] * (len(self.epochs) - len(column))
+
+    def latest(self) -> Dict[str, float]:
+        """最新一个 epoch 的所有指标。"""
+        if not self.epochs:
+            return {}
+        row = len(self.epochs) - 1
+        latest = {'epoch': self.epochs[row]}
+        for name, column in self._columns.items():
+            if len(column) > row:
+                latest[name] = column[row]
+        return latest
+
+    def select(self, keyword: str) -> Dict[str, List[float]]:
+        """按关键字选取列，例如 'loss'、'mAP'、'lr/'。"""
+        return {name: self.get(name) for name in self._columns if keyword in name}
+
+    def to_dict(self) -> Dict[str, List[float]]:
+        data = {'epoch': list(self.epochs)}
+        data.update({name: self.get(name) for name in self._columns})
+        return data
+
+
+def _to_float(text: str) -> Optional[float]:
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+class ResultsCsvTailer:
+    """
+    按文件偏移量增量读取 Ultralytics 的 results.csv。
+    每次 poll 只读取上次之后新增的字节，且只处理完整的行，
+    所以 1000 个 epoch 的训练每次轮询的开销也与新增内容成正比。
+    """
+
+    def __init__(self, csv_path: Path, series: MetricSeries):
+        self.csv_path = Path(csv_path)
+        self.series = series
+        self.offset = 0
+        self.header: List[str] = []
+
+    def poll(self) -> int:
+        """读取新增的行并写入 series，返回新增的行数。"""
+        try:
+            size = self.csv_path.stat().st_size
+        except OSError:
+            return 0
+        if size < self.offset:
+            # 文件被重写（例如训练重新开始），从头读
+            self.offset = 0
+            self.header = []
+            self.series.clear()
+        if size == self.offset:
+            return 0
+
+        with open(self.csv_path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+        end = data.rfind(b'\n')
+        if end < 0:
+            return 0
+        self.offset += end + 1
+
+        rows = 0
+        for raw_line in data[:end].decode('utf-8', errors='replace').splitlines():
+            cells = [cell.strip() for cell in raw_line.split(',')]
+            if not self.header:
+                self.header = cells
+                continue
+            values = {}
+            for name, cell in zip(self.header, cells):
+                value = _to_float(cell)
+                if value is not None:
+                    values[name] = value
+            epoch = values.pop('epoch', None)
+            if epoch is None:
+                continue
+            self.series.add_row(epoch, values)
+            rows += 1
+        return rows
+
+
+class StdoutMetricsParser:
+    """
+    兜底方案：在 results.csv 出现之前，从训练的标准输出中解析每个 epoch 的损失。
+    Ultralytics 先打印表头（Epoch GPU_mem box_loss ...），再打印形如
+    "1/100  2.5G  1.234 ..." 的进度行。
+    """
+    _EPOCH_RE = re.compile(r'^\s*(\d+)/(\d+)\s+(.*)$')
+
+    def __init__(self, series: MetricSeries):
+        self.series = series
+        self.header: List[str] = []
+        self.total_epochs = 0
+
+    def feed(self, line: str) -> bool:
+        """处理一行输出，解析出新的指标时返回 True。"""
+        stripped = line.strip()
+        if stripped.startswith('Epoch'):
+            self.header = stripped.split()[1:]
+            return False
+        if not self.header:
+            return False
+        match = self._EPOCH_RE.match(line)
+        if not match:
+            return False
+        # 进度条部分（如 "100%|████| 12/12 ..."）不是指标，截断
+        cells = match.group(3).split('%|')[0].split()
+        values = {}
+        for name, cell in zip(self.header, cells):
+            value = _to_float(cell)
+            if value is not None:
+                values[f'train/{name}' if name.endswith('_loss') else name] = value
+        if not values:
+            return False
+        self.total_epochs = int(match.group(2))
+        self.series.add_row(float(match.group(1)), values)
+        return True
+
+
+def find_run_file(runs_dir: Path, run_name: str, relative_path: str, since: float) -> Optional[Path]:
+    """
+    在 runs/<任务>/<run_name>*/ 中查找本次运行产生的文件（如 results.csv、weights/best.pt）。
+    Ultralytics 遇到同名目录会自动加序号（train_results2 ...），所以取 since 之后最新的一个。
+    """
+    runs_dir = Path(runs_dir)
+    if not runs_dir.exists():
+        return None
+    candidates = []
+    for file_path in runs_dir.glob(f'*/{run_name}*/{relative_path}'):
+        try:
+            mtime = file_path.stat().st_mtime
+        except OSError:
+            continue
+        if mtime >= since:
+            candidates.append((mtime, file_path))
+    return max(candidates)[1] if candidates else None
+
+
+def find_results_csv(runs_dir: Path, run_name: str, since: float) -> Optional[Path]:
+    """查找本次训练的 results.csv。"""
+    return find_run_file(runs_dir, run_name, 'results.csv', since)
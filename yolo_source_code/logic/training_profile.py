@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+'''
+@Project ：yolo_source_code
+@File    ：training_profile.py
+@Author  ：fengzhengxiong
+@Date    ：2026/10/18 21:10
+'''
+
+
+# ==========================================================
+#  训练前的资源规划：根据数据集规模、解码后的图片占用、可用内存和 CPU 核数，
+#  选择 Ultralytics 的 cache (ram / disk / False)、workers 和 batch，并给出每一项的理由。
+#
+#  估算方式与 Ultralytics 保持一致：
+#  - cache=ram 时每张图片按长边缩放到 imgsz 后以 uint8 BGR 保存，Ultralytics 自身要求
+#    需要的内存 * (1 + 0.5) 小于可用内存，否则放弃缓存；
+#  - cache=disk 时每张图片以原始分辨率保存为 .npy（BMP 本来就不需要解码，缓存没有收益）；
+#  - 有 GPU 时 batch=-1 交给 AutoBatch 按显存决定；纯 CPU 训练时 AutoBatch 固定为 16，这里按内存估算。
+# ==========================================================
+
+import os
+import math
+import shutil
+import struct
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from logic.integrity_checker import read_image_size
+
+_GB = 1024 ** 3
+# 估算图片尺寸时最多读取的文件头数量（均匀抽样）
+SAMPLE_IMAGES = 32
+# Ultralytics check_cache_ram 的安全余量
+CACHE_SAFETY_MARGIN = 0.5
+# 每个 dataloader worker 进程的内存开销（导入 torch + 预取的批次）
+WORKER_MEMORY = 0.5 * _GB
+# 纯 CPU 训练时每个样本在 imgsz=640 下的激活内存（小模型的经验值，与 imgsz 的平方成正比）
+CPU_SAMPLE_MEMORY = 0.25 * _GB
+# 有 GPU 时主进程在内存中的开销（模型、优化器、pinned memory）
+GPU_HOST_RESERVE = 2 * _GB
+# 训练整体最多使用的可用内存比例，其余留给系统和其它程序
+MEMORY_BUDGET = 0.8
+COMPRESSED_FORMATS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+def _read_cfg(cfg_path: Optional[str]) -> Dict[str, Any]:
+    if not cfg_path or not os.path.isfile(cfg_path):
+        return {}
+    import yaml
+    with open(cfg_path, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f) or {}
+
+
+def _train_images(dataset_dir: Path) -> List[str]:
+    """训练集图片路径：优先读取 train.txt（'./' 相对于列表所在目录），没有时列出 images/。"""
+    list_path = dataset_dir / 'train.txt'
+    if list_path.is_file():
+        with open(list_path, 'r', encoding='utf-8') as f:
+            lines = [line.strip() for line in f if line.strip()]
+        return [str(dataset_dir / line[2:]) if line.startswith('./') else line for line in lines]
+    image_dir = dataset_dir / 'images'
+    if image_dir.is_dir():
+        return [str(p) for p in sorted(image_dir.iterdir()) if p.suffix.lower() in COMPRESSED_FORMATS + ('.bmp',)]
+    return []
+
+
+def _has_gpu(device) -> bool:
+    """cfg 中 device 为 cpu 时视为纯 CPU；否则以 nvidia-smi 是否存在判断（不在界面进程中导入 torch）。"""
+    if device is not None and str(device).strip().lower() == 'cpu':
+        return False
+    return shutil.which('nvidia-smi') is not None
+
+
+def _power_of_two_floor(value: float) -> int:
+    return 2 ** int(math.log2(value)) if value >= 1 else 1
+
+
+def plan_training(dataset_dir: str, cfg_path: str = None, overrides: Dict[str, str] = None) -> Dict[str, Any]:
+    """
+    返回 {'args': {'cache', 'workers', 'batch'}, 'reasons': [...], 'facts': {...}}。
+    overrides 中的值（例如配置文件 [Profile.train] 指定的）直接采用，不再规划。
+    """
+    import psutil
+
+    overrides = overrides or {}
+    dataset_dir = Path(dataset_dir)
+    cfg = _read_cfg(cfg_path)
+    imgsz = cfg.get('imgsz') or 640
+    if isinstance(imgsz, (list, tuple)):
+        imgsz = max(imgsz)
+    imgsz = int(imgsz)
+
+    cores = psutil.cpu_count(logical=True) or os.cpu_count() or 1
+    memory = psutil.virtual_memory()
+    available = memory.available
+    gpu = _has_gpu(cfg.get('device'))
+
+    images = _train_images(dataset_dir)
+    count = len(images)
+    sample = images[::max(1, count // SAMPLE_IMAGES)][:SAMPLE_IMAGES]
+    sizes = []
+    for path in sample:
+        try:
+            sizes.append(read_image_size(path))
+        except (OSError, ValueError, IndexError, struct.error):
+            continue
+    if sizes:
+        width = sum(w for w, _ in sizes) / len(sizes)
+        height = sum(h for _, h in sizes) / len(sizes)
+    else:
+        width = height = imgsz
+    ratio = imgsz / max(width, height)
+    ram_per_image = math.ceil(width * ratio) * math.ceil(height * ratio) * 3
+    disk_per_image = width * height * 3
+    extensions = {os.path.splitext(p)[1].lower() for p in sample}
+    compressed = bool(extensions) and extensions <= set(COMPRESSED_FORMATS)
+
+    facts = {
+        'train_images': count, 'mean_size': [round(width), round(height)], 'imgsz': imgsz, 'cores': cores,
+        'available_gb': round(available / _GB, 2), 'total_gb': round(memory.total / _GB, 2), 'gpu': gpu,
+        'formats': sorted(extensions),
+    }
+    args, reasons = {}, [
+        f"训练图片 {count} 张，平均尺寸 {width:.0f}x{height:.0f}，imgsz={imgsz}；"
+        f"CPU {cores} 核，可用内存 {available / _GB:.1f} / {memory.total / _GB:.1f} GB，"
+        f"{'检测到 GPU' if gpu else '纯 CPU 训练'}。"]
+
+    # ---- workers ----
+    if 'workers' in overrides:
+        workers = int(overrides['workers'])
+        reasons.append(f"workers={workers}: 由配置文件指定。")
+    else:
+        if gpu:
+            workers = min(8, max(0, cores - 1))
+            why = "GPU 训练时 CPU 只负责读图和增强，保留 1 核给主进程"
+        else:
+            workers = min(4, cores // 4)
+            why = "纯 CPU 训练时前向/反向计算需要大部分核心，只分出约 1/4 给数据加载"
+        memory_cap = int(available * 0.25 // WORKER_MEMORY)
+        if memory_cap < workers:
+            workers = memory_cap
+            why += f"；每个 worker 约 {WORKER_MEMORY / _GB:.1f} GB，受可用内存限制"
+        reasons.append(f"workers={workers}: {why}。")
+    args['workers'] = workers
+    budget = available * MEMORY_BUDGET - workers * WORKER_MEMORY
+
+    # ---- batch ----
+    if 'batch' in overrides:
+        batch = overrides['batch']
+        reasons.append(f"batch={batch}: 由配置文件指定。")
+        training_memory = GPU_HOST_RESERVE if gpu else 16 * CPU_SAMPLE_MEMORY * (imgsz / 640) ** 2
+    elif gpu:
+        batch = -1
+        training_memory = GPU_HOST_RESERVE
+        reasons.append("batch=-1: 有 GPU，交给 AutoBatch 按显存选择。")
+    else:
+        per_sample = CPU_SAMPLE_MEMORY * (imgsz / 640) ** 2
+        # 至少给 1/2 的预算留给训练本身，剩下的才考虑缓存
+        batch = max(1, min(16, _power_of_two_floor(budget * 0.5 / per_sample), count or 1))
+        training_memory = batch * per_sample
+        reasons.append(f"batch={batch}: 纯 CPU 时 AutoBatch 固定为 16；每个样本约 {per_sample / _GB:.2f} GB，"
+                       f"按一半的内存预算（{budget * 0.5 / _GB:.1f} GB）取不超过 16 的 2 的幂。")
+    args['batch'] = batch
+
+    # ---- cache ----
+    # Windows 上 dataloader worker 以 spawn 方式启动，会各自复制一份内存缓存
+    copies = workers + 1 if os.name == 'nt' and workers > 0 else 1
+    ram_needed = ram_per_image * count * (1 + CACHE_SAFETY_MARGIN) * copies
+    disk_needed = disk_per_image * count
+    if 'cache' in overrides:
+        cache = overrides['cache']
+        reasons.append(f"cache={cache}: 由配置文件指定。")
+    elif not count:
+        cache = False
+        reasons.append(f"cache=False: 没有在 {dataset_dir} 中找到训练图片，无法估算。")
+    elif ram_needed <= budget - training_memory:
+        cache = 'ram'
+        reasons.append(f"cache=ram: 缩放到 imgsz 后共需 {ram_needed / _GB:.2f} GB"
+                       f"{f'（{copies} 份，Windows 的每个 worker 各复制一份）' if copies > 1 else ''}，"
+                       f"不超过扣除训练开销后的内存预算 {(budget - training_memory) / _GB:.2f} GB。")
+    else:
+        free_disk = shutil.disk_usage(dataset_dir if dataset_dir.exists() else '.').free
+        why = f"内存缓存需要 {ram_needed / _GB:.2f} GB，超出预算 {max(0, budget - training_memory) / _GB:.2f} GB"
+        if compressed and disk_needed * 1.2 <= free_disk:
+            cache = 'disk'
+            reasons.append(f"cache=disk: {why}；图片为压缩格式 {sorted(extensions)}，每个 epoch 重新解码的开销大，"
+                           f"磁盘缓存需要 {disk_needed / _GB:.2f} GB（可用 {free_disk / _GB:.1f} GB）。")
+        else:
+            cache = False
+            detail = "图片本身不需要解码（如 BMP），磁盘缓存没有收益" if not compressed else \
+                f"磁盘缓存需要 {disk_needed / _GB:.2f} GB，可用空间不足（{free_disk / _GB:.1f} GB）"
+            reasons.append(f"cache=False: {why}；{detail}。")
+    args['cache'] = cache
+
+    return {'args': args, 'reasons': reasons, 'facts': facts}
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+'''
+@Project ：yolo_source_code
+@File    ：yolo_server.py
+@Author  ：fengzhengxiong
+@Date    ：2026/10/18 19:50
+'''
+
+
+# ==========================================================
+#  常驻的 YOLO 任务进程（由训练环境的 python 运行，只依赖标准库和 ultralytics）
+#
+#  启动时导入一次 ultralytics（连同 torch），之后从 stdin 逐行读取 JSON 任务：
+#      {"argv": ["cfg=...", "train", "data=...", ...], "cwd": "..."}   执行一次 yolo 命令
+#      {"script": "batch_predict.py", "argv": [...], "cwd": "..."}     以 __main__ 身份运行脚本（runpy）
+#      {"exit": true}                                                 退出
+#  任务的输出（stdout 与 stderr 由启动方合并）原样写到 stdout，结束时输出一行
+#      @@yolo-server:<nonce>:done <返回码>
+#  nonce 由启动方通过命令行传入，任务输出不可能与之重合。
+#  用法: python -u yolo_server.py <nonce>
+# ==========================================================
+
+import os
+import gc
+import sys
+import json
+import runpy
+import traceback
+
+
+def _release_memory():
+    """任务之间释放显存缓存，避免上一个任务的模型占住显存。"""
+    gc.collect()
+    torch = sys.modules.get('torch')
+    if torch is not None and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+def run_job(entrypoint, job: dict, home: str) -> int:
+    # ultralytics 的 entrypoint() 从 ultralytics.utils.ARGV 读取参数，它与 sys.argv 是同一个列表对象，
+    # 所以这里原地修改而不是重新赋值；这样参数中的路径含空格也不会被拆开
+    script = job.get('script')
+    sys.argv[:] = [script or 'yolo', *job['argv']]
+    try:
+        os.chdir(job.get('cwd') or home)
+        if script:
+            # 脚本中的 import ultralytics 直接命中已导入的模块
+            runpy.run_path(script, run_name='__main__')
+        else:
+            entrypoint()
+        return 0
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except Exception:
+        traceback.print_exc()
+        return 1
+    finally:
+        os.chdir(home)
+        _release_memory()
+
+
+def main() -> int:
+    done_marker = f'@@yolo-server:{sys.argv[1]}:done'
+    home = os.getcwd()
+    # 常驻进程存在的意义：框架只在这里导入一次
+    from ultralytics.cfg import entrypoint
+
+    while True:
+        line = sys.stdin.readline()
+        if not line:
+            return 0
+        line = line.strip()
+        if not line:
+            continue
+        job = json.loads(line)
+        if job.get('exit'):
+            return 0
+        return_code = run_job(entrypoint, job, home)
+        sys.stderr.flush()
+        sys.stdout.write(f'\n{done_marker} {return_code}\n')
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    sys.exit(main())